@@ -1,44 +1,77 @@
 from __future__ import annotations
 import os
+import threading
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import uvicorn
 
-from .config import load_config, AppCfg
-from .pipeline import generate_dataset
+from synthfactory.config import load_config, AppCfg
+from synthfactory.llm_client import LLMClient
+from synthfactory.llm_factory import is_llm_enabled, llm_client_from_config
+from synthfactory.llm_ledger import process_ledger
+from synthfactory.pipeline import generate_dataset
+
+# Client for the configured default provider; only used to warm the model and
+# report its cached health. Jobs build their own clients.
+_llm: LLMClient | None = None
+
+
+def _warm_llm():
+    # Runs on its own thread: a bad config or provider is reported by
+    # threading.excepthook and leaves the API serving without a warm model.
+    global _llm
+    cfg = get_config()
+    if not is_llm_enabled(cfg):
+        return
+    _llm = llm_client_from_config(cfg)
+    if cfg.llm.warmup:
+        _llm.warm_up()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model load can take a while; do not hold up the listener for it.
+    threading.Thread(target=_warm_llm, daemon=True).start()
+    yield
+
 
 app = FastAPI(
     title="SynthDocs API",
     description="Generate synthetic documents for testing OCR systems",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
 class GenerateRequest(BaseModel):
     count: int = 40
     prompt: str = ""
-    mix: Optional[dict] = None
-    llm_provider: Optional[str] = None
-    output_mode: Optional[str] = None
-    local_destination: Optional[str] = None
-    s3_bucket: Optional[str] = None
+    mix: dict | None = None
+    llm_provider: str | None = None
+    output_mode: str | None = None
+    local_destination: str | None = None
+    s3_bucket: str | None = None
+    # Page image DPI, e.g. 72 for a quick preview (default: the config's size).
+    dpi: int | None = None
 
 
 class DocumentResult(BaseModel):
     doc_id: str
     filename: str
-    local_path: Optional[str] = None
-    url: Optional[str] = None
+    local_path: str | None = None
+    url: str | None = None
 
 
 class GenerateResponse(BaseModel):
     job_id: str
     status: str
     documents: list[DocumentResult]
+    # Per-caller LLM calls, tokens and latency for this job.
+    llm_usage: dict | None = None
 
 
 def get_config() -> AppCfg:
@@ -72,16 +105,31 @@ def override_config(cfg: AppCfg, request: GenerateRequest) -> AppCfg:
     if request.s3_bucket:
         cfg_dict["output"]["s3"]["bucket"] = request.s3_bucket
 
+    if request.dpi:
+        cfg_dict["render"]["jpg"]["dpi"] = request.dpi
+
     return AppCfg.model_validate(cfg_dict)
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # Never probes the LLM: reports the last cached status (null until warmed).
+    return {
+        "status": "healthy",
+        "llm_healthy": _llm.last_health() if _llm is not None else None,
+    }
+
+
+@app.get("/llm/usage")
+async def llm_usage(recent: int = 0):
+    # LLM usage of every job this process has run, plus the last `recent` calls.
+    return process_ledger.report(recent=min(max(recent, 0), 1000))
 
 
+# A plain def: FastAPI runs it on its thread pool, so jobs run side by side
+# (and share in-flight LLM calls) instead of blocking the event loop in turn.
 @app.post("/generate", response_model=GenerateResponse)
-async def generate_documents(request: GenerateRequest):
+def generate_documents(request: GenerateRequest):
     job_id = str(uuid.uuid4())[:8]
 
     try:
@@ -91,7 +139,7 @@ async def generate_documents(request: GenerateRequest):
         output_dir = cfg.output.local.destination
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
-        generate_dataset(
+        report = generate_dataset(
             cfg, prompt_override=request.prompt, count_override=request.count
         )
 
@@ -125,6 +173,7 @@ async def generate_documents(request: GenerateRequest):
             job_id=job_id,
             status="completed",
             documents=results,
+            llm_usage=report["llm"]["usage"],
         )
 
     except Exception as e:
@@ -139,6 +188,7 @@ async def root():
         "endpoints": {
             "health": "/health",
             "generate": "/generate",
+            "llm_usage": "/llm/usage",
         },
     }
 
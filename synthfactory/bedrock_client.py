@@ -1,11 +1,104 @@
 from __future__ import annotations
 import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
 from typing import Any
 
 import boto3
 from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
 
-from .llm_client import LLMClient
+from .llm_client import LLMClient, SlotWaitTimeout, call_scope
+from .llm_ledger import note_usage
+
+# Error codes that mean "slow down", not "this request is wrong".
+THROTTLE_CODES = frozenset(
+    {
+        "ThrottlingException",
+        "TooManyRequestsException",
+        "ServiceUnavailableException",
+        "ModelNotReadyException",
+    }
+)
+
+
+class AIMDLimiter:
+    """Adaptive cap on in-flight requests (additive increase, multiplicative decrease).
+
+    Every successful call raises the cap by ``increase / limit`` (about +1 per
+    full window of successes); a throttle multiplies it by ``decrease``.
+    """
+
+    def __init__(
+        self,
+        initial: float = 2.0,
+        min_limit: float = 1.0,
+        max_limit: float = 32.0,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.limit = max(min_limit, min(max_limit, initial))
+        self.inflight = 0
+        self._cv = threading.Condition()
+
+    def acquire(self, timeout_s: float | None = None, cancelled: threading.Event | None = None):
+        """Take a slot, waiting at most ``timeout_s`` or until ``cancelled`` is set."""
+        t0 = time.monotonic()
+        with self._cv:
+            while self.inflight >= int(self.limit):
+                if cancelled is not None and cancelled.is_set():
+                    raise SlotWaitTimeout("Bedrock call cancelled while waiting for a slot")
+                pause = 0.25
+                if timeout_s is not None:
+                    left = timeout_s - (time.monotonic() - t0)
+                    if left <= 0:
+                        raise SlotWaitTimeout(f"no Bedrock slot within {timeout_s}s")
+                    pause = min(pause, left)
+                # Releases notify; the pause only bounds how late a cancel is seen.
+                self._cv.wait(pause)
+            self.inflight += 1
+
+    def release(self, throttled: bool = False, ok: bool = True):
+        """End a request: throttles shrink the cap, successes grow it, other
+        failures leave it as it is."""
+        with self._cv:
+            self.inflight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            elif ok:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._cv.notify_all()
+
+
+# One limiter per (region, model): every client talking to the same model
+# shares its in-flight cap, however many jobs build their own client.
+_limiters: dict[tuple, AIMDLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: tuple, max_limit: float = 32.0) -> AIMDLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AIMDLimiter(max_limit=max_limit)
+        return limiter
+
+
+@dataclass(frozen=True)
+class BedrockCall:
+    latency_s: float
+    input_tokens: int | None
+    output_tokens: int | None
+    throttles: int
+    ok: bool
+    transient_errors: int = 0
 
 
 class BedrockClient(LLMClient):
@@ -15,30 +108,143 @@ class BedrockClient(LLMClient):
         model_id: str = "anthropic.claude-3-sonnet-20240307",
         temperature: float = 0.7,
         max_tokens: int = 4096,
+        client: Any | None = None,
+        max_concurrency: int = 32,
+        throttle_retries: int = 6,
+        backoff_base_s: float = 0.25,
+        backoff_max_s: float = 8.0,
+        limiter: AIMDLimiter | None = None,
     ):
         self.region = region
         self.model_id = model_id
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.throttle_retries = throttle_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.limiter = limiter or get_limiter(self.cache_key(), max_limit=max_concurrency)
+        self.calls: deque[BedrockCall] = deque(maxlen=1000)
+        self._calls_lock = threading.Lock()
+        self._control: Any | None = None
 
-        self.client = boto3.client(
+        # Throttles and dropped connections are retried by _invoke, so the
+        # limiter sees every throttle; botocore retrying underneath would hide them.
+        self.client = client or boto3.client(
             "bedrock-runtime",
             region_name=region,
-            config=Config(retries={"max_attempts": 3}),
+            config=Config(retries={"mode": "standard", "total_max_attempts": 1}),
         )
 
     def generate(
-        self, prompt: str, schema: dict[str, Any] | None = None
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
     ) -> dict[str, Any]:
         if "claude" in self.model_id.lower():
-            return self._generate_claude(prompt, schema)
+            return self._generate_claude(prompt, schema, system)
         elif "titan" in self.model_id.lower():
-            return self._generate_titan(prompt, schema)
+            return self._generate_titan(prompt, schema, system)
         else:
-            return self._generate_claude(prompt, schema)
+            return self._generate_claude(prompt, schema, system)
+
+    def _invoke(self, body: dict[str, Any]) -> dict[str, Any]:
+        t0 = time.perf_counter()
+        throttles = transient = 0
+        scope = call_scope.get()
+        while True:
+            if scope is None:
+                self.limiter.acquire()
+            else:
+                self.limiter.acquire(timeout_s=scope.time_left(), cancelled=scope.cancelled)
+            throttled = ok = False
+            note_usage("bedrock", self.model_id, attempts=1)
+            try:
+                response = self.client.invoke_model(
+                    modelId=self.model_id,
+                    body=json.dumps(body),
+                    contentType="application/json",
+                )
+                response_body = json.loads(response["body"].read())
+                ok = True
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code", "")
+                throttled = code in THROTTLE_CODES
+                if not throttled or throttles + transient >= self.throttle_retries:
+                    self._record(t0, None, throttles + int(throttled), ok=False, transient=transient)
+                    raise
+            except (BotoConnectionError, HTTPClientError, ConnectionError, TimeoutError):
+                # Connection refused/reset and read timeouts: worth another
+                # try, but not a reason to change the concurrency cap.
+                if throttles + transient >= self.throttle_retries:
+                    self._record(t0, None, throttles, ok=False, transient=transient + 1)
+                    raise
+            except Exception:
+                self._record(t0, None, throttles, ok=False, transient=transient)
+                raise
+            finally:
+                self.limiter.release(throttled=throttled, ok=ok)
+
+            if ok:
+                self._record(t0, response_body, throttles, ok=True, transient=transient)
+                return response_body
+
+            if throttled:
+                throttles += 1
+            else:
+                transient += 1
+            cap = min(self.backoff_max_s, self.backoff_base_s * (2 ** (throttles + transient - 1)))
+            delay = random.uniform(0, cap)
+            if scope is None:
+                time.sleep(delay)
+                continue
+            # A cancelled or out-of-budget call stops retrying instead of
+            # sleeping through its backoff and asking Bedrock again.
+            left = scope.time_left()
+            if (left is not None and delay >= left) or scope.cancelled.wait(delay):
+                self._record(t0, None, throttles, ok=False, transient=transient)
+                raise SlotWaitTimeout("Bedrock call out of time while backing off")
+
+    def _record(self, t0: float, response_body: dict[str, Any] | None, throttles: int, ok: bool,
+                transient: int = 0):
+        in_tok = out_tok = None
+        if response_body:
+            usage = response_body.get("usage") or {}
+            in_tok = usage.get("input_tokens", response_body.get("inputTextTokenCount"))
+            out_tok = usage.get("output_tokens")
+            if out_tok is None and response_body.get("results"):
+                out_tok = response_body["results"][0].get("tokenCount")
+        note_usage("bedrock", self.model_id, in_tok, out_tok, responded=response_body is not None)
+        with self._calls_lock:
+            self.calls.append(
+                BedrockCall(time.perf_counter() - t0, in_tok, out_tok, throttles, ok, transient)
+            )
+
+    def stats(self) -> dict[str, Any]:
+        with self._calls_lock:
+            calls = list(self.calls)
+        lat = sorted(c.latency_s for c in calls)
+
+        def pct(q: float) -> float | None:
+            return round(lat[min(len(lat) - 1, int(q * len(lat)))], 4) if lat else None
+
+        return {
+            "calls": len(calls),
+            "failed": sum(1 for c in calls if not c.ok),
+            "throttles": sum(c.throttles for c in calls),
+            "transient_errors": sum(c.transient_errors for c in calls),
+            "input_tokens": sum(c.input_tokens or 0 for c in calls),
+            "output_tokens": sum(c.output_tokens or 0 for c in calls),
+            "latency_p50_s": pct(0.50),
+            "latency_p95_s": pct(0.95),
+            "concurrency_limit": round(self.limiter.limit, 2),
+        }
 
     def _generate_claude(
-        self, prompt: str, schema: dict[str, Any] | None = None
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
     ) -> dict[str, Any]:
         messages = [
             {
@@ -53,23 +259,23 @@ class BedrockClient(LLMClient):
             "temperature": self.temperature,
             "messages": messages,
         }
+        if system:
+            body["system"] = system
 
-        response = self.client.invoke_model(
-            modelId=self.model_id,
-            body=json.dumps(body),
-            contentType="application/json",
-        )
-
-        response_body = json.loads(response["body"].read())
+        response_body = self._invoke(body)
         text = response_body.get("content", [{}])[0].get("text", "")
 
         return self._extract_json(text, schema)
 
     def _generate_titan(
-        self, prompt: str, schema: dict[str, Any] | None = None
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
     ) -> dict[str, Any]:
+        # Titan has no system field; keep the stable text first all the same.
         body = {
-            "inputText": prompt,
+            "inputText": f"{system}\n\n{prompt}" if system else prompt,
             "textGenerationConfig": {
                 "maxTokenCount": self.max_tokens,
                 "temperature": self.temperature,
@@ -77,13 +283,7 @@ class BedrockClient(LLMClient):
             },
         }
 
-        response = self.client.invoke_model(
-            modelId=self.model_id,
-            body=json.dumps(body),
-            contentType="application/json",
-        )
-
-        response_body = json.loads(response["body"].read())
+        response_body = self._invoke(body)
         text = response_body.get("results", [{}])[0].get("outputText", "")
 
         return self._extract_json(text, schema)
@@ -110,9 +310,22 @@ class BedrockClient(LLMClient):
 
         return {}
 
+    def cache_key(self) -> tuple:
+        return ("bedrock", self.region, self.model_id)
+
     def health_check(self) -> bool:
+        # list_foundation_models lives on the control-plane "bedrock" client,
+        # not "bedrock-runtime". AccessDenied still proves the endpoint and
+        # credentials work; task roles often only grant InvokeModel.
         try:
-            self.client.list_foundation_models()
+            if hasattr(self.client, "list_foundation_models"):
+                self.client.list_foundation_models()
+            else:
+                if self._control is None:
+                    self._control = boto3.client("bedrock", region_name=self.region)
+                self._control.list_foundation_models(byOutputModality="TEXT")
             return True
+        except ClientError as e:
+            return e.response.get("Error", {}).get("Code") == "AccessDeniedException"
         except Exception:
             return False
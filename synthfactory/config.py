@@ -1,6 +1,6 @@
 from __future__ import annotations
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 import yaml
 
 
@@ -35,6 +35,13 @@ class OllamaCfg(BaseModel):
     base_url: str = "http://127.0.0.1:11434"
     model: str = "qwen2.5:1.5b-instruct"
     timeout_s: int = 60
+    # How long Ollama keeps the model loaded after a request ("30m", "-1" = forever).
+    keep_alive: str | None = "30m"
+    # Several Ollama hosts serving the same model; overrides base_url when set.
+    # Calls go to the least-loaded host; failing hosts are ejected until healthy.
+    endpoints: list[str] = Field(default_factory=list)
+    eject_after_failures: int = 2
+    eject_cooldown_s: float = 30.0
 
 
 class BedrockCfg(BaseModel):
@@ -45,10 +52,46 @@ class BedrockCfg(BaseModel):
     max_tokens: int = 4096
 
 
+class LLMGuardCfg(BaseModel):
+    # Total LLM wall time one document may spend before falling back locally (0 = unbounded).
+    doc_budget_s: float = 30.0
+    # Send a duplicate request if the first has not answered after this long (0 = off).
+    hedge_after_s: float = 0.0
+    max_hedges: int = 1
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_failure_rate: float = 0.5
+    breaker_slow_call_s: float = 10.0
+    breaker_cooldown_s: float = 30.0
+
+
+class LLMGovernorCfg(BaseModel):
+    # Host-wide limit shared by every process talking to the same backend.
+    enabled: bool = True
+    max_inflight: int = 4
+    rate_per_s: float = 0.0  # 0 = no rate limit, only the in-flight cap
+    burst: int = 4
+    state_dir: str | None = None  # default: <tmp>/synthdocs-llm
+    lease_s: float = 600.0
+
+
 class LLMProviderCfg(BaseModel):
     provider: str = "ollama"
     ollama: OllamaCfg = Field(default_factory=OllamaCfg)
     bedrock: BedrockCfg = Field(default_factory=BedrockCfg)
+    guard: LLMGuardCfg = Field(default_factory=LLMGuardCfg)
+    governor: LLMGovernorCfg = Field(default_factory=LLMGovernorCfg)
+    # Resolve explicit prompt facts (colours, alignment, company...) locally and
+    # only ask the LLM for scenario fields the parser could not read.
+    local_parse: bool = True
+    # Share one in-flight call between concurrent identical requests in this process.
+    coalesce: bool = True
+    # Load the model once before the first document.
+    warmup: bool = True
+    # Provider health is re-probed at most this often; while down, documents skip the LLM.
+    health_ttl_s: float = 15.0
+    # Append every LLM call to this cassette file (see synthfactory.llm_stub).
+    record_cassette: str | None = None
 
 
 class LocalOutputCfg(BaseModel):
@@ -69,12 +112,49 @@ class JpgCfg(BaseModel):
     width: int = 1654
     height: int = 2339
     quality: int = 85
+    # Render at this DPI instead of width x height (200 = 1654x2339 A4; 72 for quick previews).
+    dpi: int | None = None
+    # Extra [width, height] outputs derived from the width x height render.
+    resolutions: list[tuple[int, int]] = Field(default_factory=list)
+    # Page image format: "jpeg", "webp", "png" or "tiff" (one multi-page file per document).
+    format: str = "jpeg"
+    # JPEG chroma subsampling: "4:4:4", "4:2:2" or "4:2:0".
+    subsampling: str = "4:2:0"
+    # Encoder effort: WebP method (0-6), PNG zlib level (0-9); JPEG optimizes its Huffman tables at 6+.
+    effort: int = 4
+    # TIFF compression for grey/colour pages; bilevel pages always use group4.
+    tiff_compression: str = "tiff_deflate"
 
 
 class RenderCfg(BaseModel):
     watermark_text: str = "SYNTHETIC TEST DOCUMENT • NOT REAL • FOR TESTING ONLY"
     page_size: str = "A4"
     jpg: JpgCfg = JpgCfg()
+    # Memory for cached page backgrounds/watermarks/headers shared across pages and documents.
+    layer_cache_mb: int = 128
+    # JPG pages in "rgb", "l" (grayscale) or "1" (bilevel: rendered and noised
+    # in grayscale, then dithered or thresholded at bilevel_threshold).
+    color_mode: str = "rgb"
+    bilevel: str = "dither"
+    bilevel_threshold: int = 160
+    # Threads rendering and degrading the pages of one statement concurrently.
+    page_workers: int = 4
+    # Write <doc_id>.boxes.json: word/line boxes with field names, after noise.
+    text_boxes: bool = True
+    # Render and degrade pages in bands of this many rows (0 = whole pages);
+    # bounds memory per page at high DPI.
+    band_height: int = 0
+
+    @model_validator(mode="after")
+    def _bilevel_needs_lossless_format(self) -> RenderCfg:
+        # JPEG has no 1-bit mode and WebP has no 1-bit or grey mode: Pillow
+        # would quietly save a lossy grey JPEG or an RGB WebP instead.
+        fmt = str(self.jpg.format).lower()
+        if str(self.color_mode) == "1" and fmt in ("jpeg", "webp"):
+            raise ValueError(
+                f'render.color_mode "1" needs render.jpg.format png or tiff, not {fmt!r}'
+            )
+        return self
 
 
 class NoiseCfg(BaseModel):
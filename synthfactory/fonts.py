@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from functools import cache, lru_cache
+from typing import Any
+
+from PIL import Image, ImageDraw, ImageFont
+
+SANS = "DejaVuSans.ttf"
+MONO = "DejaVuSansMono.ttf"
+
+_warned: set[str] = set()
+_warn_lock = threading.Lock()
+
+
+@cache
+def font_path(name: str) -> str | None:
+    """Resolve a font file once per process (None if it cannot be found).
+
+    Pillow searches the system font directories when ``name`` is not a path;
+    doing that on every call is what made missing fonts expensive.
+    """
+    try:
+        return ImageFont.truetype(name, 10).path
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def load_font(name: str, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Shared face for (font, size); Pillow's bitmap default if the font is missing."""
+    path = font_path(name)
+    if path is not None:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass  # unreadable file: fall back below
+    with _warn_lock:
+        if name not in _warned:
+            _warned.add(name)
+            print(f"Font {name!r} not found; falling back to Pillow's default font.")
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4)
+def _measure(mode: str) -> ImageDraw.ImageDraw:
+    return ImageDraw.Draw(Image.new(mode, (1, 1)))
+
+
+@lru_cache(maxsize=8192)
+def text_length(text: str, name: str, size: int, mode: str = "RGB") -> float:
+    """``ImageDraw.textlength`` for ``text`` in (font, size), memoized."""
+    return _measure(mode).textlength(text, font=load_font(name, size))
+
+
+def _rasterize(font, text: str, fontmode: str) -> tuple[Image.Image, tuple[int, int]] | None:
+    """Alpha mask of ``text`` and its offset from the draw position (None if blank).
+
+    ``ImageDraw.bitmap(xy + offset, mask)`` gives the same pixels as
+    ``ImageDraw.text(xy, text)`` for integral ``xy``.
+    """
+    left, top, right, bottom = font.getbbox(text)
+    if right <= left or bottom <= top:
+        return None
+    mask = Image.new(fontmode, (right - left, bottom - top), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255 if fontmode == "L" else 1)
+    return mask, (left, top)
+
+
+@lru_cache(maxsize=8192)
+def text_bbox(text: str, name: str, size: int) -> tuple[int, int, int, int]:
+    """Ink box of single-line ``text`` drawn at (0, 0), memoized.
+
+    ``getbbox`` alone spans the glyphs' advance boxes (side bearings, and down
+    to the baseline for marks like "•"); the mask it offsets is the ink.
+    """
+    font = load_font(name, size)
+    left, top, _, _ = font.getbbox(text)
+    ink = font.getmask(text, "L").getbbox()
+    if ink is None:
+        return left, top, left, top
+    return left + ink[0], top + ink[1], left + ink[2], top + ink[3]
+
+
+@lru_cache(maxsize=64)
+def line_spacing(name: str, size: int) -> int:
+    """Distance between lines of a multi-line ``ImageDraw.text`` (default spacing)."""
+    return load_font(name, size).getbbox("A")[3] + 4
+
+
+# Pre-rasterized up front; anything else is added on first use.
+ATLAS_CHARS = "0123456789£$€.,-+()/:%"
+
+
+class GlyphAtlas:
+    """Alpha masks of single glyphs for one (font, size, font mode).
+
+    Pasting a mask at ``xy + offset`` with ``ImageDraw.bitmap`` gives the same
+    pixels as ``ImageDraw.text(xy, ch)``, without Pillow's per-call layout and
+    rasterization.
+    """
+
+    def __init__(self, name: str, size: int, fontmode: str = "L"):
+        self.font = load_font(name, size)
+        self.fontmode = fontmode
+        self._glyphs: dict[str, tuple[Image.Image, tuple[int, int]] | None] = {}
+        self._lock = threading.Lock()
+        for ch in ATLAS_CHARS:
+            self.glyph(ch)
+
+    def glyph(self, ch: str) -> tuple[Image.Image, tuple[int, int]] | None:
+        try:
+            return self._glyphs[ch]
+        except KeyError:
+            pass
+        g = _rasterize(self.font, ch, self.fontmode)
+        with self._lock:
+            self._glyphs[ch] = g
+        return g
+
+
+@lru_cache(maxsize=64)
+def glyph_atlas(name: str, size: int, fontmode: str = "L") -> GlyphAtlas:
+    return GlyphAtlas(name, size, fontmode)
+
+
+class TextMaskCache:
+    """Rasterized strings (dates, descriptions, labels) reused across rows and pages.
+
+    A string is only rasterized into the cache the second time it is asked
+    for; until then ``get`` returns None and the caller draws it with
+    ``ImageDraw.text``. Caching on first sight would make every one-off
+    string (amounts, letter prose) half as slow again.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._masks: OrderedDict[tuple, tuple[Image.Image, tuple[int, int]] | None] = OrderedDict()
+        self._seen: OrderedDict[tuple, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str, name: str, size: int, fontmode: str = "L") -> tuple[Image.Image, tuple[int, int]] | None:
+        if "\n" in text:
+            return None  # ImageDraw.text lays these out line by line; getbbox does not
+        key = (text, name, size, fontmode)
+        with self._lock:
+            if key in self._masks:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return self._masks[key]
+            self.misses += 1
+            if key not in self._seen:
+                self._seen[key] = None
+                if len(self._seen) > 2 * self.max_entries:
+                    self._seen.popitem(last=False)
+                return None
+            del self._seen[key]
+        mask = _rasterize(load_font(name, size), text, fontmode)
+        with self._lock:
+            self._masks[key] = mask
+            if len(self._masks) > self.max_entries:
+                self._masks.popitem(last=False)
+        return mask
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._masks), "hits": self.hits, "misses": self.misses}
+
+
+# Shared by every render in the process, like the glyph atlases.
+text_masks = TextMaskCache()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from PIL import Image
+
+
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class LayerCache:
+    """Bounded LRU of pre-composited page layers.
+
+    ``get`` hands out a copy, so callers draw on it freely; the cached image is
+    never modified. The bound is in bytes because a single A4 page at 200 dpi
+    is already ~11 MB in RGB.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 2**20):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[Hashable, Image.Image] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Image.Image]) -> Image.Image:
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return img.copy()
+            self.misses += 1
+        img = build()
+        self._put(key, img)
+        return img.copy()
+
+    def _put(self, key: Hashable, img: Image.Image):
+        size = _image_bytes(img)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= _image_bytes(old)
+            self._items[key] = img
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= _image_bytes(evicted)
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._items and self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= _image_bytes(evicted)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared by every render in the process (statement pages, letters, jobs).
+page_layers = LayerCache()
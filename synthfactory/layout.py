@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+from PIL import Image
+
+from .branding import Theme
+from .models import LetterDoc, StatementDoc
+
+# Layout units are 1/200 inch; an A4 page is 1654 x 2339 of them, which is
+# also the default JPG size, so JPG pages replay the layout 1:1. Other
+# sizes and DPIs scale it (see scale_page).
+UNITS_PER_INCH = 200
+A4 = (1654, 2339)
+
+RGB = tuple[int, int, int]
+BLACK: RGB = (0, 0, 0)
+
+
+@dataclass(frozen=True)
+class Text:
+    """A single line of text; ``y`` is the top of the line box.
+
+    ``anchor`` says what ``x`` is: the left edge, the right edge or the centre.
+    ``jitter`` marks digit runs a raster backend may draw with font jitter.
+    ``fields`` pairs ground-truth field names with the part of ``text`` that
+    shows their value, for word boxes.
+    """
+
+    x: float
+    y: float
+    text: str
+    size: int
+    face: str = "sans"
+    fill: RGB = BLACK
+    anchor: str = "left"
+    jitter: bool = False
+    fields: tuple[tuple[str, str], ...] = ()
+
+
+@dataclass(frozen=True)
+class Line:
+    points: tuple[float, ...]
+    fill: RGB = BLACK
+    width: int = 1
+
+
+@dataclass(frozen=True)
+class Rect:
+    box: tuple[float, float, float, float]
+    fill: RGB | None = None
+    outline: RGB | None = None
+    width: int = 1
+
+
+@dataclass(frozen=True)
+class Ellipse:
+    box: tuple[float, float, float, float]
+    fill: RGB | None = None
+    outline: RGB | None = None
+    width: int = 1
+
+
+@dataclass(frozen=True)
+class Polygon:
+    points: tuple[tuple[float, float], ...]
+    outline: RGB | None = None
+    fill: RGB | None = None
+
+
+Op = Text | Line | Rect | Ellipse | Polygon
+
+
+@dataclass(frozen=True)
+class Page:
+    """One laid-out page.
+
+    ``layers`` hold the parts repeated across pages and documents (watermark,
+    header), bottom first, so backends can cache them; ``ops`` are the rest.
+    """
+
+    size: tuple[int, int]
+    paper: RGB
+    layers: tuple[tuple[Op, ...], ...]
+    ops: tuple[Op, ...]
+
+
+def page_pixels(size: tuple[int, int], dpi: float) -> tuple[int, int]:
+    """Pixel size of a page of ``size`` layout units rasterized at ``dpi``."""
+    return round(size[0] * dpi / UNITS_PER_INCH), round(size[1] * dpi / UNITS_PER_INCH)
+
+
+def _scale_op(op: Op, s: float) -> Op:
+    if isinstance(op, Text):
+        return replace(op, x=round(op.x * s), y=round(op.y * s), size=max(1, round(op.size * s)))
+    if isinstance(op, Line):
+        return replace(op, points=tuple(round(v * s) for v in op.points), width=max(1, round(op.width * s)))
+    if isinstance(op, (Rect, Ellipse)):
+        return replace(op, box=tuple(round(v * s) for v in op.box), width=max(1, round(op.width * s)))
+    return replace(op, points=tuple((round(x * s), round(y * s)) for x, y in op.points))
+
+
+def scale_page(page: Page, s: float) -> Page:
+    """``page`` with every coordinate and size multiplied by ``s`` and rounded.
+
+    Raster backends use it to draw the same layout at any DPI; whole-pixel
+    positions keep the text mask cache usable.
+    """
+    if s == 1:
+        return page
+    return Page(
+        size=(round(page.size[0] * s), round(page.size[1] * s)),
+        paper=page.paper,
+        layers=tuple(tuple(_scale_op(op, s) for op in layer) for layer in page.layers),
+        ops=tuple(_scale_op(op, s) for op in page.ops),
+    )
+
+
+def op_rows(op: Op) -> tuple[float, float]:
+    """Generous vertical extent of ``op``: nothing it draws falls outside it."""
+    if isinstance(op, Text):
+        return op.y - op.size, op.y + (op.text.count("\n") + 2) * 2 * op.size
+    if isinstance(op, Line):
+        ys = op.points[1::2]
+        return min(ys) - op.width, max(ys) + op.width
+    if isinstance(op, (Rect, Ellipse)):
+        return op.box[1] - op.width, op.box[3] + op.width
+    ys = [y for _, y in op.points]
+    return min(ys) - 1, max(ys) + 1
+
+
+def shift_op(op: Op, dy: float) -> Op:
+    """``op`` moved down by ``dy``."""
+    if dy == 0:
+        return op
+    if isinstance(op, Text):
+        return replace(op, y=op.y + dy)
+    if isinstance(op, Line):
+        return replace(op, points=tuple(v + dy if i % 2 else v for i, v in enumerate(op.points)))
+    if isinstance(op, (Rect, Ellipse)):
+        x0, y0, x1, y1 = op.box
+        return replace(op, box=(x0, y0 + dy, x1, y1 + dy))
+    return replace(op, points=tuple((x, y + dy) for x, y in op.points))
+
+
+def paper_colour(tint) -> RGB:
+    """Page colour for a theme tint: white with 8% of the tint blended in."""
+    if not tint:
+        return (255, 255, 255)
+    px = Image.blend(Image.new("RGB", (1, 1), (255, 255, 255)), Image.new("RGB", (1, 1), tuple(tint)), alpha=0.08)
+    return px.getpixel((0, 0))
+
+
+def wrap(text: str, width: int) -> list[str]:
+    words = text.split()
+    lines, cur, n = [], [], 0
+    for w in words:
+        if n + len(w) + (1 if cur else 0) > width:
+            lines.append(" ".join(cur)); cur=[w]; n=len(w)
+        else:
+            cur.append(w); n += len(w) + (1 if len(cur)>1 else 0)
+    if cur: lines.append(" ".join(cur))
+    return lines
+
+
+def money(v: float) -> str:
+    return f"£{v:,.2f}"
+
+
+def header_ops(theme: Theme, title: str, x: float, y: float, page_w: float) -> tuple[Op, ...]:
+    """Company name, page title and logo mark."""
+    accent = tuple(theme.accent_rgb)
+    name = (("company_name", theme.company_name),)
+    if theme.header_alignment == "center":
+        ops: list[Op] = [
+            Text(page_w/2, y, theme.company_name, 44, fill=accent, anchor="center", fields=name),
+            Text(page_w/2, y+54, title, 20, anchor="center"),
+        ]
+        lx = (page_w//2) - 70
+    elif theme.header_alignment == "right":
+        ops = [
+            Text(page_w - 80, y, theme.company_name, 44, fill=accent, anchor="right", fields=name),
+            Text(page_w - 80, y+54, title, 20, anchor="right"),
+        ]
+        lx = page_w - 240
+    else:
+        ops = [
+            Text(x, y, theme.company_name, 44, fill=accent, fields=name),
+            Text(x, y+54, title, 20),
+        ]
+        lx = x-60
+
+    ly = y+8
+    if theme.logo_style == "nb_bars":
+        for i in range(3):
+            ops.append(Rect((lx+i*16, ly, lx+i*16+10, ly+40), fill=accent))
+    elif theme.logo_style == "c_circle":
+        ops.append(Ellipse((lx, ly, lx+46, ly+46), outline=accent, width=4))
+        ops.append(Ellipse((lx+17, ly+17, lx+29, ly+29), fill=accent))
+    elif theme.logo_style == "h_wave":
+        ops.append(Line((lx, ly+24, lx+18, ly+6, lx+36, ly+38, lx+54, ly+20), fill=accent, width=4))
+    elif theme.logo_style == "a_triangle":
+        ops.append(Polygon(((lx+22, ly+44), (lx+2, ly+4), (lx+42, ly+4)), outline=accent))
+    else:
+        ops.append(Line((lx+4, ly+44, lx+44, ly+4), fill=accent, width=5))
+    return tuple(ops)
+
+
+def _page(size, theme: Theme, watermark: str, title: str, ops: list[Op]) -> Page:
+    return Page(
+        size=size,
+        paper=paper_colour(theme.paper_tint_rgb),
+        layers=(
+            (Text(60, 60, watermark, 26, fill=(210, 210, 210)),),
+            header_ops(theme, title, 120, 120, page_w=size[0]),
+        ),
+        ops=tuple(ops),
+    )
+
+
+def layout_statement(stmt: StatementDoc, watermark: str, theme: Theme, rows_per_page: int = 40,
+                     pages_max: int = 4, size: tuple[int, int] = A4) -> list[Page]:
+    width, height = size
+    rows_per_page = max(10, rows_per_page)
+    chunks = [stmt.transactions[i:i+rows_per_page] for i in range(0, len(stmt.transactions), rows_per_page)]
+    chunks = chunks[:max(1, pages_max)]
+
+    pages: list[Page] = []
+    for pi, txns in enumerate(chunks, start=1):
+        ops: list[Op] = []
+        y = 120 + 90  # below the header
+        issued = stmt.issue_date.strftime('%d %b %Y')
+        p_from, p_to = stmt.period_from.strftime('%d %b %Y'), stmt.period_to.strftime('%d %b %Y')
+        account_fields = (("sort_code", stmt.account.sort_code), ("account_number", stmt.account.account_number))
+        ops.append(Text(80, y, f"Issue date: {issued}", 18, fields=(("issue_date", issued),))); y += 28
+        ops.append(Text(80, y, f"Period: {p_from} to {p_to}", 18, fields=(("period_from", p_from), ("period_to", p_to)))); y += 45
+
+        if pi == 1:
+            ops.append(Text(80, y, stmt.owner.full_name, 22, fields=(("owner_full_name", stmt.owner.full_name),))); y += 30
+            for i, line in enumerate(stmt.owner.address_lines[:3]):
+                ops.append(Text(80, y, line[:80], 18, fields=((f"owner_address_lines[{i}]", line[:80]),))); y += 26
+            ops.append(Text(80, y, f"{stmt.owner.city}  {stmt.owner.postcode}", 18,
+                            fields=(("owner_city", stmt.owner.city), ("owner_postcode", stmt.owner.postcode)))); y += 40
+            ops.append(Text(80, y, f"Sort code: {stmt.account.sort_code}    Account: {stmt.account.account_number}", 18,
+                            fields=account_fields)); y += 45
+            ops.append(Text(80, y, f"Opening balance: {money(stmt.opening_balance)}", 18,
+                            fields=(("opening_balance", money(stmt.opening_balance)),))); y += 26
+            ops.append(Text(80, y, f"Closing balance: {money(stmt.closing_balance)}", 18,
+                            fields=(("closing_balance", money(stmt.closing_balance)),))); y += 40
+        else:
+            ops.append(Text(80, y, f"Sort code: {stmt.account.sort_code}    Account: {stmt.account.account_number}", 18,
+                            fields=account_fields)); y += 50
+
+        for x, label in ((80, "Date"), (240, "Description"), (1100, "Paid in"), (1250, "Paid out"), (1420, "Balance")):
+            ops.append(Text(x, y, label, 16))
+        y += 22
+        ops.append(Line((80, y, width-80, y), fill=(120, 120, 120), width=2))
+        y += 18
+
+        for k, t in enumerate(txns, start=(pi - 1) * rows_per_page):
+            cells = (
+                (80, t.txn_date.strftime('%d %b %Y'), "txn_date", False),
+                (240, t.description[:55], "description", False),
+                (1100, money(t.paid_in) if t.paid_in else "", "paid_in", True),
+                (1250, money(t.paid_out) if t.paid_out else "", "paid_out", True),
+                (1420, money(t.running_balance), "running_balance", True),
+            )
+            for x, text, field, jitter in cells:
+                ops.append(Text(x, y, text, 16, jitter=jitter, fields=((f"transactions[{k}].{field}", text),)))
+            y += 24
+            if y > height - 260:
+                break
+
+        if pi == len(chunks):
+            y += 20
+            ops.append(Text(80, y, "Notes:", 16)); y += 26
+            for n in stmt.footer_notes[:6]:
+                ops.append(Text(95, y, f"• {n}"[:110], 16)); y += 22
+
+        pages.append(_page(size, theme, watermark, f"Statement (page {pi}/{len(chunks)})", ops))
+    return pages
+
+
+def layout_letter(letter: LetterDoc, watermark: str, theme: Theme, size: tuple[int, int] = A4) -> list[Page]:
+    width, height = size
+    ops: list[Op] = []
+    y = 120 + 90  # below the header
+
+    issued = letter.issue_date.strftime('%d %b %Y')
+    ops.append(Text(80, y, f"Date: {issued}", 18, fields=(("issue_date", issued),))); y += 50
+    ops.append(Text(80, y, letter.owner.full_name, 22, fields=(("owner_full_name", letter.owner.full_name),))); y += 30
+    for i, line in enumerate(letter.owner.address_lines[:3]):
+        ops.append(Text(80, y, line[:80], 18, fields=((f"owner_address_lines[{i}]", line[:80]),))); y += 26
+    ops.append(Text(80, y, f"{letter.owner.city}  {letter.owner.postcode}", 18,
+                    fields=(("owner_city", letter.owner.city), ("owner_postcode", letter.owner.postcode)))); y += 50
+
+    subject = f"Subject: {letter.subject}"[:110]
+    ops.append(Text(80, y, subject, 22, fields=(("subject", subject[len("Subject: "):]),))); y += 40
+
+    sc = letter.display_sort_code or letter.account.sort_code
+    an = letter.display_account_number or letter.account.account_number
+    ops.append(Text(80, y, f"Sort code: {sc}", 18, jitter=True, fields=(("sort_code", sc),))); y += 26
+    ops.append(Text(80, y, f"Account no: {an}", 18, jitter=True, fields=(("account_number", an),))); y += 50
+
+    for pi, para in enumerate(letter.body_paragraphs[:7]):
+        for line in wrap(para, 92):
+            ops.append(Text(80, y, line, 18, fields=((f"body_paragraphs[{pi}]", line),))); y += 24
+            if y > height - 420:
+                break
+        y += 16
+        if y > height - 420:
+            break
+
+    if letter.table_headers and letter.table_rows and y < height - 360:
+        ops.append(Text(80, y, (letter.table_title or "Details")[:60], 22)); y += 34
+        cols = len(letter.table_headers)
+        col_w = (width - 160) // max(1, cols)
+        ops.append(Rect((80, y, width-80, y+28), fill=(245, 245, 245), outline=(160, 160, 160)))
+        for i, hdr in enumerate(letter.table_headers):
+            ops.append(Text(85 + i*col_w, y+6, str(hdr)[:18], 16, fields=((f"table_headers[{i}]", str(hdr)[:18]),)))
+        y += 28
+        for ri, r in enumerate(letter.table_rows[:10]):
+            ops.append(Rect((80, y, width-80, y+26), outline=(210, 210, 210)))
+            for i, cell in enumerate(r[:cols]):
+                ops.append(Text(85 + i*col_w, y+5, str(cell)[:22], 16, fields=((f"table_rows[{ri}][{i}]", str(cell)[:22]),)))
+            y += 26
+            if y > height - 260:
+                break
+        y += 18
+
+    if letter.optional_lines and y < height - 240:
+        ops.append(Text(80, y, "Additional information", 22)); y += 34
+        for l in letter.optional_lines[:10]:
+            ops.append(Text(95, y, f"• {l}"[:110], 16)); y += 22
+            if y > height - 220:
+                break
+
+    y += 24
+    ops.append(Text(80, y, "Yours sincerely,", 18)); y += 70
+    ops.append(Text(80, y, "Customer Support (Synthetic)", 22))
+
+    return [_page(size, theme, watermark, "Letter", ops)]
@@ -1,18 +1,56 @@
 from __future__ import annotations
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import Any
 
+# Process-wide health status, keyed by LLMClient.cache_key(), so every job that
+# talks to the same backend shares one probe per TTL.
+_health: dict[tuple, tuple[float, bool]] = {}
+_health_lock = threading.Lock()
+
+
+
+@dataclass
+class CallScope:
+    """Deadline and cancellation of the ``generate`` running in this context.
+
+    Set by callers that bound LLM time (``GuardedLLMClient``); layers that
+    wait (governor slots) give up when it runs out or is cancelled.
+    """
+
+    deadline: float | None = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+    def time_left(self) -> float | None:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+
+call_scope: ContextVar[CallScope | None] = ContextVar("llm_call_scope", default=None)
+
+
+class SlotWaitTimeout(TimeoutError):
+    """A local wait (governor slot, Bedrock limiter or retry backoff) ran out
+    of the call's budget or was cancelled; it says nothing about the backend."""
+
 
 class LLMClient(ABC):
     @abstractmethod
     def generate(
-        self, prompt: str, schema: dict[str, Any] | None = None
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
     ) -> dict[str, Any]:
         """Generate a response from the LLM given a prompt.
 
         Args:
             prompt: The prompt to send to the LLM
             schema: Optional JSON schema for the expected response
+            system: Optional instructions that stay the same across calls;
+                providers that cache prompt prefixes keep it ahead of ``prompt``
 
         Returns:
             Parsed JSON response as a dictionary
@@ -25,3 +63,52 @@ class LLMClient(ABC):
         Returns:
             True if the service is healthy, False otherwise
         """
+
+    def cache_key(self) -> tuple:
+        """Identity of the backend this client talks to.
+
+        Clients with equal keys share cached health status.
+        """
+        return (type(self).__name__, id(self))
+
+    def warm_up(self) -> bool:
+        """Prepare the backend for the first real request.
+
+        The default only checks health; providers that load models on demand
+        override this. The outcome is cached like ``is_healthy``.
+
+        Returns:
+            True if the service is ready, False otherwise
+        """
+        ok = self.health_check()
+        self.remember_health(ok)
+        return ok
+
+    def close(self):
+        """Release what the client holds (worker threads, unsaved recordings).
+
+        Wrappers close the client they wrap; the default has nothing to do.
+        """
+        inner = getattr(self, "inner", None)
+        if inner is not None:
+            inner.close()
+
+    def is_healthy(self, ttl_s: float = 15.0) -> bool:
+        """``health_check`` cached for ``ttl_s`` seconds per backend."""
+        with _health_lock:
+            hit = _health.get(self.cache_key())
+        if hit and time.monotonic() - hit[0] < ttl_s:
+            return hit[1]
+        ok = self.health_check()
+        self.remember_health(ok)
+        return ok
+
+    def last_health(self) -> bool | None:
+        """Most recent cached health status, without probing (None if never checked)."""
+        with _health_lock:
+            hit = _health.get(self.cache_key())
+        return hit[1] if hit else None
+
+    def remember_health(self, ok: bool):
+        with _health_lock:
+            _health[self.cache_key()] = (time.monotonic(), bool(ok))
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import copy
+import json
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .llm_client import LLMClient, SlotWaitTimeout
+
+
+@dataclass
+class FlightStats:
+    calls: int = 0
+    leaders: int = 0
+    shared: int = 0
+    reran: int = 0
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key
+    wait for that call and receive its result (or its exception).
+
+    If the leader fails with one of ``rerun_on``, a failure of the leader's
+    own circumstances, each waiter makes its own call instead.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Any, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = FlightStats()
+
+    def do(self, key: Any, fn: Callable[[], Any], rerun_on: tuple[type[BaseException], ...] = ()) -> Any:
+        with self._lock:
+            self.stats.calls += 1
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.stats.leaders += 1
+            else:
+                self.stats.shared += 1
+
+        if not leader:
+            try:
+                # Results are dicts; give each waiter its own copy.
+                return copy.deepcopy(fut.result())
+            except rerun_on:
+                with self._lock:
+                    self.stats.reran += 1
+                return fn()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def report(self) -> dict[str, int]:
+        with self._lock:
+            return asdict(self.stats)
+
+
+# One table per process, so concurrent jobs (each with its own client) coalesce.
+_flights = SingleFlight()
+
+
+class CoalescingLLMClient(LLMClient):
+    """Coalesces identical concurrent ``generate`` calls to the same backend.
+
+    Prompts are compared verbatim, variation seed included, so only
+    requests that really are the same (the seed-free TemplateDesigner
+    prompt, or scenarios whose variation slot matches) share an answer.
+    A waiter whose leader gave up on its own budget or cancellation
+    (``SlotWaitTimeout``) makes its own call within its own budget.
+    """
+
+    def __init__(self, inner: LLMClient, flights: SingleFlight | None = None):
+        self.inner = inner
+        self.flights = flights or _flights
+
+    def generate(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
+    ) -> dict[str, Any]:
+        key = (
+            self.inner.cache_key(),
+            system,
+            prompt,
+            json.dumps(schema, sort_keys=True) if schema else None,
+        )
+        return self.flights.do(
+            key, lambda: self.inner.generate(prompt, schema, system), rerun_on=(SlotWaitTimeout,)
+        )
+
+    def generate_uncoalesced(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
+    ) -> dict[str, Any]:
+        """Always issue a new request (hedges must not join the call they hedge)."""
+        return self.inner.generate(prompt, schema, system)
+
+    def health_check(self) -> bool:
+        return self.inner.health_check()
+
+    def cache_key(self) -> tuple:
+        return self.inner.cache_key()
+
+    def warm_up(self) -> bool:
+        return self.inner.warm_up()
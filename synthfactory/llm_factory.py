@@ -1,7 +1,11 @@
 from __future__ import annotations
 from typing import Any
 
+from .config import AppCfg
 from .llm_client import LLMClient
+from .llm_coalesce import CoalescingLLMClient
+from .llm_governor import GovernedLLMClient, get_governor
+from .llm_pool import get_pool
 from .ollama_client import OllamaClient
 from .bedrock_client import BedrockClient
 
@@ -11,19 +15,106 @@ def create_llm_client(
     ollama_base_url: str = "http://127.0.0.1:11434",
     ollama_model: str = "qwen2.5:1.5b-instruct",
     ollama_timeout: int = 60,
+    ollama_keep_alive: str | None = "30m",
     bedrock_region: str = "eu-west-1",
     bedrock_model_id: str = "anthropic.claude-3-sonnet-20240307",
     bedrock_temperature: float = 0.7,
+    record_cassette: str | None = None,
 ) -> LLMClient:
     if provider == "bedrock":
-        return BedrockClient(
+        client: LLMClient = BedrockClient(
             region=bedrock_region,
             model_id=bedrock_model_id,
             temperature=bedrock_temperature,
         )
+        model = bedrock_model_id
     else:
-        return OllamaClient(
+        client = OllamaClient(
             base_url=ollama_base_url,
             model=ollama_model,
             timeout_s=ollama_timeout,
+            keep_alive=ollama_keep_alive,
         )
+        model = ollama_model
+
+    if record_cassette:
+        from .llm_stub import Cassette, RecordingLLMClient
+
+        provider_name = "bedrock" if provider == "bedrock" else "ollama"
+        client = RecordingLLMClient(
+            client, Cassette(record_cassette), provider=provider_name, model=model
+        )
+    return client
+
+
+def _governed(cfg: AppCfg, client: LLMClient) -> LLMClient:
+    gov = cfg.llm.governor
+    if not gov.enabled:
+        return client
+    return GovernedLLMClient(
+        client,
+        get_governor(
+            client.cache_key(),
+            state_dir=gov.state_dir,
+            max_inflight=gov.max_inflight,
+            rate_per_s=gov.rate_per_s,
+            burst=gov.burst,
+            lease_s=gov.lease_s,
+        ),
+    )
+
+
+def llm_client_from_config(cfg: AppCfg) -> LLMClient:
+    ollama = cfg.llm.ollama
+    if cfg.llm.provider == "ollama" and len(ollama.endpoints) > 1:
+        # One governor per host, so each box keeps its own in-flight cap.
+        client: LLMClient = get_pool(
+            (
+                tuple(ollama.endpoints),
+                ollama.model,
+                ollama.timeout_s,
+                ollama.keep_alive,
+                cfg.llm.governor.enabled,
+                ollama.eject_after_failures,
+                ollama.eject_cooldown_s,
+            ),
+            lambda: [
+                (url, _governed(cfg, OllamaClient(url, ollama.model, ollama.timeout_s, ollama.keep_alive)))
+                for url in ollama.endpoints
+            ],
+            eject_after=ollama.eject_after_failures,
+            eject_cooldown_s=ollama.eject_cooldown_s,
+        )
+        if cfg.llm.record_cassette:
+            from .llm_stub import Cassette, RecordingLLMClient
+
+            client = RecordingLLMClient(
+                client, Cassette(cfg.llm.record_cassette), provider="ollama", model=ollama.model
+            )
+    else:
+        client = _governed(
+            cfg,
+            create_llm_client(
+                provider=cfg.llm.provider,
+                ollama_base_url=ollama.endpoints[0] if ollama.endpoints else ollama.base_url,
+                ollama_model=ollama.model,
+                ollama_timeout=ollama.timeout_s,
+                ollama_keep_alive=ollama.keep_alive,
+                bedrock_region=cfg.llm.bedrock.region,
+                bedrock_model_id=cfg.llm.bedrock.model_id,
+                bedrock_temperature=cfg.llm.bedrock.temperature,
+                record_cassette=cfg.llm.record_cassette,
+            ),
+        )
+    if cfg.llm.coalesce:
+        client = CoalescingLLMClient(client)
+    return client
+
+
+def is_llm_enabled(cfg: AppCfg) -> bool:
+    return (
+        cfg.llm.provider == "ollama"
+        and cfg.llm.ollama.enabled
+        or cfg.llm.provider == "bedrock"
+        and cfg.llm.bedrock.enabled
+    )
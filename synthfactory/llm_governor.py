@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any
+
+from .llm_client import LLMClient, SlotWaitTimeout, call_scope
+
+try:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # EPERM: it exists but belongs to another user
+    return True
+
+
+class LLMGovernor:
+    """Host-wide token bucket plus in-flight cap for one LLM backend.
+
+    State lives in a JSON file guarded by an exclusive file lock, so every
+    process on the host that points at the same backend (same ``state_path``)
+    shares the budget. Slots held by processes that died, or held longer than
+    ``lease_s``, are reclaimed.
+    """
+
+    def __init__(
+        self,
+        state_path: Path,
+        max_inflight: int = 4,
+        rate_per_s: float = 0.0,
+        burst: int = 4,
+        lease_s: float = 600.0,
+        poll_s: float = 0.02,
+    ):
+        self.state_path = Path(state_path)
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_inflight = max(1, max_inflight)
+        self.rate_per_s = rate_per_s
+        self.burst = max(1, burst)
+        self.lease_s = lease_s
+        self.poll_s = poll_s
+        self._lock_path = self.state_path.with_suffix(".lock")
+        # flock is per open file, so threads of this process also need a mutex.
+        self._mutex = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=2000)
+        self._acquired = 0
+        self._wait_total = 0.0
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"tokens": float(self.burst), "updated": time.time(), "inflight": {},
+                    "acquired": 0, "wait_total_s": 0.0, "wait_max_s": 0.0}
+
+    def _write(self, state: dict[str, Any]):
+        tmp = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    def _locked(self, fn):
+        with self._mutex, open(self._lock_path, "a+") as lock_file:
+            _lock(lock_file)
+            try:
+                state = self._read()
+                out = fn(state)
+                self._write(state)
+                return out
+            finally:
+                _unlock(lock_file)
+
+    def _refill(self, state: dict[str, Any], now: float):
+        if self.rate_per_s > 0:
+            elapsed = max(0.0, now - state.get("updated", now))
+            state["tokens"] = min(float(self.burst), state.get("tokens", 0.0) + elapsed * self.rate_per_s)
+        state["updated"] = now
+        live = {}
+        for slot, (pid, started) in state.get("inflight", {}).items():
+            if now - started < self.lease_s and _pid_alive(pid):
+                live[slot] = (pid, started)
+        state["inflight"] = live
+
+    def acquire(self, timeout_s: float | None = None, cancelled: threading.Event | None = None) -> str:
+        """Take a slot, waiting at most ``timeout_s`` or until ``cancelled`` is set."""
+        t0 = time.monotonic()
+        slot = uuid.uuid4().hex
+
+        def attempt(state: dict[str, Any]) -> float:
+            now = time.time()
+            self._refill(state, now)
+            has_token = self.rate_per_s <= 0 or state["tokens"] >= 1.0
+            if has_token and len(state["inflight"]) < self.max_inflight:
+                if self.rate_per_s > 0:
+                    state["tokens"] -= 1.0
+                state["inflight"][slot] = (os.getpid(), now)
+                waited = time.monotonic() - t0
+                state["acquired"] = state.get("acquired", 0) + 1
+                state["wait_total_s"] = state.get("wait_total_s", 0.0) + waited
+                state["wait_max_s"] = max(state.get("wait_max_s", 0.0), waited)
+                return 0.0
+            if not has_token:
+                return (1.0 - state["tokens"]) / self.rate_per_s
+            return self.poll_s
+
+        while True:
+            sleep_s = self._locked(attempt)
+            if sleep_s == 0.0:
+                waited = time.monotonic() - t0
+                with self._mutex:
+                    self._waits.append(waited)
+                    self._acquired += 1
+                    self._wait_total += waited
+                return slot
+            if timeout_s is not None and time.monotonic() - t0 + sleep_s > timeout_s:
+                raise SlotWaitTimeout(f"no LLM slot within {timeout_s}s")
+            pause = min(max(sleep_s, self.poll_s), 0.25)
+            if cancelled is None:
+                time.sleep(pause)
+            elif cancelled.wait(pause):
+                raise SlotWaitTimeout("LLM call cancelled while waiting for a slot")
+
+    def release(self, slot: str):
+        def drop(state: dict[str, Any]):
+            state.setdefault("inflight", {}).pop(slot, None)
+
+        self._locked(drop)
+
+    def stats(self) -> dict[str, Any]:
+        with self._mutex:
+            waits = sorted(self._waits)
+            acquired, wait_total = self._acquired, self._wait_total
+        shared = self._locked(lambda st: (self._refill(st, time.time()), dict(st))[1])
+
+        def pct(q: float) -> float | None:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))], 4) if waits else None
+
+        return {
+            "acquired": acquired,
+            "queue_wait_total_s": round(wait_total, 4),
+            "queue_wait_p50_s": pct(0.50),
+            "queue_wait_p95_s": pct(0.95),
+            "queue_wait_max_s": round(waits[-1], 4) if waits else None,
+            "host": {
+                "inflight": len(shared.get("inflight", {})),
+                "acquired": shared.get("acquired", 0),
+                "queue_wait_total_s": round(shared.get("wait_total_s", 0.0), 4),
+                "queue_wait_max_s": round(shared.get("wait_max_s", 0.0), 4),
+            },
+        }
+
+
+_governors: dict[Path, LLMGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(
+    backend_key: tuple,
+    state_dir: str | None = None,
+    **params: Any,
+) -> LLMGovernor:
+    """Process-wide governor for a backend; the state file name is derived from the key."""
+    digest = hashlib.sha1(repr(backend_key).encode("utf-8")).hexdigest()[:12]
+    root = Path(state_dir) if state_dir else Path(tempfile.gettempdir()) / "synthdocs-llm"
+    path = root / f"governor-{digest}.json"
+    with _governors_lock:
+        gov = _governors.get(path)
+        if gov is None:
+            gov = _governors[path] = LLMGovernor(path, **params)
+        return gov
+
+
+class GovernedLLMClient(LLMClient):
+    """Routes every ``generate`` through an ``LLMGovernor`` slot."""
+
+    def __init__(self, inner: LLMClient, governor: LLMGovernor):
+        self.inner = inner
+        self.governor = governor
+
+    def generate(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
+    ) -> dict[str, Any]:
+        # Within a guarded call, wait no longer than its budget and stop
+        # waiting once the guard has given up on it (or a hedge has won).
+        scope = call_scope.get()
+        if scope is None:
+            slot = self.governor.acquire()
+        else:
+            slot = self.governor.acquire(timeout_s=scope.time_left(), cancelled=scope.cancelled)
+        try:
+            if scope is not None and scope.cancelled.is_set():
+                raise SlotWaitTimeout("LLM call cancelled")
+            return self.inner.generate(prompt, schema, system)
+        finally:
+            self.governor.release(slot)
+
+    def health_check(self) -> bool:
+        return self.inner.health_check()
+
+    def cache_key(self) -> tuple:
+        return self.inner.cache_key()
+
+    def warm_up(self) -> bool:
+        return self.inner.warm_up()
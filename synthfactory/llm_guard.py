@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .llm_client import CallScope, LLMClient, call_scope
+
+
+class LLMUnavailable(RuntimeError):
+    """Raised instead of calling the LLM; callers should take their local path."""
+
+
+class LLMDeadlineExceeded(LLMUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """Opens when the share of failed or slow calls in a rolling window is too high.
+
+    While open every call is refused. After ``cooldown_s`` a single probe is let
+    through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_s: float = 10.0,
+        cooldown_s: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call_s = slow_call_s
+        self.cooldown_s = cooldown_s
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=max(1, window))
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and self._clock() - self._opened_at >= self.cooldown_s:
+                self._state = "half_open"
+                self._probe_inflight = False
+            if self._state == "half_open" and not self._probe_inflight:
+                self._probe_inflight = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency_s: float):
+        bad = (not ok) or latency_s > self.slow_call_s
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_inflight = False
+                if bad:
+                    self._trip()
+                else:
+                    self._state = "closed"
+                    self._outcomes.clear()
+                return
+            if self._state == "open":
+                return
+            self._outcomes.append(bad)
+            n = len(self._outcomes)
+            if n >= self.min_calls and sum(self._outcomes) / n >= self.failure_rate:
+                self._trip()
+
+    def _trip(self):
+        self._state = "open"
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+
+@dataclass
+class GuardStats:
+    calls: int = 0
+    ok: int = 0
+    errors: int = 0
+    deadline_exceeded: int = 0
+    short_circuited: int = 0
+    hedges_sent: int = 0
+    hedge_wins: int = 0
+
+
+class GuardedLLMClient(LLMClient):
+    """Bounds the LLM time a single document may spend.
+
+    Call ``begin_document()`` once per document; every ``generate`` after that
+    shares the remaining budget. When the budget runs out, the breaker is open
+    or all attempts fail, ``LLMUnavailable`` is raised so the caller falls back
+    to its local path. With ``hedge_after_s`` set, a duplicate request is sent
+    if the first has not answered in time (or failed), and the first reply wins.
+    """
+
+    def __init__(
+        self,
+        inner: LLMClient,
+        doc_budget_s: float = 30.0,
+        hedge_after_s: float = 0.0,
+        max_hedges: int = 1,
+        breaker: CircuitBreaker | None = None,
+        max_workers: int = 4,
+    ):
+        self.inner = inner
+        self.doc_budget_s = doc_budget_s
+        self.hedge_after_s = hedge_after_s
+        self.max_hedges = max(0, max_hedges) if hedge_after_s > 0 else 0
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = GuardStats()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._deadline: float | None = None
+        self._lock = threading.Lock()
+
+    def begin_document(self):
+        self._deadline = (
+            time.monotonic() + self.doc_budget_s if self.doc_budget_s > 0 else None
+        )
+
+    def _count(self, field: str, n: int = 1):
+        with self._lock:
+            setattr(self.stats, field, getattr(self.stats, field) + n)
+
+    def generate(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
+    ) -> dict[str, Any]:
+        self._count("calls")
+        t0 = time.monotonic()
+        end = self._deadline if self._deadline is not None else float("inf")
+        if end - t0 <= 0:
+            self._count("deadline_exceeded")
+            raise LLMDeadlineExceeded("per-document LLM budget exhausted")
+
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+        scope = CallScope(deadline=self._deadline)
+        attempts = [self._submit(scope, self.inner.generate, prompt, schema, system)]
+        pending = set(attempts)
+        last_error: BaseException | None = None
+        try:
+            while True:
+                now = time.monotonic()
+                hedges_left = len(attempts) - 1 < self.max_hedges
+                wake = end
+                if hedges_left:
+                    wake = min(wake, t0 + self.hedge_after_s * len(attempts))
+                timeout = None if wake == float("inf") else max(0.0, wake - now)
+
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for f in done:
+                    err = f.exception()
+                    if err is None:
+                        self.breaker.record(True, time.monotonic() - t0)
+                        self._count("ok")
+                        if attempts.index(f) > 0:
+                            self._count("hedge_wins")
+                        return f.result()
+                    last_error = err
+
+                now = time.monotonic()
+                if now >= end:
+                    self.breaker.record(False, now - t0)
+                    self._count("deadline_exceeded")
+                    raise LLMDeadlineExceeded(
+                        f"LLM did not answer within the document budget ({self.doc_budget_s}s)"
+                    )
+
+                if hedges_left and (not pending or now >= t0 + self.hedge_after_s * len(attempts)):
+                    fresh = getattr(self.inner, "generate_uncoalesced", self.inner.generate)
+                    nxt = self._submit(scope, fresh, prompt, schema, system)
+                    attempts.append(nxt)
+                    pending.add(nxt)
+                    self._count("hedges_sent")
+                elif not pending:
+                    self.breaker.record(False, now - t0)
+                    self._count("errors")
+                    raise LLMUnavailable(f"LLM request failed: {last_error}") from last_error
+        finally:
+            # Losing hedges and attempts past the deadline: drop the ones not
+            # started yet and tell the rest to stop waiting for a slot.
+            scope.cancelled.set()
+            for f in pending:
+                f.cancel()
+
+    def _submit(self, scope: CallScope, fn, *args):
+        # Each attempt runs in the caller's context, so providers' usage lands
+        # on the caller's ledger entry, plus the call's deadline and cancel flag.
+        ctx = contextvars.copy_context()
+        ctx.run(call_scope.set, scope)
+        return self._pool.submit(ctx.run, fn, *args)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.inner.close()
+
+    def health_check(self) -> bool:
+        return self.inner.health_check()
+
+    def cache_key(self) -> tuple:
+        return self.inner.cache_key()
+
+    def warm_up(self) -> bool:
+        return self.inner.warm_up()
+
+    def report(self) -> dict[str, Any]:
+        out = asdict(self.stats)
+        out["breaker_state"] = self.breaker.state
+        out["breaker_opened"] = self.breaker.times_opened
+        return out
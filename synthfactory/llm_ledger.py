@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass
+class CallUsage:
+    """What one logical ``generate`` call cost; filled in by the providers.
+
+    Hedges and retries add to the same record, so the tokens are what the call
+    really consumed, not what one attempt consumed.
+    """
+
+    provider: str | None = None
+    model: str | None = None
+    attempts: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    parsed: bool = False
+    fallback: bool = False
+    responded: bool = False
+
+
+# Provider/model recorded for calls that never reached a provider: a
+# coalesced caller sharing another's answer, or a fallback taken before any
+# request went out (breaker open, deadline spent).
+NO_PROVIDER = "none"
+
+_current: ContextVar[CallUsage | None] = ContextVar("llm_call_usage", default=None)
+_usage_lock = threading.Lock()
+
+
+def note_usage(
+    provider: str,
+    model: str,
+    prompt_tokens: int | None = 0,
+    response_tokens: int | None = 0,
+    attempts: int = 0,
+    responded: bool = False,
+):
+    """Add provider-reported usage to the call in progress, if any.
+
+    ``responded`` marks that the provider returned a body, so a call that
+    then is not ``parsed`` counts as a parse failure.
+    """
+    usage = _current.get()
+    if usage is None:
+        return
+    with _usage_lock:
+        usage.provider = provider
+        usage.model = model
+        usage.attempts += attempts
+        usage.prompt_tokens += prompt_tokens or 0
+        usage.response_tokens += response_tokens or 0
+        usage.responded = usage.responded or responded
+
+
+@dataclass(frozen=True)
+class LLMCall:
+    caller: str
+    provider: str
+    model: str
+    attempts: int
+    prompt_tokens: int
+    response_tokens: int
+    latency_s: float
+    parsed: bool
+    fallback: bool
+    responded: bool = False
+
+
+class LLMLedger:
+    """Per-call LLM usage, aggregated by (caller, provider, model).
+
+    Calls recorded here are also recorded in ``parent``, so a run's ledger can
+    feed the process-wide one.
+    """
+
+    def __init__(self, parent: LLMLedger | None = None, keep: int = 1000):
+        self.parent = parent
+        self.recent: deque[LLMCall] = deque(maxlen=keep)
+        self._groups: dict[tuple[str, str, str], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def call(self, caller: str) -> Iterator[CallUsage]:
+        """Attribute the provider calls made inside the block to ``caller``.
+
+        The caller sets ``parsed`` / ``fallback`` on the yielded record; an
+        exception escaping the block counts as a fallback.
+        """
+        usage = CallUsage()
+        token = _current.set(usage)
+        t0 = time.perf_counter()
+        try:
+            yield usage
+        except BaseException:
+            usage.fallback = True
+            raise
+        finally:
+            _current.reset(token)
+            self.record(
+                LLMCall(
+                    caller=caller,
+                    provider=usage.provider or NO_PROVIDER,
+                    model=usage.model or NO_PROVIDER,
+                    attempts=usage.attempts,
+                    prompt_tokens=usage.prompt_tokens,
+                    response_tokens=usage.response_tokens,
+                    latency_s=time.perf_counter() - t0,
+                    parsed=usage.parsed,
+                    fallback=usage.fallback,
+                    responded=usage.responded,
+                )
+            )
+
+    def record(self, call: LLMCall):
+        with self._lock:
+            self.recent.append(call)
+            g = self._groups.get((call.caller, call.provider, call.model))
+            if g is None:
+                g = self._groups[(call.caller, call.provider, call.model)] = {
+                    "calls": 0,
+                    "attempts": 0,
+                    "fallbacks": 0,
+                    "parse_failures": 0,
+                    "prompt_tokens": 0,
+                    "response_tokens": 0,
+                    "latency_total_s": 0.0,
+                    "latencies": deque(maxlen=1000),
+                }
+            g["calls"] += 1
+            g["attempts"] += call.attempts
+            g["fallbacks"] += int(call.fallback)
+            # Only answers that came back unusable; fallbacks are counted above.
+            g["parse_failures"] += int(call.responded and not call.parsed)
+            g["prompt_tokens"] += call.prompt_tokens
+            g["response_tokens"] += call.response_tokens
+            g["latency_total_s"] += call.latency_s
+            g["latencies"].append(call.latency_s)
+        if self.parent is not None:
+            self.parent.record(call)
+
+    def report(self, recent: int = 0) -> dict[str, Any]:
+        with self._lock:
+            groups = [(k, dict(g), sorted(g["latencies"])) for k, g in self._groups.items()]
+            tail = list(self.recent)[-recent:] if recent else []
+
+        rows = []
+        for (caller, provider, model), g, lat in groups:
+
+            def pct(q: float, lat: list[float] = lat) -> float | None:
+                return round(lat[min(len(lat) - 1, int(q * len(lat)))], 4) if lat else None
+
+            g.pop("latencies")
+            g["latency_total_s"] = round(g["latency_total_s"], 4)
+            rows.append(
+                {
+                    "caller": caller,
+                    "provider": provider,
+                    "model": model,
+                    **g,
+                    "latency_p50_s": pct(0.50),
+                    "latency_p95_s": pct(0.95),
+                }
+            )
+        rows.sort(key=lambda r: r["latency_total_s"], reverse=True)
+
+        totals = {
+            k: sum(r[k] for r in rows)
+            for k in ("calls", "attempts", "fallbacks", "parse_failures", "prompt_tokens", "response_tokens")
+        }
+        totals["latency_total_s"] = round(sum(r["latency_total_s"] for r in rows), 4)
+        out: dict[str, Any] = {"totals": totals, "by_caller": rows}
+        if recent:
+            out["recent"] = [{**asdict(c), "latency_s": round(c.latency_s, 4)} for c in tail]
+        return out
+
+
+# Everything this process has sent, across jobs; served by the API.
+process_ledger = LLMLedger()
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from .llm_client import LLMClient, SlotWaitTimeout, call_scope
+
+
+@dataclass
+class Endpoint:
+    name: str
+    client: LLMClient
+    inflight: int = 0
+    calls: int = 0
+    errors: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float | None = None
+    probing: bool = False
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+
+class PooledLLMClient(LLMClient):
+    """Spreads calls over several equivalent backends (e.g. Ollama hosts).
+
+    Each call goes to the admitted endpoint with the fewest requests in flight,
+    ties broken round-robin. An endpoint that fails ``eject_after`` calls in a
+    row, or fails a health check, is ejected for ``eject_cooldown_s``; after
+    that it is probed with ``health_check`` in the background and re-admitted
+    once it answers. A failed call is retried once on another admitted endpoint.
+    If every endpoint is ejected, calls go to all of them rather than none.
+
+    Only errors from the backend count against it. Running out of time or
+    being cancelled while queued for a local slot (``SlotWaitTimeout``) is
+    neither a failure nor ejection-worthy, and a call whose scope is
+    cancelled or out of time is not retried elsewhere.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[tuple[str, LLMClient]],
+        eject_after: int = 2,
+        eject_cooldown_s: float = 30.0,
+    ):
+        if not endpoints:
+            raise ValueError("PooledLLMClient needs at least one endpoint")
+        self.endpoints = [Endpoint(name, client) for name, client in endpoints]
+        self.eject_after = max(1, eject_after)
+        self.eject_cooldown_s = eject_cooldown_s
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+
+    def _admitted(self, ep: Endpoint, now: float) -> bool:
+        if ep.ejected_until is None:
+            return True
+        if now >= ep.ejected_until and not ep.probing:
+            ep.probing = True
+            threading.Thread(target=self._probe, args=(ep,), daemon=True).start()
+        return False
+
+    def _pick(self, exclude: set[int]) -> Endpoint | None:
+        now = time.monotonic()
+        with self._lock:
+            pool = [ep for ep in self.endpoints if self._admitted(ep, now)]
+            if not pool and not exclude:
+                pool = self.endpoints
+            pool = [ep for ep in pool if id(ep) not in exclude]
+            if not pool:
+                return None
+            start = next(self._rr) % len(pool)
+            ordered = pool[start:] + pool[:start]
+            ep = min(ordered, key=lambda e: e.inflight)
+            ep.inflight += 1
+            return ep
+
+    def _eject(self, ep: Endpoint):
+        # Caller holds the lock.
+        if ep.ejected_until is None:
+            ep.ejections += 1
+        ep.ejected_until = time.monotonic() + self.eject_cooldown_s
+
+    def _admit(self, ep: Endpoint):
+        # Caller holds the lock.
+        ep.ejected_until = None
+        ep.consecutive_failures = 0
+
+    def _probe(self, ep: Endpoint):
+        # Clients report health as a bool; one that raises stays ejected.
+        ok = False
+        try:
+            ok = ep.client.health_check()
+        finally:
+            with self._lock:
+                ep.probing = False
+                if ok:
+                    self._admit(ep)
+                else:
+                    self._eject(ep)
+
+    def _call(self, ep: Endpoint, prompt: str, schema, system) -> dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            result = ep.client.generate(prompt, schema, system)
+        except SlotWaitTimeout:
+            with self._lock:
+                ep.inflight -= 1
+            raise
+        except Exception:
+            with self._lock:
+                ep.inflight -= 1
+                ep.calls += 1
+                ep.errors += 1
+                ep.consecutive_failures += 1
+                if ep.consecutive_failures >= self.eject_after:
+                    self._eject(ep)
+            raise
+        with self._lock:
+            ep.inflight -= 1
+            ep.calls += 1
+            ep.consecutive_failures = 0
+            ep.latencies.append(time.perf_counter() - t0)
+        return result
+
+    def generate(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
+    ) -> dict[str, Any]:
+        tried: set[int] = set()
+        ep = self._pick(tried)
+        try:
+            return self._call(ep, prompt, schema, system)
+        except Exception:
+            scope = call_scope.get()
+            if scope is not None and (scope.cancelled.is_set() or scope.time_left() == 0.0):
+                raise
+            tried.add(id(ep))
+            retry = self._pick(tried)
+            if retry is None:
+                raise
+        return self._call(retry, prompt, schema, system)
+
+    def _check_all(self, fn) -> bool:
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as ex:
+            results = list(ex.map(lambda ep: bool(fn(ep.client)), self.endpoints))
+        with self._lock:
+            for ep, ok in zip(self.endpoints, results):
+                if ok:
+                    self._admit(ep)
+                else:
+                    self._eject(ep)
+        return any(results)
+
+    def health_check(self) -> bool:
+        return self._check_all(lambda c: c.health_check())
+
+    def warm_up(self) -> bool:
+        ok = self._check_all(lambda c: c.warm_up())
+        self.remember_health(ok)
+        return ok
+
+    def cache_key(self) -> tuple:
+        return ("pool",) + tuple(ep.client.cache_key() for ep in self.endpoints)
+
+    def stats(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for ep in self.endpoints:
+                lat = sorted(ep.latencies)
+
+                def pct(q: float, lat: list[float] = lat) -> float | None:
+                    return round(lat[min(len(lat) - 1, int(q * len(lat)))], 4) if lat else None
+
+                out.append(
+                    {
+                        "endpoint": ep.name,
+                        "calls": ep.calls,
+                        "errors": ep.errors,
+                        "inflight": ep.inflight,
+                        "ejected": ep.ejected_until is not None,
+                        "ejections": ep.ejections,
+                        "latency_mean_s": round(sum(lat) / len(lat), 4) if lat else None,
+                        "latency_p50_s": pct(0.50),
+                        "latency_p95_s": pct(0.95),
+                        "readmit_in_s": (
+                            round(max(0.0, ep.ejected_until - now), 1)
+                            if ep.ejected_until is not None
+                            else None
+                        ),
+                    }
+                )
+        return out
+
+
+_pools: dict[tuple, PooledLLMClient] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(
+    key: tuple,
+    endpoints: Callable[[], list[tuple[str, LLMClient]]],
+    **params: Any,
+) -> PooledLLMClient:
+    """Process-wide pool for an endpoint set, so in-flight counts, ejections
+    and the round-robin cursor carry over from one job to the next.
+    ``endpoints`` is only called to build the pool the first time."""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = PooledLLMClient(endpoints(), **params)
+        return pool
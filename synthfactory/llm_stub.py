@@ -0,0 +1,514 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Self
+
+from .llm_client import LLMClient
+
+# ScenarioFactory appends a fresh variation seed to every prompt; it is not part
+# of the request identity, otherwise nothing recorded would ever replay.
+_VOLATILE = re.compile(r"variation_seed=\d+")
+
+
+# One lock per cassette file, so recorders sharing a path save in turn.
+_save_locks: dict[Path, threading.Lock] = {}
+_save_locks_guard = threading.Lock()
+
+
+def _save_lock(path: Path) -> threading.Lock:
+    with _save_locks_guard:
+        return _save_locks.setdefault(path.resolve(), threading.Lock())
+
+
+def prompt_key(provider: str, model: str, prompt: str) -> str:
+    norm = _VOLATILE.sub("variation_seed=*", prompt or "").strip()
+    h = hashlib.sha256(f"{provider}\x00{model}\x00{norm}".encode())
+    return h.hexdigest()
+
+
+def join_prompt(system: str | None, prompt: str) -> str:
+    """The full text a model sees for ``generate(prompt, system=system)``."""
+    return f"{system}\n\n{prompt}" if system else prompt
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text or "") // 4)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class Cassette:
+    """Recorded LLM interactions, stored as a JSON file.
+
+    Lookups are by (provider, model, normalised prompt). Repeated requests with
+    the same key cycle through the recorded responses in order. On a miss the
+    cassette either cycles through every recorded response (``on_miss="cycle"``),
+    answers with an empty string (``"empty"``) or raises ``KeyError``.
+    """
+
+    def __init__(self, path: Path | str | None = None, on_miss: str = "cycle"):
+        self.path = Path(path) if path else None
+        self.on_miss = on_miss
+        self.interactions: list[dict[str, Any]] = []
+        self._by_key: dict[str, list[str]] = {}
+        self._cursor: dict[str, int] = {}
+        self._miss_cursor = 0
+        self._unsaved: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            for it in data.get("interactions", []):
+                self._index(it)
+
+    def _index(self, it: dict[str, Any]):
+        self.interactions.append(it)
+        self._by_key.setdefault(it["key"], []).append(it["response"])
+
+    def models(self) -> list[str]:
+        return sorted({it.get("model", "") for it in self.interactions if it.get("model")})
+
+    def record(self, provider: str, model: str, prompt: str, response: str):
+        it = {
+            "provider": provider,
+            "model": model,
+            "key": prompt_key(provider, model, prompt),
+            "prompt": prompt,
+            "response": response,
+        }
+        with self._lock:
+            self._index(it)
+            self._unsaved.append(it)
+
+    def lookup(self, provider: str, model: str, prompt: str) -> str:
+        key = prompt_key(provider, model, prompt)
+        with self._lock:
+            hits = self._by_key.get(key)
+            if hits:
+                i = self._cursor.get(key, 0)
+                self._cursor[key] = i + 1
+                return hits[i % len(hits)]
+            if self.on_miss == "cycle" and self.interactions:
+                it = self.interactions[self._miss_cursor % len(self.interactions)]
+                self._miss_cursor += 1
+                return it["response"]
+            if self.on_miss == "empty":
+                return ""
+        raise KeyError(f"no recorded response for {provider}/{model} prompt {key[:12]}")
+
+    def save(self, path: Path | str | None = None):
+        """Write the cassette to ``path`` (default: the one it was loaded from).
+
+        Saving back to its own file merges: entries other recorders saved
+        there since this cassette was loaded are kept, and this cassette's
+        new entries are appended. The file is replaced atomically.
+        """
+        target = Path(path) if path else self.path
+        if target is None:
+            raise ValueError("Cassette has no path to save to")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        own = self.path is not None and target.resolve() == self.path.resolve()
+        with _save_lock(target):
+            with self._lock:
+                pending = len(self._unsaved)
+                if own and target.exists():
+                    saved = json.loads(target.read_text(encoding="utf-8")).get("interactions", [])
+                    interactions = saved + self._unsaved
+                else:
+                    interactions = list(self.interactions)
+            data = {"version": 1, "interactions": interactions}
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=target.parent, prefix=target.name + ".", suffix=".tmp", delete=False
+            ) as f:
+                json.dump(data, f, indent=2)
+            try:
+                os.replace(f.name, target)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+            if own:
+                with self._lock:
+                    del self._unsaved[:pending]
+
+
+@dataclass
+class LatencyModel:
+    """Per-request latency in milliseconds.
+
+    kind: fixed | uniform | normal | lognormal
+      fixed     -> mean_ms
+      uniform   -> mean_ms +/- spread_ms
+      normal    -> gauss(mean_ms, spread_ms), clipped at 0
+      lognormal -> median mean_ms, shape sigma (long right tail, like a busy GPU)
+    """
+
+    kind: str = "fixed"
+    mean_ms: float = 0.0
+    spread_ms: float = 0.0
+    sigma: float = 0.5
+
+    def sample_s(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            ms = rng.uniform(self.mean_ms - self.spread_ms, self.mean_ms + self.spread_ms)
+        elif self.kind == "normal":
+            ms = rng.gauss(self.mean_ms, self.spread_ms)
+        elif self.kind == "lognormal":
+            ms = rng.lognormvariate(math.log(max(self.mean_ms, 1e-3)), self.sigma)
+        else:
+            ms = self.mean_ms
+        return max(0.0, ms) / 1000.0
+
+
+class StubBehaviour:
+    """Latency and fault injection shared by the stub server and the fake Bedrock runtime."""
+
+    def __init__(
+        self,
+        latency: LatencyModel | None = None,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.latency = latency or LatencyModel()
+        self.error_rate = float(error_rate)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple[float, bool]:
+        with self._lock:
+            delay = self.latency.sample_s(self._rng)
+            fail = self._rng.random() < self.error_rate
+        return delay, fail
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    server: _StubHTTPServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, obj: dict[str, Any]):
+        raw = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/api/tags":
+            self._send(404, {"error": "not found"})
+            return
+        stub = self.server.stub
+        names = stub.cassette.models() or [stub.default_model]
+        self._send(200, {"models": [{"name": n, "model": n, "size": 0} for n in names]})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/generate":
+            self._send(404, {"error": "not found"})
+            return
+        n = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(n) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": "invalid JSON body"})
+            return
+        stub = self.server.stub
+        model = req.get("model") or stub.default_model
+        prompt = join_prompt(req.get("system"), req.get("prompt") or "")
+
+        t0 = time.perf_counter()
+        delay, fail = stub.behaviour.draw()
+        prefill_tokens = stub.prefill(model, prompt)
+        prefill_s = prefill_tokens * stub.prefill_ms_per_token / 1000.0
+        if delay or prefill_s:
+            time.sleep(delay + prefill_s)
+        if fail:
+            self._send(503, {"error": "stub: injected failure"})
+            return
+        try:
+            text = stub.cassette.lookup("ollama", model, prompt)
+        except KeyError as e:
+            self._send(404, {"error": str(e)})
+            return
+
+        total_ns = int((time.perf_counter() - t0) * 1e9)
+        self._send(
+            200,
+            {
+                "model": model,
+                "created_at": datetime.now(UTC).isoformat(),
+                "response": text,
+                "done": True,
+                "total_duration": total_ns,
+                "prompt_eval_count": prefill_tokens,
+                "prompt_eval_duration": int(prefill_s * 1e9),
+                "eval_count": _approx_tokens(text),
+            },
+        )
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: OllamaStubServer
+
+
+class OllamaStubServer:
+    """Local HTTP server answering Ollama's /api/generate and /api/tags from a cassette.
+
+    Usable as a context manager; ``base_url`` is what to hand to ``OllamaClient``.
+
+    Like Ollama, it keeps the last prompt of each of ``kv_slots`` parallel slots
+    per model, serves a request from the slot sharing the longest prefix with it
+    and only prefills the rest; ``prompt_eval_count`` reports those tokens and
+    ``prefill_ms_per_token`` charges latency for them.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        behaviour: StubBehaviour | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        default_model: str = "qwen2.5:1.5b-instruct",
+        prefill_ms_per_token: float = 0.0,
+        kv_slots: int = 4,
+    ):
+        self.cassette = cassette
+        self.behaviour = behaviour or StubBehaviour()
+        self.default_model = default_model
+        self.prefill_ms_per_token = float(prefill_ms_per_token)
+        self.kv_slots = max(1, kv_slots)
+        self._kv: dict[str, list[str]] = {}
+        self._kv_lock = threading.Lock()
+        self._httpd = _StubHTTPServer((host, port), _OllamaHandler)
+        self._httpd.stub = self
+        self._thread: threading.Thread | None = None
+
+    def prefill(self, model: str, prompt: str) -> int:
+        """Tokens that must be evaluated for ``prompt`` given the cached prefix."""
+        with self._kv_lock:
+            slots = self._kv.setdefault(model, [])
+            best, cached = None, 0
+            for i, text in enumerate(slots):
+                n = _common_prefix(text, prompt)
+                if best is None or n > cached:
+                    best, cached = i, n
+            if best is None or (cached == 0 and len(slots) < self.kv_slots):
+                slots.append(prompt)
+            else:
+                # Most recently used last, so a cold prompt evicts the oldest slot.
+                slots.pop(best if cached else 0)
+                slots.append(prompt)
+        return _approx_tokens(prompt[cached:]) if cached < len(prompt) else 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> Self:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeBedrockRuntime:
+    """In-process stand-in for a boto3 ``bedrock-runtime`` client.
+
+    Pass it as ``BedrockClient(client=...)``. Injected failures raise botocore's
+    ``ClientError`` with ``error_code`` (ThrottlingException by default), which is
+    what the real service returns under load. With ``capacity`` set, any request
+    arriving while that many are already in flight is throttled as well.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        behaviour: StubBehaviour | None = None,
+        error_code: str = "ThrottlingException",
+        capacity: int | None = None,
+    ):
+        self.cassette = cassette
+        self.behaviour = behaviour or StubBehaviour()
+        self.error_code = error_code
+        self.capacity = capacity
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _throttle(self):
+        from botocore.exceptions import ClientError
+
+        with self._lock:
+            self.throttled += 1
+        raise ClientError(
+            {"Error": {"Code": self.error_code, "Message": "stub: injected failure"},
+             "ResponseMetadata": {"HTTPStatusCode": 429}},
+            "InvokeModel",
+        )
+
+    def invoke_model(self, modelId: str, body: str, contentType: str = "application/json", **_):
+        req = json.loads(body)
+        if "messages" in req:
+            prompt = join_prompt(
+                req.get("system"), "".join(str(m.get("content", "")) for m in req["messages"])
+            )
+        else:
+            prompt = req.get("inputText", "")
+
+        with self._lock:
+            over = self.capacity is not None and self.inflight >= self.capacity
+            if not over:
+                self.inflight += 1
+                self.peak_inflight = max(self.peak_inflight, self.inflight)
+        if over:
+            self._throttle()
+        try:
+            delay, fail = self.behaviour.draw()
+            if delay:
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+        if fail:
+            self._throttle()
+
+        text = self.cassette.lookup("bedrock", modelId, prompt)
+        if "messages" in req:
+            out = {
+                "content": [{"type": "text", "text": text}],
+                "usage": {"input_tokens": _approx_tokens(prompt), "output_tokens": _approx_tokens(text)},
+            }
+        else:
+            out = {
+                "inputTextTokenCount": _approx_tokens(prompt),
+                "results": [{"outputText": text, "tokenCount": _approx_tokens(text)}],
+            }
+        return {"body": io.BytesIO(json.dumps(out).encode("utf-8")), "contentType": "application/json"}
+
+    def list_foundation_models(self):
+        return {"modelSummaries": [{"modelId": m} for m in self.cassette.models()]}
+
+
+class RecordingLLMClient(LLMClient):
+    """Wraps a real client and appends every successful call to a cassette.
+
+    The parsed JSON result is stored as the response text, so replaying it
+    through either client's JSON extraction yields the same dict. The
+    cassette is saved every ``save_every`` calls and on ``close``.
+    """
+
+    def __init__(self, inner: LLMClient, cassette: Cassette, provider: str, model: str, save_every: int = 25):
+        self.inner = inner
+        self.cassette = cassette
+        self.provider = provider
+        self.model = model
+        self.save_every = max(1, save_every)
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def generate(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
+    ) -> dict[str, Any]:
+        result = self.inner.generate(prompt, schema, system)
+        self.cassette.record(self.provider, self.model, join_prompt(system, prompt), json.dumps(result))
+        with self._lock:
+            self._recorded += 1
+            due = self._recorded % self.save_every == 0
+        if due:
+            self.cassette.save()
+        return result
+
+    def close(self):
+        try:
+            self.cassette.save()
+        finally:
+            self.inner.close()
+
+    def health_check(self) -> bool:
+        return self.inner.health_check()
+
+    def cache_key(self) -> tuple:
+        return self.inner.cache_key()
+
+    def warm_up(self) -> bool:
+        return self.inner.warm_up()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded LLM responses on the Ollama API")
+    parser.add_argument("--cassette", required=True, help="Cassette JSON file to replay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="qwen2.5:1.5b-instruct", help="Model name reported by /api/tags")
+    parser.add_argument("--on-miss", default="cycle", choices=("cycle", "empty", "error"))
+    parser.add_argument("--latency", default="fixed", choices=("fixed", "uniform", "normal", "lognormal"))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-spread-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.0,
+                        help="Simulated prefill cost for tokens outside the cached prefix")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behaviour = StubBehaviour(
+        LatencyModel(args.latency, args.latency_ms, args.latency_spread_ms, args.latency_sigma),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server = OllamaStubServer(
+        Cassette(args.cassette, on_miss=args.on_miss),
+        behaviour,
+        host=args.host,
+        port=args.port,
+        default_model=args.model,
+        prefill_ms_per_token=args.prefill_ms_per_token,
+    )
+    print(f"Ollama stub listening on {server.base_url} (cassette: {args.cassette})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
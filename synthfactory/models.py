@@ -59,3 +59,25 @@ class GroundTruth(BaseModel):
     doc_id: str
     fields: dict[str, GroundTruthField]
     meta: dict[str, Any] = Field(default_factory=dict)
+
+class TextBox(BaseModel):
+    text: str
+    # Axis-aligned [x0, y0, x1, y1] in image pixels, and the rotated quad it bounds.
+    box: list[float]
+    quad: list[list[float]]
+    field: str | None = None
+
+class TextLine(TextBox):
+    fields: list[str] = Field(default_factory=list)
+    words: list[TextBox] = Field(default_factory=list)
+
+class PageBoxes(BaseModel):
+    image: str
+    page: int = 0          # frame within the image file (multi-page TIFF)
+    width: int
+    height: int
+    lines: list[TextLine] = Field(default_factory=list)
+
+class DocumentBoxes(BaseModel):
+    doc_id: str
+    pages: list[PageBoxes] = Field(default_factory=list)
@@ -1,123 +1,454 @@
 from __future__ import annotations
-import random, io
+import random, io, math
+from functools import lru_cache
 from pathlib import Path
-from PIL import Image, ImageEnhance, ImageFilter
-
-def apply_noise_pipeline(path: Path,
-                         rotate_deg_max: float,
-                         blur_radius_max: float,
-                         contrast_jitter: float,
-                         brightness_jitter: float,
-                         speckle_amount: float,
-                         jpeg_recompress: bool,
-                         jpeg_quality_min: int,
-                         jpeg_quality_max: int,
-                         partial_crop_prob: float,
-                         crop_margin_max: float,
-                         smudge_prob: float,
-                         smudge_strength: float,
-                         downsample_prob: float,
-                         downsample_min_scale: float,
-                         downsample_max_scale: float,
-                         text_damage_prob: float,
-                         text_damage_zones_min: int,
-                         text_damage_zones_max: int,
-                         text_damage_strength: float,
-                         text_damage_box_min_px: int,
-                         text_damage_box_max_px: int):
-    img = Image.open(path).convert("RGB")
-
-    if random.random() < partial_crop_prob:
+import numpy as np
+from PIL import Image, ImageFilter
+
+class PageGeometry:
+    """Where ``apply_noise`` moved the page: an affine map from rendered pixels
+    to pixels of the degraded image (crop and rescale, then rotation)."""
+
+    def __init__(self):
+        self.m = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+    def _then(self, a, b, c, d, e, f):
+        A, B, C, D, E, F = self.m
+        self.m = (a*A + b*D, a*B + b*E, a*C + b*F + c, d*A + e*D, d*B + e*E, d*C + e*F + f)
+
+    def crop_resize(self, box, size):
+        left, top, right, bottom = box
+        sx, sy = size[0] / (right - left), size[1] / (bottom - top)
+        self._then(sx, 0.0, -left * sx, 0.0, sy, -top * sy)
+
+    def rotate(self, deg: float, size):
+        # Image.rotate turns counter-clockwise about the centre.
+        cx, cy = size[0] / 2, size[1] / 2
+        c, s = math.cos(math.radians(deg)), math.sin(math.radians(deg))
+        self._then(c, s, cx - c*cx - s*cy, -s, c, cy + s*cx - c*cy)
+
+    def map(self, x: float, y: float) -> tuple[float, float]:
+        a, b, c, d, e, f = self.m
+        return a*x + b*y + c, d*x + e*y + f
+
+    def place(self, box, size) -> tuple[list[float], list[list[float]]]:
+        """``box`` on the degraded image: its bounds (clipped to ``size``) and its corners."""
+        x0, y0, x1, y1 = box
+        quad = [[round(v, 1) for v in self.map(x, y)] for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+        xs, ys = [p[0] for p in quad], [p[1] for p in quad]
+        bounds = [max(0.0, min(xs)), max(0.0, min(ys)), min(float(size[0]), max(xs)), min(float(size[1]), max(ys))]
+        return bounds, quad
+
+def apply_noise_pipeline(path: Path, **params):
+    """Degrade the JPG at ``path`` in place; see ``apply_noise``."""
+    img = Image.open(path)
+    img = apply_noise(img.convert("L" if img.mode == "L" else "RGB"), **params)
+    img.save(path, format="JPEG", quality=92)
+
+def apply_noise(img: Image.Image,
+                rotate_deg_max: float,
+                blur_radius_max: float,
+                contrast_jitter: float,
+                brightness_jitter: float,
+                speckle_amount: float,
+                jpeg_recompress: bool,
+                jpeg_quality_min: int,
+                jpeg_quality_max: int,
+                partial_crop_prob: float,
+                crop_margin_max: float,
+                smudge_prob: float,
+                smudge_strength: float,
+                downsample_prob: float,
+                downsample_min_scale: float,
+                downsample_max_scale: float,
+                text_damage_prob: float,
+                text_damage_zones_min: int,
+                text_damage_zones_max: int,
+                text_damage_strength: float,
+                text_damage_box_min_px: int,
+                text_damage_box_max_px: int,
+                rng: random.Random | None = None,
+                pixel_scale: float = 1.0,
+                geometry: PageGeometry | None = None) -> Image.Image:
+    """Scan/photocopy degradation of a rendered page; returns the degraded image.
+
+    Works on the image the renderer produced, so the page is only encoded
+    once, when the caller saves it. RGB and L images stay in their mode.
+    Draws come from ``rng`` (the global ``random`` by default), so pages can
+    be degraded concurrently with their own streams. Pixel sizes (blur radii,
+    smudge strips, damage boxes) are for 200 dpi pages and are multiplied by
+    ``pixel_scale`` for pages rendered at another DPI. The crop and rotation
+    are recorded in ``geometry`` when given, to move text boxes along.
+    """
+    rng = rng or random
+
+    if rng.random() < partial_crop_prob:
         w, h = img.size
-        mx = int(w * random.uniform(0.0, crop_margin_max))
-        my = int(h * random.uniform(0.0, crop_margin_max))
-        left = random.randint(0, mx)
-        top = random.randint(0, my)
-        right = w - random.randint(0, mx)
-        bottom = h - random.randint(0, my)
+        mx = int(w * rng.uniform(0.0, crop_margin_max))
+        my = int(h * rng.uniform(0.0, crop_margin_max))
+        left = rng.randint(0, mx)
+        top = rng.randint(0, my)
+        right = w - rng.randint(0, mx)
+        bottom = h - rng.randint(0, my)
         img = img.crop((left, top, right, bottom)).resize((w, h), Image.Resampling.BICUBIC)
+        if geometry is not None:
+            geometry.crop_resize((left, top, right, bottom), (w, h))
 
-    if random.random() < downsample_prob:
-        scale = random.uniform(downsample_min_scale, downsample_max_scale)
+    if rng.random() < downsample_prob:
+        scale = rng.uniform(downsample_min_scale, downsample_max_scale)
         w, h = img.size
         img = img.resize((max(8, int(w*scale)), max(8, int(h*scale))), Image.Resampling.BILINEAR)                 .resize((w, h), Image.Resampling.BICUBIC)
 
-    deg = random.uniform(-rotate_deg_max, rotate_deg_max)
+    deg = rng.uniform(-rotate_deg_max, rotate_deg_max)
     img = img.rotate(deg, expand=False, fillcolor="white")
+    if geometry is not None:
+        geometry.rotate(deg, img.size)
 
     if blur_radius_max > 0:
-        img = img.filter(ImageFilter.GaussianBlur(radius=random.uniform(0, blur_radius_max)))
+        img = img.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0, blur_radius_max) * pixel_scale))
 
-    if contrast_jitter:
-        img = ImageEnhance.Contrast(img).enhance(1.0 + random.uniform(-contrast_jitter, contrast_jitter))
-    if brightness_jitter:
-        img = ImageEnhance.Brightness(img).enhance(1.0 + random.uniform(-brightness_jitter, brightness_jitter))
+    contrast = 1.0 + rng.uniform(-contrast_jitter, contrast_jitter) if contrast_jitter else None
+    brightness = 1.0 + rng.uniform(-brightness_jitter, brightness_jitter) if brightness_jitter else None
+    if contrast is not None or brightness is not None:
+        hist = (img if img.mode == "L" else img.convert("L")).histogram() if contrast is not None else None
+        img = img.point(_tone_table(hist, contrast, brightness) * len(img.getbands()))
 
-    if random.random() < smudge_prob:
-        img = _smudge(img, strength=smudge_strength)
+    if rng.random() < smudge_prob:
+        img = _smudge(img, strength=smudge_strength, rng=rng, pixel_scale=pixel_scale)
 
-    if random.random() < text_damage_prob:
-        zones = random.randint(text_damage_zones_min, text_damage_zones_max)
-        img = _text_damage(img, zones, text_damage_strength, text_damage_box_min_px, text_damage_box_max_px)
+    if rng.random() < text_damage_prob:
+        zones = rng.randint(text_damage_zones_min, text_damage_zones_max)
+        img = _text_damage(img, zones, text_damage_strength, text_damage_box_min_px, text_damage_box_max_px, rng, pixel_scale)
 
     if speckle_amount and speckle_amount > 0:
-        img = _speckle(img, speckle_amount)
+        img = _speckle(img, speckle_amount, rng)
 
     if jpeg_recompress:
-        q = random.randint(jpeg_quality_min, jpeg_quality_max)
+        # Encode/decode in memory for the artefacts; Huffman optimisation
+        # would only shrink a buffer nobody keeps.
+        q = rng.randint(jpeg_quality_min, jpeg_quality_max)
         buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=q, optimize=True)
+        img.save(buf, format="JPEG", quality=q)
         buf.seek(0)
-        img = Image.open(buf).convert("RGB")
+        img = Image.open(buf).convert(img.mode)
 
-    img.save(path, format="JPEG", quality=92)
+    return img
+
+def apply_noise_banded(rows, size: tuple[int, int], mode: str, band_height: int,
+                       rotate_deg_max: float,
+                       blur_radius_max: float,
+                       contrast_jitter: float,
+                       brightness_jitter: float,
+                       speckle_amount: float,
+                       jpeg_recompress: bool,
+                       jpeg_quality_min: int,
+                       jpeg_quality_max: int,
+                       partial_crop_prob: float,
+                       crop_margin_max: float,
+                       smudge_prob: float,
+                       smudge_strength: float,
+                       downsample_prob: float,
+                       downsample_min_scale: float,
+                       downsample_max_scale: float,
+                       text_damage_prob: float,
+                       text_damage_zones_min: int,
+                       text_damage_zones_max: int,
+                       text_damage_strength: float,
+                       text_damage_box_min_px: int,
+                       text_damage_box_max_px: int,
+                       rng: random.Random | None = None,
+                       pixel_scale: float = 1.0,
+                       geometry: PageGeometry | None = None) -> Image.Image:
+    """``apply_noise`` for very large pages, worked through in horizontal bands.
+
+    ``rows(top, bottom)`` draws rows of the clean ``size`` page (see
+    ``render_jpg.page_rows``). Each output band pulls just the input rows it
+    depends on: crop, resampling and rotation map the band back to a row
+    range of their input, using the whole page's resampling coefficients and
+    rotation steps, and blur reads a margin of three radii, so the result is
+    pixel-identical to ``apply_noise`` with the same ``rng``. Only the finished
+    page is held in full; contrast (which needs the page mean), smudges, text
+    damage, speckle and recompression then run on it in bands or in place.
+    Bands are rounded up to 16 rows so recompression keeps the JPEG block grid.
+    Draws come from ``rng`` in the same order as ``apply_noise``.
+    """
+    rng = rng or random
+    w, h = size
+
+    if rng.random() < partial_crop_prob:
+        mx = int(w * rng.uniform(0.0, crop_margin_max))
+        my = int(h * rng.uniform(0.0, crop_margin_max))
+        left = rng.randint(0, mx)
+        top = rng.randint(0, my)
+        right = w - rng.randint(0, mx)
+        bottom = h - rng.randint(0, my)
+        rows = _resized_rows(_cropped_rows(rows, (left, top, right, bottom)), (right - left, bottom - top),
+                             (w, h), Image.Resampling.BICUBIC)
+        if geometry is not None:
+            geometry.crop_resize((left, top, right, bottom), (w, h))
 
-def _speckle(img: Image.Image, amount: float) -> Image.Image:
+    if rng.random() < downsample_prob:
+        scale = rng.uniform(downsample_min_scale, downsample_max_scale)
+        small = (max(8, int(w*scale)), max(8, int(h*scale)))
+        rows = _resized_rows(_resized_rows(rows, (w, h), small, Image.Resampling.BILINEAR),
+                             small, (w, h), Image.Resampling.BICUBIC)
+
+    deg = rng.uniform(-rotate_deg_max, rotate_deg_max)
+    rows = _rotated_rows(rows, (w, h), deg, "white")
+    if geometry is not None:
+        geometry.rotate(deg, (w, h))
+
+    if blur_radius_max > 0:
+        rows = _blurred_rows(rows, h, rng.uniform(0, blur_radius_max) * pixel_scale)
+
+    band_height = max(16, -(-band_height // 16) * 16)
+    bands = [(y, min(h, y + band_height)) for y in range(0, h, band_height)]
+    out = Image.new(mode, (w, h))
+    hist = np.zeros(256, dtype=np.int64)
+    for y0, y1 in bands:
+        band = rows(y0, y1)
+        if contrast_jitter:
+            hist += (band if mode == "L" else band.convert("L")).histogram()
+        out.paste(band, (0, y0))
+        del band
+
+    contrast = 1.0 + rng.uniform(-contrast_jitter, contrast_jitter) if contrast_jitter else None
+    brightness = 1.0 + rng.uniform(-brightness_jitter, brightness_jitter) if brightness_jitter else None
+    if contrast is not None or brightness is not None:
+        table = _tone_table(hist, contrast, brightness) * len(out.getbands())
+        for y0, y1 in bands:
+            out.paste(out.crop((0, y0, w, y1)).point(table), (0, y0))
+
+    if rng.random() < smudge_prob:
+        out = _smudge(out, strength=smudge_strength, rng=rng, pixel_scale=pixel_scale)
+
+    if rng.random() < text_damage_prob:
+        zones = rng.randint(text_damage_zones_min, text_damage_zones_max)
+        out = _text_damage(out, zones, text_damage_strength, text_damage_box_min_px, text_damage_box_max_px, rng, pixel_scale)
+
+    if speckle_amount and speckle_amount > 0:
+        out = _speckle(out, speckle_amount, rng)
+
+    if jpeg_recompress:
+        q = rng.randint(jpeg_quality_min, jpeg_quality_max)
+        for y0, y1 in bands:
+            buf = io.BytesIO()
+            out.crop((0, y0, w, y1)).save(buf, format="JPEG", quality=q)
+            buf.seek(0)
+            out.paste(Image.open(buf).convert(mode), (0, y0))
+
+    return out
+
+# Row sources for apply_noise_banded: each takes a ``rows(top, bottom)`` of
+# its input and returns one for its output, reading as few input rows as the
+# operation allows.
+
+def _cropped_rows(rows, box):
+    left, top, right, _ = box
+    return lambda y0, y1: rows(top + y0, top + y1).crop((left, 0, right, y1 - y0))
+
+def _resized_rows(rows, in_size, out_size, resample):
+    # Pillow resizes horizontally, then vertically from the 8-bit result of
+    # the first pass. The horizontal pass works row by row, so Pillow runs it
+    # per band; the vertical pass is done here with Pillow's own coefficients
+    # (computed for the whole page), so each band is rows of the whole resize.
+    (iw, ih), (ow, oh) = in_size, out_size
+    if oh == ih:
+        return lambda y0, y1: rows(y0, y1) if ow == iw else rows(y0, y1).resize((ow, y1 - y0), resample)
+    start, kernel = _resize_coeffs(ih, oh, resample)
+    taps = kernel.shape[1]
+    def out(y0, y1):
+        r0, r1 = int(start[y0]), min(ih, int(start[y0:y1].max()) + taps)
+        src = rows(r0, r1)
+        if ow != iw:
+            src = src.resize((ow, r1 - r0), resample)
+        # Rows flattened to (rows, width * bands); int32 like Pillow's accumulator.
+        pixels = np.asarray(src).reshape(r1 - r0, -1)
+        acc = np.full((y1 - y0, pixels.shape[1]), 1 << (_RESAMPLE_BITS - 1), np.int32)
+        tap = np.empty_like(acc)
+        for j in range(taps):
+            k = kernel[y0:y1, j, None]
+            if k.any():
+                np.multiply(pixels[np.minimum(start[y0:y1] + j, r1 - 1) - r0], k, out=tap)
+                acc += tap
+        acc >>= _RESAMPLE_BITS
+        band = np.clip(acc, 0, 255, out=acc).astype(np.uint8).reshape(y1 - y0, ow, -1)
+        return Image.fromarray(band[:, :, 0] if src.mode == "L" else band, src.mode)
+    return out
+
+# Fixed-point precision of Pillow's 8-bit resampling (Resample.c PRECISION_BITS).
+_RESAMPLE_BITS = 22
+
+def _bilinear(x: float) -> float:
+    x = abs(x)
+    return 1.0 - x if x < 1.0 else 0.0
+
+def _bicubic(x: float) -> float:
+    a = -0.5
+    x = abs(x)
+    if x < 1.0:
+        return ((a + 2.0) * x - (a + 3.0)) * x * x + 1
+    if x < 2.0:
+        return (((x - 5) * x + 8) * x - 4) * a
+    return 0.0
+
+@lru_cache(maxsize=16)
+def _resize_coeffs(in_size: int, out_size: int, resample) -> tuple[np.ndarray, np.ndarray]:
+    """Pillow's ``precompute_coeffs`` and ``normalize_coeffs_8bpc`` for one
+    axis: the first input row of each output row and its fixed-point taps."""
+    bicubic = resample == Image.Resampling.BICUBIC
+    filt, support = (_bicubic, 2.0) if bicubic else (_bilinear, 1.0)
+    scale = filterscale = in_size / out_size
+    filterscale = max(1.0, filterscale)
+    support *= filterscale
+    taps = math.ceil(support) * 2 + 1
+    ss = 1.0 / filterscale
+    start = np.zeros(out_size, np.int64)
+    kernel = np.zeros((out_size, taps), np.int32)
+    for yy in range(out_size):
+        center = (yy + 0.5) * scale
+        ymin = max(0, int(center - support + 0.5))
+        ymax = min(in_size, int(center + support + 0.5)) - ymin
+        ws = [filt((y + ymin - center + 0.5) * ss) for y in range(ymax)]
+        ww = 0.0
+        for w in ws:
+            ww += w
+        for i, w in enumerate(ws):
+            if ww != 0.0:
+                w /= ww
+            kernel[yy, i] = int(-0.5 + w * (1 << _RESAMPLE_BITS)) if w < 0 else int(0.5 + w * (1 << _RESAMPLE_BITS))
+        start[yy] = ymin
+    return start, kernel
+
+def _rotated_rows(rows, size, deg: float, fillcolor):
+    # Image.rotate's nearest-neighbour affine steps through the page in 16.16
+    # fixed point: output (x, y) reads input ((A2 + y*A1 + x*A0) >> 16,
+    # (A5 + y*A4 + x*A3) >> 16). Each band gets the offsets that Pillow turns
+    # into exactly A2 + y0*A1 and A5 + y0*A4 (less the rows above the band),
+    # so it samples the same pixels as the whole-page rotation.
+    w, h = size
+    angle = -math.radians(deg % 360.0)
+    a, b = round(math.cos(angle), 15), round(math.sin(angle), 15)
+    d, e = round(-math.sin(angle), 15), round(math.cos(angle), 15)
+    c = a * -(w / 2) + b * -(h / 2) + 0.0 + w / 2
+    f = d * -(w / 2) + e * -(h / 2) + 0.0 + h / 2
+    a1, a3, a4 = _fix(b), _fix(d), _fix(e)
+    a2, a5 = _fix(c + a * 0.5 + b * 0.5), _fix(f + d * 0.5 + e * 0.5)
+    def out(y0, y1):
+        # Source rows are affine in (x, y), so the band's extremes are at its corners.
+        corners = [(a5 + y * a4 + x * a3) >> 16 for x in (0, w - 1) for y in (y0, y1 - 1)]
+        r0 = min(h - 1, max(0, min(corners)))
+        r1 = max(r0 + 1, min(h, max(corners) + 1))
+        c0 = _unfix(a2 + y0 * a1, a, b)
+        f0 = _unfix(a5 + y0 * a4 - (r0 << 16), d, e)
+        return rows(r0, r1).transform((w, y1 - y0), Image.Transform.AFFINE, (a, b, c0, d, e, f0),
+                                      Image.Resampling.NEAREST, fillcolor=fillcolor)
+    return out
+
+def _fix(v: float) -> int:
+    """Pillow's 16.16 fixed-point conversion (Geometry.c FIX)."""
+    return math.floor(v * 65536.0 + 0.5)
+
+def _unfix(target: int, p: float, q: float) -> float:
+    """An offset ``v`` with ``_fix(v + p*0.5 + q*0.5) == target``."""
+    v = target / 65536.0 - p * 0.5 - q * 0.5
+    while _fix(v + p * 0.5 + q * 0.5) > target:
+        v = math.nextafter(v, -math.inf)
+    while _fix(v + p * 0.5 + q * 0.5) < target:
+        v = math.nextafter(v, math.inf)
+    return v
+
+def _blurred_rows(rows, height: int, radius: float):
+    # Pillow's Gaussian is three box passes of about the radius each.
+    reach = int(3 * radius) + 8
+    def out(y0, y1):
+        r0, r1 = max(0, y0 - reach), min(height, y1 + reach)
+        band = rows(r0, r1).filter(ImageFilter.GaussianBlur(radius=radius))
+        return band.crop((0, y0 - r0, band.width, y1 - r0))
+    return out
+
+def _tone_table(hist, contrast: float | None, brightness: float | None) -> list[int]:
+    """ImageEnhance.Contrast then .Brightness as one 256-entry lookup table.
+
+    Both are blends with a flat image (the mean grey from ``hist``, then
+    black), which Pillow works out in float32 and truncates; doing the same
+    over 0-255 gives identical pixels in a single ``point`` pass.
+    """
+    v = np.arange(256, dtype=np.float32)
+    if contrast is not None:
+        hist = np.asarray(hist, dtype=np.int64)
+        mean = np.float32(int(np.dot(hist, np.arange(256)) / max(1, hist.sum()) + 0.5))
+        v = np.clip(mean + np.float32(contrast) * (v - mean), 0, 255).astype(np.uint8).astype(np.float32)
+    if brightness is not None:
+        v = np.clip(np.float32(brightness) * v, 0, 255).astype(np.uint8).astype(np.float32)
+    return v.astype(np.uint8).tolist()
+
+# Speckles per pixel above which one array write beats Pillow's pixel access.
+# Below it the page copy into NumPy and back costs more than the writes save
+# (A4 at 200 dpi: crossover ~0.005 for L, ~0.012 for RGB; default amount 0.0002).
+_SPECKLE_ARRAY_DENSITY = {"L": 0.005, "RGB": 0.012}
+
+def _speckle(img: Image.Image, amount: float, rng=random) -> Image.Image:
     if img is None:
         return img
-    px = img.load()
     w, h = img.size
     n = int(w*h*amount)
-    for _ in range(n):
-        x = random.randrange(w); y = random.randrange(h)
-        v = random.choice([0, 255])
-        px[x, y] = (v, v, v)
+    if n <= 0:
+        return img
+    draw = np.random.default_rng(rng.getrandbits(64))
+    xs, ys = draw.integers(0, w, n), draw.integers(0, h, n)
+    vs = (draw.integers(0, 2, n) * 255).astype(np.uint8)
+    if n >= w*h*_SPECKLE_ARRAY_DENSITY.get(img.mode, 0.012):
+        a = np.asarray(img).copy()
+        a[ys, xs] = vs[:, None] if a.ndim == 3 else vs
+        return Image.fromarray(a, img.mode)
+    px = img.load()
+    if img.mode == "L":
+        for x, y, v in zip(xs.tolist(), ys.tolist(), vs.tolist()):
+            px[x, y] = v
+    else:
+        for x, y, v in zip(xs.tolist(), ys.tolist(), vs.tolist()):
+            px[x, y] = (v, v, v)
     return img
 
-def _smudge(img: Image.Image, strength: float) -> Image.Image:
+def _smudge(img: Image.Image, strength: float, rng=random, pixel_scale: float = 1.0) -> Image.Image:
+    # In place: only the strips are copied.
     w,h = img.size
-    out = img.copy()
-    for _ in range(random.randint(2,6)):
-        y = random.randint(int(h*0.28), int(h*0.86))
-        strip_h = random.randint(18, 55)
-        x = random.randint(int(w*0.35), int(w*0.95))
-        strip_w = random.randint(160, 480)
+    out = img
+    for _ in range(rng.randint(2,6)):
+        y = rng.randint(int(h*0.28), int(h*0.86))
+        strip_h = max(2, round(rng.randint(18, 55) * pixel_scale))
+        x = rng.randint(int(w*0.35), int(w*0.95))
+        strip_w = max(2, round(rng.randint(160, 480) * pixel_scale))
         box = (max(0, x-strip_w), max(0, y-strip_h//2), min(w, x), min(h, y+strip_h//2))
         region = out.crop(box)
-        s = 1.0 - min(0.85, strength) * random.uniform(0.35, 0.7)
+        s = 1.0 - min(0.85, strength) * rng.uniform(0.35, 0.7)
         rw,rh = region.size
         region = region.resize((max(8,int(rw*s)), rh), Image.Resampling.BILINEAR).resize((rw,rh), Image.Resampling.BICUBIC)
-        region = region.filter(ImageFilter.GaussianBlur(radius=0.6 + strength*1.4))
+        region = region.filter(ImageFilter.GaussianBlur(radius=(0.6 + strength*1.4) * pixel_scale))
         out.paste(region, box)
     return out
 
-def _text_damage(img: Image.Image, zones: int, strength: float, box_min: int, box_max: int) -> Image.Image:
+def _text_damage(img: Image.Image, zones: int, strength: float, box_min: int, box_max: int, rng=random,
+                 pixel_scale: float = 1.0) -> Image.Image:
+    # In place, like _smudge.
     w,h = img.size
-    out = img.copy()
+    out = img
+    box_min, box_max = round(box_min * pixel_scale), round(box_max * pixel_scale)
     for _ in range(zones):
-        x = random.randint(int(w*0.08), int(w*0.78))
-        y = random.randint(int(h*0.18), int(h*0.82))
-        bw = random.randint(box_min, min(box_max, w-1))
-        bh = random.randint(int(box_min*0.5), min(int(box_max*0.6), h-1))
+        x = rng.randint(int(w*0.08), int(w*0.78))
+        y = rng.randint(int(h*0.18), int(h*0.82))
+        bw = rng.randint(box_min, min(box_max, w-1))
+        bh = rng.randint(int(box_min*0.5), min(int(box_max*0.6), h-1))
         bw = min(bw, w-x-1); bh = min(bh, h-y-1)
-        if bw < 30 or bh < 18:
+        if bw < 30 * pixel_scale or bh < 18 * pixel_scale:
             continue
         box = (x, y, x+bw, y+bh)
         region = out.crop(box)
-        pscale = 1.0 - (0.60 * strength) * random.uniform(0.6, 1.0)
+        pscale = 1.0 - (0.60 * strength) * rng.uniform(0.6, 1.0)
         rw,rh = region.size
         region = region.resize((max(8,int(rw*pscale)), max(8,int(rh*pscale))), Image.Resampling.BILINEAR)
         region = region.resize((rw,rh), Image.Resampling.NEAREST)
-        region = region.filter(ImageFilter.GaussianBlur(radius=0.8 + 1.8*strength))
+        region = region.filter(ImageFilter.GaussianBlur(radius=(0.8 + 1.8*strength) * pixel_scale))
         out.paste(region, box)
     return out
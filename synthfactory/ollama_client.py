@@ -6,6 +6,7 @@ from typing import Any
 import requests
 
 from .llm_client import LLMClient
+from .llm_ledger import note_usage
 
 
 class OllamaClient(LLMClient):
@@ -14,13 +15,21 @@ class OllamaClient(LLMClient):
         base_url: str = "http://127.0.0.1:11434",
         model: str = "qwen2.5:1.5b-instruct",
         timeout_s: int = 60,
+        keep_alive: str | None = "30m",
     ):
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.timeout_s = timeout_s
+        self.keep_alive = keep_alive
+
+    def cache_key(self) -> tuple:
+        return ("ollama", self.base_url, self.model)
 
     def generate(
-        self, prompt: str, schema: dict[str, Any] | None = None
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system: str | None = None,
     ) -> dict[str, Any]:
         url = f"{self.base_url}/api/generate"
         payload = {
@@ -28,7 +37,14 @@ class OllamaClient(LLMClient):
             "prompt": prompt,
             "stream": False,
         }
+        # The system text is rendered ahead of the prompt, so while it stays the
+        # same Ollama reuses its evaluated KV cache and only prefills the prompt.
+        if system:
+            payload["system"] = system
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
 
+        note_usage("ollama", self.model, attempts=1)
         r = requests.post(url, json=payload, timeout=self.timeout_s)
         if not r.ok:
             try:
@@ -40,7 +56,11 @@ class OllamaClient(LLMClient):
                 response=r,
             )
 
-        text = (r.json().get("response") or "").strip()
+        body = r.json()
+        note_usage(
+            "ollama", self.model, body.get("prompt_eval_count"), body.get("eval_count"), responded=True
+        )
+        text = (body.get("response") or "").strip()
         return self._extract_json(text, schema)
 
     def _extract_json(
@@ -63,6 +83,22 @@ class OllamaClient(LLMClient):
 
         return {}
 
+    def warm_up(self) -> bool:
+        # An empty prompt makes Ollama load the model and return immediately;
+        # keep_alive then keeps it resident between documents.
+        payload: dict[str, Any] = {"model": self.model, "prompt": "", "stream": False}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        try:
+            r = requests.post(
+                f"{self.base_url}/api/generate", json=payload, timeout=self.timeout_s
+            )
+            ok = r.ok
+        except requests.RequestException:
+            ok = False
+        self.remember_health(ok)
+        return ok
+
     def health_check(self) -> bool:
         try:
             url = f"{self.base_url}/api/tags"
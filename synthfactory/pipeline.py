@@ -1,18 +1,30 @@
 from __future__ import annotations
 
 import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from pathlib import Path
 
 from .config import AppCfg
 from .faker_gen import make_statement, make_letter
 from .scenario_factory import ScenarioFactory
 from .template_designer import TemplateDesigner
-from .models import GroundTruth, GroundTruthField
+from .models import DocumentBoxes, GroundTruth, GroundTruthField, PageBoxes
 from .branding import Theme
+from .layout import A4, layout_statement, layout_letter, page_pixels
 from .render_pdf import render_statement_pdf, render_letter_pdf
-from .render_jpg import render_statement_pages_jpg, render_letter_jpg
-from .noise import apply_noise_pipeline
-from .llm_factory import create_llm_client
+from .render_jpg import render_page, page_rows, text_boxes, downscale, to_bilevel, save_options, save_pages, EXTENSIONS
+from .noise import PageGeometry, apply_noise, apply_noise_banded
+from .layer_cache import page_layers
+from .fonts import text_masks
+from .prompt_analysis import analyze_prompt
+from .llm_factory import is_llm_enabled, llm_client_from_config
+from .llm_guard import CircuitBreaker, GuardedLLMClient
+from .llm_governor import GovernedLLMClient
+from .llm_coalesce import CoalescingLLMClient
+from .llm_pool import PooledLLMClient
+from .bedrock_client import BedrockClient
+from .llm_ledger import LLMLedger, process_ledger
 
 
 def _visibility_flags(doc_type: str) -> dict[str, bool]:
@@ -31,55 +43,160 @@ def _visibility_flags(doc_type: str) -> dict[str, bool]:
     return base
 
 
-def _looks_non_financial(prompt: str) -> bool:
-    lower = (prompt or "").lower()
-    if not lower.strip():
-        return False
-
-    non_fin = (
-        "shipping",
-        "manifest",
-        "delivery",
-        "depot",
-        "warehouse",
-        "logistics",
-        "dispatch",
-        "route",
-        "appointment",
-        "clinic",
-        "hospital",
-        "healthcare",
-        "prescription",
-        "utilities",
-        "outage",
-        "maintenance",
-        "service change",
-        "construction",
-        "site",
-        "project",
-        "quote",
-        "consultancy",
-        "invoice",
-        "purchase order",
-        "work order",
-        "cloud",
-        "saas",
-        "subscription",
-        "billing notice",
-    )
-    fin = (
-        "statement",
-        "transactions",
-        "balance",
-        "account",
-        "sort code",
-        "overdraft",
-        "direct debit",
-        "mortgage",
-        "loan arrears",
-        "interest rate",
+def _layers(client):
+    """Every layer of a wrapped client, including the members of a pool."""
+    while client is not None:
+        yield client
+        for ep in getattr(client, "endpoints", ()):
+            yield from _layers(ep.client)
+        client = getattr(client, "inner", None)
+
+
+def _find_layer(client, cls):
+    return next((layer for layer in _layers(client) if isinstance(layer, cls)), None)
+
+
+def _noise_params(noise) -> dict:
+    return {
+        "rotate_deg_max": noise.rotate_deg_max,
+        "blur_radius_max": noise.blur_radius_max,
+        "contrast_jitter": noise.contrast_jitter,
+        "brightness_jitter": noise.brightness_jitter,
+        "speckle_amount": noise.speckle_amount,
+        "jpeg_recompress": noise.jpeg_recompress,
+        "jpeg_quality_min": noise.jpeg_quality_min,
+        "jpeg_quality_max": noise.jpeg_quality_max,
+        "partial_crop_prob": noise.partial_crop_prob,
+        "crop_margin_max": noise.crop_margin_max,
+        "smudge_prob": noise.smudge_prob,
+        "smudge_strength": noise.smudge_strength,
+        "downsample_prob": noise.downsample_prob,
+        "downsample_min_scale": noise.downsample_min_scale,
+        "downsample_max_scale": noise.downsample_max_scale,
+        "text_damage_prob": noise.text_damage_prob,
+        "text_damage_zones_min": noise.text_damage_zones_min,
+        "text_damage_zones_max": noise.text_damage_zones_max,
+        "text_damage_strength": noise.text_damage_strength,
+        "text_damage_box_min_px": noise.text_damage_box_min_px,
+        "text_damage_box_max_px": noise.text_damage_box_max_px,
+    }
+
+
+def _render_mode(render) -> str:
+    return {"l": "L", "1": "L"}.get(str(render.color_mode).lower(), "RGB")
+
+
+def _finish(img, render):
+    if str(render.color_mode) == "1":
+        return to_bilevel(img, render.bilevel, render.bilevel_threshold)
+    return img
+
+
+@cache
+def _page_pool(workers: int) -> ThreadPoolExecutor:
+    # Shared by every run in the process (API jobs included), like page_layers.
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page")
+
+
+def _page_images(pages, cfg: AppCfg, size: tuple[int, int], render_mode: str, noise_params: dict):
+    """Render and degrade a document's pages concurrently, at ``size`` pixels.
+
+    Returns the images and, with ``render.text_boxes``, each page's text lines
+    moved through the noise geometry (else None). Each page gets its own RNG,
+    seeded from the global ``random`` up front, so a seeded run gives the same
+    pages however the threads are scheduled.
+    """
+
+    def one(page, seed):
+        rng = random.Random(seed)
+        geometry = PageGeometry()
+        pixel_scale = size[0] / page.size[0]
+        font_jitter_prob = getattr(cfg.noise, "font_jitter_prob", 0.0)
+        font_jitter_strength = getattr(cfg.noise, "font_jitter_strength", 0.0)
+        if cfg.render.band_height and cfg.noise.enable:
+            # Whole pages at 400+ dpi are ~50-100 MB, and noise copies them
+            # several times over; bands keep one page plus a few strips alive.
+            rows = page_rows(page, size[0], font_jitter_prob, font_jitter_strength, mode=render_mode, rng=rng)
+            img = apply_noise_banded(rows, size, render_mode, cfg.render.band_height, rng=rng,
+                                     pixel_scale=pixel_scale, geometry=geometry, **noise_params)
+        else:
+            img = render_page(
+                page,
+                size[0],
+                size[1],
+                font_jitter_prob=font_jitter_prob,
+                font_jitter_strength=font_jitter_strength,
+                mode=render_mode,
+                rng=rng,
+            )
+            if cfg.noise.enable:
+                img = apply_noise(img, rng=rng, pixel_scale=pixel_scale, geometry=geometry, **noise_params)
+        if not cfg.render.text_boxes:
+            return img, None
+        lines = text_boxes(page, size[0])
+        for item in lines + [w for ln in lines for w in ln["words"]]:
+            item["box"], item["quad"] = geometry.place(item["box"], img.size)
+        return img, lines
+
+    seeds = [random.getrandbits(64) for _ in pages]
+    workers = max(1, cfg.render.page_workers)
+    if workers == 1 or len(pages) == 1:
+        done = list(map(one, pages, seeds))
+    else:
+        done = list(_page_pool(workers).map(one, pages, seeds))
+    return [img for img, _ in done], [lines for _, lines in done]
+
+
+def _write_boxes(path: Path, doc_id: str, page_lines, images, names: list[str]) -> str | None:
+    """Word/line boxes of the primary-size pages next to the ground truth."""
+    if any(lines is None for lines in page_lines):
+        return None
+    boxes = DocumentBoxes(
+        doc_id=doc_id,
+        pages=[
+            PageBoxes(
+                image=names[i] if len(names) == len(images) else names[0],
+                page=0 if len(names) == len(images) else i,
+                width=img.width,
+                height=img.height,
+                lines=lines,
+            )
+            for i, (img, lines) in enumerate(zip(images, page_lines))
+        ],
     )
-    return any(k in lower for k in non_fin) and not any(k in lower for k in fin)
+    path.write_text(boxes.model_dump_json(), encoding="utf-8")
+    return path.name
+
+
+def _write_pages(images, pages_dir: Path, stems: list[str], doc_id: str, render, resolutions) -> dict[str, list[str]]:
+    """Encode finished pages at the primary size ("") and each extra resolution.
+
+    Returns the file names per size, relative to ``pages_dir``; extra sizes go
+    in ``<w>x<h>/``. TIFF packs a document's pages into one file. Bilevel
+    conversion happens per output size; downscaling 1-bit pages would lose
+    the strokes the dither kept.
+    """
+    jpg = render.jpg
+    fmt = str(jpg.format).lower()
+    options = save_options(fmt, jpg.quality, jpg.subsampling, jpg.effort, jpg.tiff_compression,
+                           bilevel=str(render.color_mode) == "1")
+    written: dict[str, list[str]] = {}
+    for size in [None, *resolutions]:
+        folder, prefix = pages_dir, ""
+        if size is not None:
+            prefix = f"{size[0]}x{size[1]}/"
+            folder = pages_dir / prefix
+            folder.mkdir(exist_ok=True)
+        pages = [_finish(img if size is None else downscale(img, size), render) for img in images]
+        if fmt == "tiff":
+            names = [f"{doc_id}{EXTENSIONS[fmt]}"]
+            save_pages(pages, folder / names[0], **options)
+        else:
+            names = [f"{stem}{EXTENSIONS[fmt]}" for stem in stems]
+            for page, name in zip(pages, names):
+                page.save(folder / name, **options)
+        written[prefix.rstrip("/")] = [prefix + n for n in names]
+    return written
 
 
 def generate_dataset(
@@ -97,323 +214,334 @@ def generate_dataset(
         int(count_override) if count_override is not None else int(cfg.dataset.count)
     )
 
-    llm_enabled = (
-        cfg.llm.provider == "ollama"
-        and cfg.llm.ollama.enabled
-        or cfg.llm.provider == "bedrock"
-        and cfg.llm.bedrock.enabled
-    )
-
-    llm_client = create_llm_client(
-        provider=cfg.llm.provider,
-        ollama_base_url=cfg.llm.ollama.base_url,
-        ollama_model=cfg.llm.ollama.model,
-        ollama_timeout=cfg.llm.ollama.timeout_s,
-        bedrock_region=cfg.llm.bedrock.region,
-        bedrock_model_id=cfg.llm.bedrock.model_id,
-        bedrock_temperature=cfg.llm.bedrock.temperature,
+    page_layers.resize(cfg.render.layer_cache_mb * 2**20)
+    noise_params = _noise_params(cfg.noise)
+    resolutions = [tuple(r) for r in cfg.render.jpg.resolutions]
+    render_mode = _render_mode(cfg.render)
+    jpg = cfg.render.jpg
+    page_size = page_pixels(A4, jpg.dpi) if jpg.dpi else (jpg.width, jpg.height)
+
+    llm_enabled = is_llm_enabled(cfg)
+    llm_client = llm_client_from_config(cfg)
+    guard = cfg.llm.guard
+    llm_client = GuardedLLMClient(
+        llm_client,
+        doc_budget_s=guard.doc_budget_s,
+        hedge_after_s=guard.hedge_after_s,
+        max_hedges=guard.max_hedges,
+        breaker=CircuitBreaker(
+            window=guard.breaker_window,
+            min_calls=guard.breaker_min_calls,
+            failure_rate=guard.breaker_failure_rate,
+            slow_call_s=guard.breaker_slow_call_s,
+            cooldown_s=guard.breaker_cooldown_s,
+        ),
     )
 
+    ledger = LLMLedger(parent=process_ledger)
     scenario_factory = ScenarioFactory(
         enabled=llm_enabled,
         provider=cfg.llm.provider,
         llm_client=llm_client,
+        local_parse=cfg.llm.local_parse,
+        ledger=ledger,
     )
 
     designer = TemplateDesigner(
         enabled=llm_enabled,
         provider=cfg.llm.provider,
         llm_client=llm_client,
+        ledger=ledger,
     )
 
+    analysis = analyze_prompt(prompt)
+    use_llm = llm_enabled and bool(prompt.strip())
+    if use_llm and cfg.llm.warmup and not llm_client.warm_up():
+        print(f"LLM provider '{cfg.llm.provider}' is unavailable; using local fallbacks.")
+    llm_skipped = 0
+
     allowed_letter_templates = list(getattr(cfg.dataset.letter, "templates", []) or [])
 
-    for i in range(count):
-        doc_id = f"doc_{i:05d}_{random.randint(1000, 9999)}"
-        doc_dir = (
-            out_root / doc_id
-            if getattr(cfg.dataset, "group_by_document", True)
-            else out_root
-        )
-        doc_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        for i in range(count):
+            doc_id = f"doc_{i:05d}_{random.randint(1000, 9999)}"
+            doc_dir = (
+                out_root / doc_id
+                if getattr(cfg.dataset, "group_by_document", True)
+                else out_root
+            )
+            doc_dir.mkdir(parents=True, exist_ok=True)
 
-        pages_dir = doc_dir / "pages"
-        pages_dir.mkdir(parents=True, exist_ok=True)
+            pages_dir = doc_dir / "pages"
+            pages_dir.mkdir(parents=True, exist_ok=True)
 
-        pdf_path = doc_dir / f"{doc_id}.pdf"
-        gt_path = doc_dir / f"{doc_id}.json"
+            pdf_path = doc_dir / f"{doc_id}.pdf"
+            gt_path = doc_dir / f"{doc_id}.json"
+            boxes_path = doc_dir / f"{doc_id}.boxes.json"
 
-        sc = scenario_factory.next(prompt)
+            doc_llm = use_llm and llm_client.is_healthy(cfg.llm.health_ttl_s)
+            if use_llm and not doc_llm:
+                llm_skipped += 1
+            scenario_factory.enabled = designer.enabled = doc_llm
+            llm_client.begin_document()
+            sc = scenario_factory.next(prompt)
 
-        design = designer.next(
-            prompt,
-            allowed_letter_templates=allowed_letter_templates,
-        )
+            design = designer.next(
+                prompt,
+                allowed_letter_templates=allowed_letter_templates,
+            )
 
-        theme = Theme(
-            company_name=sc.company_name,
-            accent_rgb=sc.accent_rgb,
-            logo_style=sc.logo_style,
-            paper_tint_rgb=getattr(sc, "paper_tint_rgb", None),
-            header_alignment=getattr(design, "header_alignment", None)
-            or getattr(sc, "header_alignment", "left"),
-            logo_position=getattr(design, "logo_position", None)
-            or getattr(sc, "logo_position", "auto"),
-            base_font=getattr(design, "base_font", None)
-            or getattr(sc, "base_font", "Helvetica"),
-            mono_font=getattr(design, "mono_font", None)
-            or getattr(sc, "mono_font", "Courier"),
-        )
+            theme = Theme(
+                company_name=sc.company_name,
+                accent_rgb=sc.accent_rgb,
+                logo_style=sc.logo_style,
+                paper_tint_rgb=getattr(sc, "paper_tint_rgb", None),
+                header_alignment=getattr(design, "header_alignment", None)
+                or getattr(sc, "header_alignment", "left"),
+            )
 
-        if prompt.strip():
-            is_stmt = getattr(design, "doc_type", "letter") == "statement"
-        else:
-            is_stmt = random.random() < cfg.dataset.mix.statement
+            if prompt.strip():
+                is_stmt = getattr(design, "doc_type", "letter") == "statement"
+            else:
+                is_stmt = random.random() < cfg.dataset.mix.statement
 
-        if prompt.strip() and _looks_non_financial(prompt):
-            is_stmt = False
+            if prompt.strip() and analysis.non_financial:
+                is_stmt = False
 
-        if is_stmt:
-            stmt = make_statement(
-                doc_id,
-                theme.company_name,
-                cfg.dataset.statement.min_rows,
-                cfg.dataset.statement.max_rows,
-            )
+            if is_stmt:
+                stmt = make_statement(
+                    doc_id,
+                    theme.company_name,
+                    cfg.dataset.statement.min_rows,
+                    cfg.dataset.statement.max_rows,
+                )
 
-            render_statement_pdf(
-                stmt,
-                pdf_path,
-                cfg.render.watermark_text,
-                theme=theme,
-                page_size=cfg.render.page_size,
-                rows_per_page=cfg.dataset.statement.rows_per_page,
-                pages_max=cfg.dataset.statement.pages_max,
-            )
+                pages = layout_statement(
+                    stmt,
+                    cfg.render.watermark_text,
+                    theme,
+                    rows_per_page=cfg.dataset.statement.rows_per_page,
+                    pages_max=cfg.dataset.statement.pages_max,
+                )
 
-            page_paths = render_statement_pages_jpg(
-                stmt,
-                out_dir=pages_dir,
-                base_name=doc_id,
-                watermark=cfg.render.watermark_text,
-                theme=theme,
-                width=cfg.render.jpg.width,
-                height=cfg.render.jpg.height,
-                rows_per_page=cfg.dataset.statement.rows_per_page,
-                pages_max=cfg.dataset.statement.pages_max,
-                font_jitter_prob=getattr(cfg.noise, "font_jitter_prob", 0.0),
-                font_jitter_strength=getattr(cfg.noise, "font_jitter_strength", 0.0),
-            )
+                render_statement_pdf(
+                    stmt,
+                    pdf_path,
+                    cfg.render.watermark_text,
+                    theme=theme,
+                    page_size=cfg.render.page_size,
+                    rows_per_page=cfg.dataset.statement.rows_per_page,
+                    pages_max=cfg.dataset.statement.pages_max,
+                    pages=pages,
+                )
 
-            if cfg.noise.enable:
-                for p in page_paths:
-                    apply_noise_pipeline(
-                        p,
-                        rotate_deg_max=cfg.noise.rotate_deg_max,
-                        blur_radius_max=cfg.noise.blur_radius_max,
-                        contrast_jitter=cfg.noise.contrast_jitter,
-                        brightness_jitter=cfg.noise.brightness_jitter,
-                        speckle_amount=cfg.noise.speckle_amount,
-                        jpeg_recompress=cfg.noise.jpeg_recompress,
-                        jpeg_quality_min=cfg.noise.jpeg_quality_min,
-                        jpeg_quality_max=cfg.noise.jpeg_quality_max,
-                        partial_crop_prob=cfg.noise.partial_crop_prob,
-                        crop_margin_max=cfg.noise.crop_margin_max,
-                        smudge_prob=cfg.noise.smudge_prob,
-                        smudge_strength=cfg.noise.smudge_strength,
-                        downsample_prob=cfg.noise.downsample_prob,
-                        downsample_min_scale=cfg.noise.downsample_min_scale,
-                        downsample_max_scale=cfg.noise.downsample_max_scale,
-                        text_damage_prob=cfg.noise.text_damage_prob,
-                        text_damage_zones_min=cfg.noise.text_damage_zones_min,
-                        text_damage_zones_max=cfg.noise.text_damage_zones_max,
-                        text_damage_strength=cfg.noise.text_damage_strength,
-                        text_damage_box_min_px=cfg.noise.text_damage_box_min_px,
-                        text_damage_box_max_px=cfg.noise.text_damage_box_max_px,
-                    )
-
-            vis = _visibility_flags("statement")
-            gt = GroundTruth(
-                doc_type="statement",
-                doc_id=doc_id,
-                fields={
-                    "industry": GroundTruthField(
-                        value=getattr(sc, "industry", "unknown"), visible=True
-                    ),
-                    "company_name": GroundTruthField(
-                        value=theme.company_name, visible=True
-                    ),
-                    "owner_full_name": GroundTruthField(
-                        value=stmt.owner.full_name, visible=True
-                    ),
-                    "owner_address_lines": GroundTruthField(
-                        value=stmt.owner.address_lines,
-                        visible=vis["owner_address_lines"],
-                    ),
-                    "owner_city": GroundTruthField(value=stmt.owner.city, visible=True),
-                    "owner_postcode": GroundTruthField(
-                        value=stmt.owner.postcode, visible=vis["owner_postcode"]
-                    ),
-                    "sort_code": GroundTruthField(
-                        value=stmt.account.sort_code, visible=vis["sort_code"]
-                    ),
-                    "account_number": GroundTruthField(
-                        value=stmt.account.account_number, visible=vis["account_number"]
-                    ),
-                    "issue_date": GroundTruthField(
-                        value=stmt.issue_date.isoformat(), visible=True
-                    ),
-                    "period_from": GroundTruthField(
-                        value=stmt.period_from.isoformat(), visible=vis["period"]
-                    ),
-                    "period_to": GroundTruthField(
-                        value=stmt.period_to.isoformat(), visible=vis["period"]
-                    ),
-                    "opening_balance": GroundTruthField(
-                        value=stmt.opening_balance, visible=vis["opening_balance"]
-                    ),
-                    "closing_balance": GroundTruthField(
-                        value=stmt.closing_balance, visible=vis["closing_balance"]
-                    ),
-                    "transactions": GroundTruthField(
-                        value=[t.model_dump() for t in stmt.transactions], visible=True
-                    ),
-                },
-                meta={
-                    "prompt": prompt,
-                    "watermark": cfg.render.watermark_text,
-                    "pdf": pdf_path.name,
-                    "jpg_pages": [p.name for p in page_paths],
-                    "theme": {
-                        "accent_rgb": theme.accent_rgb,
-                        "logo_style": theme.logo_style,
-                        "paper_tint_rgb": theme.paper_tint_rgb,
-                        "header_alignment": theme.header_alignment,
-                        "logo_position": theme.logo_position,
-                        "base_font": theme.base_font,
-                        "mono_font": theme.mono_font,
+                images, page_lines = _page_images(pages, cfg, page_size, render_mode, noise_params)
+                written = _write_pages(
+                    images,
+                    pages_dir,
+                    [f"{doc_id}_p{pi}" for pi in range(1, len(images) + 1)],
+                    doc_id,
+                    cfg.render,
+                    resolutions,
+                )
+                boxes_name = _write_boxes(boxes_path, doc_id, page_lines, images, written[""])
+
+                vis = _visibility_flags("statement")
+                gt = GroundTruth(
+                    doc_type="statement",
+                    doc_id=doc_id,
+                    fields={
+                        "industry": GroundTruthField(
+                            value=getattr(sc, "industry", "unknown"), visible=True
+                        ),
+                        "company_name": GroundTruthField(
+                            value=theme.company_name, visible=True
+                        ),
+                        "owner_full_name": GroundTruthField(
+                            value=stmt.owner.full_name, visible=True
+                        ),
+                        "owner_address_lines": GroundTruthField(
+                            value=stmt.owner.address_lines,
+                            visible=vis["owner_address_lines"],
+                        ),
+                        "owner_city": GroundTruthField(value=stmt.owner.city, visible=True),
+                        "owner_postcode": GroundTruthField(
+                            value=stmt.owner.postcode, visible=vis["owner_postcode"]
+                        ),
+                        "sort_code": GroundTruthField(
+                            value=stmt.account.sort_code, visible=vis["sort_code"]
+                        ),
+                        "account_number": GroundTruthField(
+                            value=stmt.account.account_number, visible=vis["account_number"]
+                        ),
+                        "issue_date": GroundTruthField(
+                            value=stmt.issue_date.isoformat(), visible=True
+                        ),
+                        "period_from": GroundTruthField(
+                            value=stmt.period_from.isoformat(), visible=vis["period"]
+                        ),
+                        "period_to": GroundTruthField(
+                            value=stmt.period_to.isoformat(), visible=vis["period"]
+                        ),
+                        "opening_balance": GroundTruthField(
+                            value=stmt.opening_balance, visible=vis["opening_balance"]
+                        ),
+                        "closing_balance": GroundTruthField(
+                            value=stmt.closing_balance, visible=vis["closing_balance"]
+                        ),
+                        "transactions": GroundTruthField(
+                            value=[t.model_dump() for t in stmt.transactions], visible=True
+                        ),
                     },
-                },
-            )
-            gt_path.write_text(gt.model_dump_json(indent=2), encoding="utf-8")
-
-        else:
-            template = getattr(design, "letter_template", None) or (
-                random.choice(allowed_letter_templates)
-                if allowed_letter_templates
-                else "service_change_notice"
-            )
+                    meta={
+                        "prompt": prompt,
+                        "watermark": cfg.render.watermark_text,
+                        "pdf": pdf_path.name,
+                        "boxes": boxes_name,
+                        "jpg_pages": written.pop(""),
+                        "jpg_resolutions": written,
+                        "theme": {
+                            "accent_rgb": theme.accent_rgb,
+                            "logo_style": theme.logo_style,
+                            "paper_tint_rgb": theme.paper_tint_rgb,
+                            "header_alignment": theme.header_alignment,
+                        },
+                    },
+                )
+                gt_path.write_text(gt.model_dump_json(indent=2), encoding="utf-8")
 
-            letter = make_letter(doc_id, theme.company_name, template)
+            else:
+                template = getattr(design, "letter_template", None) or (
+                    random.choice(allowed_letter_templates)
+                    if allowed_letter_templates
+                    else "service_change_notice"
+                )
 
-            render_letter_pdf(
-                letter,
-                pdf_path,
-                cfg.render.watermark_text,
-                theme=theme,
-                page_size=cfg.render.page_size,
-            )
+                letter = make_letter(doc_id, theme.company_name, template)
 
-            jpg_path = pages_dir / f"{doc_id}.jpg"
-            render_letter_jpg(
-                letter,
-                jpg_path,
-                cfg.render.watermark_text,
-                theme=theme,
-                width=cfg.render.jpg.width,
-                height=cfg.render.jpg.height,
-                font_jitter_prob=getattr(cfg.noise, "font_jitter_prob", 0.0),
-                font_jitter_strength=getattr(cfg.noise, "font_jitter_strength", 0.0),
-            )
+                pages = layout_letter(letter, cfg.render.watermark_text, theme)
 
-            if cfg.noise.enable:
-                apply_noise_pipeline(
-                    jpg_path,
-                    rotate_deg_max=cfg.noise.rotate_deg_max,
-                    blur_radius_max=cfg.noise.blur_radius_max,
-                    contrast_jitter=cfg.noise.contrast_jitter,
-                    brightness_jitter=cfg.noise.brightness_jitter,
-                    speckle_amount=cfg.noise.speckle_amount,
-                    jpeg_recompress=cfg.noise.jpeg_recompress,
-                    jpeg_quality_min=cfg.noise.jpeg_quality_min,
-                    jpeg_quality_max=cfg.noise.jpeg_quality_max,
-                    partial_crop_prob=cfg.noise.partial_crop_prob,
-                    crop_margin_max=cfg.noise.crop_margin_max,
-                    smudge_prob=cfg.noise.smudge_prob,
-                    smudge_strength=cfg.noise.smudge_strength,
-                    downsample_prob=cfg.noise.downsample_prob,
-                    downsample_min_scale=cfg.noise.downsample_min_scale,
-                    downsample_max_scale=cfg.noise.downsample_max_scale,
-                    text_damage_prob=cfg.noise.text_damage_prob,
-                    text_damage_zones_min=cfg.noise.text_damage_zones_min,
-                    text_damage_zones_max=cfg.noise.text_damage_zones_max,
-                    text_damage_strength=cfg.noise.text_damage_strength,
-                    text_damage_box_min_px=cfg.noise.text_damage_box_min_px,
-                    text_damage_box_max_px=cfg.noise.text_damage_box_max_px,
+                render_letter_pdf(
+                    letter,
+                    pdf_path,
+                    cfg.render.watermark_text,
+                    theme=theme,
+                    page_size=cfg.render.page_size,
+                    pages=pages,
                 )
 
-            vis = _visibility_flags("letter")
-            gt = GroundTruth(
-                doc_type="letter",
-                doc_id=doc_id,
-                fields={
-                    "industry": GroundTruthField(
-                        value=getattr(sc, "industry", "unknown"), visible=True
-                    ),
-                    "company_name": GroundTruthField(
-                        value=theme.company_name, visible=True
-                    ),
-                    "template": GroundTruthField(value=template, visible=True),
-                    "subject": GroundTruthField(value=letter.subject, visible=True),
-                    "owner_full_name": GroundTruthField(
-                        value=letter.owner.full_name, visible=True
-                    ),
-                    "owner_address_lines": GroundTruthField(
-                        value=letter.owner.address_lines,
-                        visible=vis["owner_address_lines"],
-                    ),
-                    "owner_city": GroundTruthField(
-                        value=letter.owner.city, visible=True
-                    ),
-                    "owner_postcode": GroundTruthField(
-                        value=letter.owner.postcode, visible=vis["owner_postcode"]
-                    ),
-                    "sort_code": GroundTruthField(
-                        value=letter.account.sort_code, visible=vis["sort_code"]
-                    ),
-                    "account_number": GroundTruthField(
-                        value=letter.account.account_number,
-                        visible=vis["account_number"],
-                    ),
-                    "issue_date": GroundTruthField(
-                        value=letter.issue_date.isoformat(), visible=True
-                    ),
-                    "body_paragraphs": GroundTruthField(
-                        value=letter.body_paragraphs, visible=True
-                    ),
-                    "table_headers": GroundTruthField(
-                        value=letter.table_headers, visible=bool(letter.table_headers)
-                    ),
-                    "table_rows": GroundTruthField(
-                        value=letter.table_rows, visible=bool(letter.table_rows)
-                    ),
-                },
-                meta={
-                    "prompt": prompt,
-                    "watermark": cfg.render.watermark_text,
-                    "pdf": pdf_path.name,
-                    "jpg": jpg_path.name,
-                    "theme": {
-                        "accent_rgb": theme.accent_rgb,
-                        "logo_style": theme.logo_style,
-                        "paper_tint_rgb": theme.paper_tint_rgb,
-                        "header_alignment": theme.header_alignment,
-                        "logo_position": theme.logo_position,
-                        "base_font": theme.base_font,
-                        "mono_font": theme.mono_font,
+                images, page_lines = _page_images(pages, cfg, page_size, render_mode, noise_params)
+                written = _write_pages(images, pages_dir, [doc_id], doc_id, cfg.render, resolutions)
+                boxes_name = _write_boxes(boxes_path, doc_id, page_lines, images, written[""])
+
+                vis = _visibility_flags("letter")
+                gt = GroundTruth(
+                    doc_type="letter",
+                    doc_id=doc_id,
+                    fields={
+                        "industry": GroundTruthField(
+                            value=getattr(sc, "industry", "unknown"), visible=True
+                        ),
+                        "company_name": GroundTruthField(
+                            value=theme.company_name, visible=True
+                        ),
+                        "template": GroundTruthField(value=template, visible=True),
+                        "subject": GroundTruthField(value=letter.subject, visible=True),
+                        "owner_full_name": GroundTruthField(
+                            value=letter.owner.full_name, visible=True
+                        ),
+                        "owner_address_lines": GroundTruthField(
+                            value=letter.owner.address_lines,
+                            visible=vis["owner_address_lines"],
+                        ),
+                        "owner_city": GroundTruthField(
+                            value=letter.owner.city, visible=True
+                        ),
+                        "owner_postcode": GroundTruthField(
+                            value=letter.owner.postcode, visible=vis["owner_postcode"]
+                        ),
+                        "sort_code": GroundTruthField(
+                            value=letter.account.sort_code, visible=vis["sort_code"]
+                        ),
+                        "account_number": GroundTruthField(
+                            value=letter.account.account_number,
+                            visible=vis["account_number"],
+                        ),
+                        "issue_date": GroundTruthField(
+                            value=letter.issue_date.isoformat(), visible=True
+                        ),
+                        "body_paragraphs": GroundTruthField(
+                            value=letter.body_paragraphs, visible=True
+                        ),
+                        "table_headers": GroundTruthField(
+                            value=letter.table_headers, visible=bool(letter.table_headers)
+                        ),
+                        "table_rows": GroundTruthField(
+                            value=letter.table_rows, visible=bool(letter.table_rows)
+                        ),
                     },
-                },
-            )
-            gt_path.write_text(gt.model_dump_json(indent=2), encoding="utf-8")
-
+                    meta={
+                        "prompt": prompt,
+                        "watermark": cfg.render.watermark_text,
+                        "pdf": pdf_path.name,
+                        "boxes": boxes_name,
+                        "jpg": written.pop("")[0],
+                        "jpg_resolutions": {res: names[0] for res, names in written.items()},
+                        "theme": {
+                            "accent_rgb": theme.accent_rgb,
+                            "logo_style": theme.logo_style,
+                            "paper_tint_rgb": theme.paper_tint_rgb,
+                            "header_alignment": theme.header_alignment,
+                        },
+                    },
+                )
+                gt_path.write_text(gt.model_dump_json(indent=2), encoding="utf-8")
+    finally:
+        # Flush recorded cassettes and release worker threads even if a document fails.
+        llm_client.close()
+
+    report = {
+        "documents": count,
+        "render": {"layer_cache": page_layers.stats(), "text_masks": text_masks.stats()},
+        "llm": {
+            **llm_client.report(),
+            "skipped_unhealthy": llm_skipped,
+            "scenario_parsed_locally": scenario_factory.parsed_locally,
+            "fallbacks": {
+                "scenario": scenario_factory.fallbacks,
+                "design": designer.fallbacks,
+            },
+            "usage": ledger.report(),
+        },
+    }
+    coalescing = _find_layer(llm_client, CoalescingLLMClient)
+    if coalescing is not None:
+        # One table serves every job in the process; these counts are not this run's.
+        report["llm"]["coalesced_process_wide"] = coalescing.flights.report()
+    pooled = _find_layer(llm_client, PooledLLMClient)
+    if pooled is not None:
+        # Each host has its own governor; report it with the host.
+        report["llm"]["endpoints"] = pooled.stats()
+        for entry, ep in zip(report["llm"]["endpoints"], pooled.endpoints):
+            governed = _find_layer(ep.client, GovernedLLMClient)
+            if governed is not None:
+                entry["governor"] = governed.governor.stats()
+    else:
+        governed = _find_layer(llm_client, GovernedLLMClient)
+        if governed is not None:
+            report["llm"]["governor"] = governed.governor.stats()
+    bedrock = _find_layer(llm_client, BedrockClient)
+    if bedrock is not None:
+        report["llm"]["bedrock"] = bedrock.stats()
+    if use_llm:
+        fb = report["llm"]["fallbacks"]
+        tok = report["llm"]["usage"]["totals"]
+        print(
+            f"LLM: {report['llm']['ok']}/{report['llm']['calls']} calls ok, "
+            f"fallbacks scenario={fb['scenario']} design={fb['design']}, "
+            f"skipped while unhealthy={llm_skipped}, "
+            f"breaker={report['llm']['breaker_state']}, "
+            f"tokens in/out={tok['prompt_tokens']}/{tok['response_tokens']}"
+        )
     print(f"Done. Wrote to: {out_root.resolve()}")
+    return report
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Prompts that are clearly about another sector never become bank statements,
+# unless they also mention statement-style content.
+NON_FINANCIAL = (
+    "shipping",
+    "manifest",
+    "delivery",
+    "depot",
+    "warehouse",
+    "logistics",
+    "dispatch",
+    "route",
+    "appointment",
+    "clinic",
+    "hospital",
+    "healthcare",
+    "prescription",
+    "utilities",
+    "outage",
+    "maintenance",
+    "service change",
+    "construction",
+    "site",
+    "project",
+    "quote",
+    "consultancy",
+    "invoice",
+    "purchase order",
+    "work order",
+    "cloud",
+    "saas",
+    "subscription",
+    "billing notice",
+)
+FINANCIAL = (
+    "statement",
+    "transactions",
+    "balance",
+    "account",
+    "sort code",
+    "overdraft",
+    "direct debit",
+    "mortgage",
+    "loan arrears",
+    "interest rate",
+)
+
+# Keyword routing for TemplateDesigner, checked in order; first match wins.
+TEMPLATE_ROUTES: tuple[tuple[str, str | None, tuple[str, ...]], ...] = (
+    ("letter", "shipping_schedule",
+     ("shipping", "delivery", "depot", "warehouse", "logistics", "dispatch")),
+    ("letter", "appointment_notice",
+     ("appointment", "clinic", "healthcare", "hospital", "checkup")),
+    ("letter", "invoice_summary", ("invoice", "bill", "billing", "payment due")),
+    ("letter", "service_change_notice",
+     ("utilities", "outage", "service change", "service changes", "maintenance window", "planned works")),
+    ("letter", "policy_renewal_notice", ("policy", "renewal", "insurance")),
+    ("statement", None,
+     ("statement", "transactions", "balance", "account statement", "sort code", "direct debit", "overdraft")),
+)
+
+# Industry named by the prompt, checked in order; values match ScenarioFactory's industries.
+INDUSTRY_ROUTES: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("logistics", ("shipping", "manifest", "delivery", "depot", "warehouse", "logistics", "dispatch", "courier")),
+    ("healthcare", ("appointment", "clinic", "hospital", "healthcare", "prescription", "checkup", "pharmacy")),
+    ("utilities", ("utilities", "utility", "outage", "energy", "water supply")),
+    ("construction", ("construction", "builder", "building site", "contractor")),
+    ("insurance", ("insurance", "insurer", "policy renewal")),
+    ("telecoms", ("telecom", "broadband", "mobile network")),
+    ("property", ("property", "letting", "landlord", "tenant", "estate agent")),
+    ("education", ("school", "college", "university", "tuition")),
+    ("retail", ("retail", "shop", "store")),
+    ("banking", ("bank", "statement", "sort code", "overdraft", "direct debit", "mortgage")),
+)
+
+
+def _all_keywords() -> list[str]:
+    words = set(NON_FINANCIAL) | set(FINANCIAL)
+    for _, _, kws in TEMPLATE_ROUTES:
+        words.update(kws)
+    for _, kws in INDUSTRY_ROUTES:
+        words.update(kws)
+    return sorted(words, key=len, reverse=True)
+
+
+_KEYWORDS = _all_keywords()
+# Whole words only ("restore workshop" is not "store"/"shop"), allowing a
+# plural ending. Zero-width lookahead so matches may overlap; longest
+# alternative first.
+_MATCHER = re.compile(
+    r"(?=\b(" + "|".join(re.escape(k) for k in _KEYWORDS) + r")(?:e?s)?\b)"
+)
+# A phrase hit also implies the keywords it is made of ("billing notice"
+# implies "billing"), which the lookahead would otherwise shadow.
+_IMPLIED = {
+    k: frozenset(o for o in _KEYWORDS if re.search(r"\b" + re.escape(o) + r"(?:e?s)?\b", k))
+    for k in _KEYWORDS
+}
+
+
+@dataclass(frozen=True)
+class PromptAnalysis:
+    hits: frozenset[str]
+    doc_type_hint: str | None
+    template_hint: str | None
+    industry_hint: str | None
+    non_financial: bool
+
+
+@lru_cache(maxsize=256)
+def analyze_prompt(prompt: str | None) -> PromptAnalysis:
+    lower = (prompt or "").lower()
+    hits: set[str] = set()
+    for m in _MATCHER.finditer(lower):
+        hits |= _IMPLIED[m.group(1)]
+
+    doc_type = template = None
+    for dt, tpl, kws in TEMPLATE_ROUTES:
+        if not hits.isdisjoint(kws):
+            doc_type, template = dt, tpl
+            break
+
+    industry = next(
+        (ind for ind, kws in INDUSTRY_ROUTES if not hits.isdisjoint(kws)), None
+    )
+
+    non_financial = (
+        bool(lower.strip())
+        and not hits.isdisjoint(NON_FINANCIAL)
+        and hits.isdisjoint(FINANCIAL)
+    )
+    return PromptAnalysis(frozenset(hits), doc_type, template, industry, non_financial)
@@ -1,194 +1,266 @@
 from __future__ import annotations
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from .models import StatementDoc, LetterDoc
-from .branding import Theme, jpg_draw_header
+from .branding import Theme
+from .fonts import SANS, MONO, glyph_atlas, line_spacing, load_font, text_bbox, text_length, text_masks
+from .layer_cache import page_layers
+from .layout import Page, Text, Line, Rect, Ellipse, Polygon, Op, layout_statement, layout_letter, op_rows, scale_page, shift_op
+from functools import lru_cache
 import random
+import re
 
-def _font(name: str, size: int):
-    try:
-        return ImageFont.truetype(name, size)
-    except Exception:
-        return ImageFont.load_default()
-
-SANS = "DejaVuSans.ttf"
-MONO = "DejaVuSansMono.ttf"
-
-def _wrap(text: str, width: int):
-    words = text.split()
-    lines, cur, n = [], [], 0
-    for w in words:
-        if n + len(w) + (1 if cur else 0) > width:
-            lines.append(" ".join(cur)); cur=[w]; n=len(w)
-        else:
-            cur.append(w); n += len(w) + (1 if len(cur)>1 else 0)
-    if cur: lines.append(" ".join(cur))
-    return lines
+FACES = {"sans": SANS, "mono": MONO}
 
-def _paper_bg(width: int, height: int, tint):
-    if not tint:
-        return Image.new("RGB", (width, height), "white")
-    r,g,b = tint
-    base = Image.new("RGB", (width, height), (255,255,255))
-    overlay = Image.new("RGB", (width, height), (r,g,b))
-    return Image.blend(base, overlay, alpha=0.08)
+@lru_cache(maxsize=256)
+def _ink(rgb, mode: str):
+    """Layout colours are RGB; single-channel pages get Pillow's luma of them."""
+    if rgb is None or mode == "RGB":
+        return rgb
+    return Image.new("RGB", (1, 1), rgb).convert(mode).getpixel((0, 0))
 
-def _draw_text_jittered(d: ImageDraw.ImageDraw, xy, text: str, font_size: int, fill, strength: float):
+def _draw_text_jittered(d: ImageDraw.ImageDraw, xy, text: str, font_size: int, fill, strength: float, rng=random):
+    # Per-character d.text calls dominated jittered rows; paste cached glyph
+    # masks instead, which draws the same pixels.
     x, y = xy
-    f_sans = _font(SANS, font_size)
-    f_mono = _font(MONO, font_size)
+    atlases = {SANS: glyph_atlas(SANS, font_size, d.fontmode), MONO: glyph_atlas(MONO, font_size, d.fontmode)}
     for ch in text:
-        use_mono = ch.isdigit() and (random.random() < 0.65)
-        f = f_mono if use_mono else f_sans
-        dx = int(random.uniform(-1, 1) * 3 * strength) if ch.isdigit() else 0
-        dy = int(random.uniform(-1, 1) * 2 * strength) if ch.isdigit() else 0
-        d.text((x+dx, y+dy), ch, font=f, fill=fill)
-        x += int(d.textlength(ch, font=f))
+        use_mono = ch.isdigit() and (rng.random() < 0.65)
+        face = MONO if use_mono else SANS
+        dx = int(rng.uniform(-1, 1) * 3 * strength) if ch.isdigit() else 0
+        dy = int(rng.uniform(-1, 1) * 2 * strength) if ch.isdigit() else 0
+        g = atlases[face].glyph(ch)
+        if g is not None:
+            mask, (ox, oy) = g
+            d.bitmap((x+dx+ox, y+dy+oy), mask, fill=fill)
+        x += int(text_length(ch, face, font_size, d.mode))
 
-def render_statement_pages_jpg(stmt: StatementDoc, out_dir: Path, base_name: str, watermark: str,
-                               theme: Theme, width: int, height: int, rows_per_page: int = 40, pages_max: int = 4,
-                               font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35) -> list[Path]:
-    rows_per_page = max(10, rows_per_page)
-    pages = [stmt.transactions[i:i+rows_per_page] for i in range(0, len(stmt.transactions), rows_per_page)]
-    pages = pages[:max(1, pages_max)]
+def _draw_op(d: ImageDraw.ImageDraw, op: Op, jitter: bool = False, strength: float = 0.0, rng=random):
+    if isinstance(op, Text):
+        if not op.text:
+            return
+        face = FACES[op.face]
+        x = op.x
+        if op.anchor != "left":
+            tw = text_length(op.text, face, op.size, d.mode)
+            x = op.x - tw if op.anchor == "right" else (2*op.x - tw)//2
+        if jitter and op.jitter:
+            _draw_text_jittered(d, (x, op.y), op.text, op.size, _ink(op.fill, d.mode), strength, rng)
+        else:
+            # Repeated strings are pasted from the mask cache; the cache only
+            # matches ImageDraw.text at whole-pixel positions.
+            m = text_masks.get(op.text, face, op.size, d.fontmode) if x == int(x) and op.y == int(op.y) else None
+            if m is not None:
+                mask, (ox, oy) = m
+                d.bitmap((int(x) + ox, int(op.y) + oy), mask, fill=_ink(op.fill, d.mode))
+            else:
+                d.text((x, op.y), op.text, font=load_font(face, op.size), fill=_ink(op.fill, d.mode))
+    elif isinstance(op, Line):
+        d.line(list(op.points), fill=_ink(op.fill, d.mode), width=op.width)
+    elif isinstance(op, Rect):
+        d.rectangle(list(op.box), fill=_ink(op.fill, d.mode), outline=_ink(op.outline, d.mode), width=op.width)
+    elif isinstance(op, Ellipse):
+        d.ellipse(list(op.box), fill=_ink(op.fill, d.mode), outline=_ink(op.outline, d.mode), width=op.width)
+    elif isinstance(op, Polygon):
+        d.polygon(list(op.points), fill=_ink(op.fill, d.mode), outline=_ink(op.outline, d.mode))
 
-    out_paths: list[Path] = []
-    for pi, txns in enumerate(pages, start=1):
-        img = _paper_bg(width, height, theme.paper_tint_rgb)
+def _page_base(page: Page, width: int, height: int, mode: str = "RGB") -> Image.Image:
+    """Paper plus the page's static layers, each prefix cached in ``page_layers``.
+
+    The layers themselves are the key, so every page and document sharing a
+    watermark and header shares the composited image.
+    """
+    def build(depth: int) -> Image.Image:
+        if depth == 0:
+            return Image.new(mode, (width, height), _ink(page.paper, mode))
+        img = cached(depth - 1)
         d = ImageDraw.Draw(img)
+        for op in page.layers[depth - 1]:
+            _draw_op(d, op)
+        return img
 
-        d.text((60, 60), watermark, font=_font(SANS, 26), fill=(210,210,210))
-
-        y = 120
-        jpg_draw_header(d, theme, f"Statement (page {pi}/{len(pages)})", 120, y, page_w=width)
-        y += 90
-
-        f = _font(SANS, 18)
-        f_small = _font(SANS, 16)
-        d.text((80, y), f"Issue date: {stmt.issue_date.strftime('%d %b %Y')}", font=f, fill="black"); y += 28
-        d.text((80, y), f"Period: {stmt.period_from.strftime('%d %b %Y')} to {stmt.period_to.strftime('%d %b %Y')}", font=f, fill="black"); y += 45
-
-        if pi == 1:
-            d.text((80, y), stmt.owner.full_name, font=_font(SANS, 22), fill="black"); y += 30
-            for line in stmt.owner.address_lines[:3]:
-                d.text((80, y), line[:80], font=f, fill="black"); y += 26
-            d.text((80, y), f"{stmt.owner.city}  {stmt.owner.postcode}", font=f, fill="black"); y += 40
-            d.text((80, y), f"Sort code: {stmt.account.sort_code}    Account: {stmt.account.account_number}", font=f, fill="black"); y += 45
-            d.text((80, y), f"Opening balance: £{stmt.opening_balance:,.2f}", font=f, fill="black"); y += 26
-            d.text((80, y), f"Closing balance: £{stmt.closing_balance:,.2f}", font=f, fill="black"); y += 40
-        else:
-            d.text((80, y), f"Sort code: {stmt.account.sort_code}    Account: {stmt.account.account_number}", font=f, fill="black"); y += 50
-
-        d.text((80, y), "Date", font=f_small, fill="black")
-        d.text((240, y), "Description", font=f_small, fill="black")
-        d.text((1100, y), "Paid in", font=f_small, fill="black")
-        d.text((1250, y), "Paid out", font=f_small, fill="black")
-        d.text((1420, y), "Balance", font=f_small, fill="black")
-        y += 22
-        d.line((80, y, width-80, y), fill=(120,120,120), width=2)
-        y += 18
-
-        jitter = (random.random() < font_jitter_prob)
-        for t in txns:
-            d.text((80, y), t.txn_date.strftime('%d %b %Y'), font=f_small, fill="black")
-            d.text((240, y), t.description[:55], font=f_small, fill="black")
-            pin = f"£{t.paid_in:,.2f}" if t.paid_in else ""
-            pout = f"£{t.paid_out:,.2f}" if t.paid_out else ""
-            bal = f"£{t.running_balance:,.2f}"
-
-            if jitter:
-                _draw_text_jittered(d, (1100, y), pin, 16, "black", font_jitter_strength)
-                _draw_text_jittered(d, (1250, y), pout, 16, "black", font_jitter_strength)
-                _draw_text_jittered(d, (1420, y), bal, 16, "black", font_jitter_strength)
-            else:
-                d.text((1100, y), pin, font=f_small, fill="black")
-                d.text((1250, y), pout, font=f_small, fill="black")
-                d.text((1420, y), bal, font=f_small, fill="black")
+    def cached(depth: int) -> Image.Image:
+        if depth == 0:
+            return build(0)
+        return page_layers.get((mode, width, height, page.paper) + page.layers[:depth], lambda: build(depth))
+
+    return cached(len(page.layers))
+
+def render_page(page: Page, width: int | None = None, height: int | None = None,
+                font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35, mode: str = "RGB",
+                rng: random.Random | None = None) -> Image.Image:
+    """Rasterize ``page`` in ``mode`` ("RGB" or "L"); bilevel output comes from ``to_bilevel``.
+
+    The layout is scaled to ``width`` (default: 1:1), so smaller or larger
+    pages show the same content; see ``layout.page_pixels`` for sizing by DPI.
+    Font jitter draws from ``rng`` (the global ``random`` by default), so
+    pages can be rendered on several threads with their own streams.
+    """
+    rng = rng or random
+    width = width or page.size[0]
+    scale = width / page.size[0]
+    page = scale_page(page, scale)
+    font_jitter_strength *= scale
+    img = _page_base(page, width, height or page.size[1], mode)
+    d = ImageDraw.Draw(img)
+    jitter = False
+    if any(isinstance(op, Text) and op.jitter for op in page.ops):
+        jitter = (rng.random() < font_jitter_prob)
+    for op in page.ops:
+        _draw_op(d, op, jitter, font_jitter_strength, rng)
+    return img
+
+def page_rows(page: Page, width: int | None = None, font_jitter_prob: float = 0.0,
+              font_jitter_strength: float = 0.35, mode: str = "RGB", rng: random.Random | None = None):
+    """``render_page`` a band at a time: returns ``rows(top, bottom)`` drawing only those rows.
+
+    For pages too large to hold several copies of (see
+    ``noise.apply_noise_banded``). Each band draws just the ops reaching into
+    it, static layers included, bypassing the layer cache. Jittered strings
+    draw from a stream of their own, so a string cut by a band edge is
+    jittered the same on both sides.
+    """
+    rng = rng or random
+    width = width or page.size[0]
+    scale = width / page.size[0]
+    page = scale_page(page, scale)
+    font_jitter_strength *= scale
+    jitter = False
+    if any(isinstance(op, Text) and op.jitter for op in page.ops):
+        jitter = (rng.random() < font_jitter_prob)
+    seed = rng.getrandbits(64)
+    ops = [(op, False) for layer in page.layers for op in layer] + [(op, jitter) for op in page.ops]
+    spans = [op_rows(op) for op, _ in ops]
+
+    def rows(top: int, bottom: int) -> Image.Image:
+        img = Image.new(mode, (width, bottom - top), _ink(page.paper, mode))
+        d = ImageDraw.Draw(img)
+        for i, ((op, jit), (y0, y1)) in enumerate(zip(ops, spans)):
+            if y1 > top and y0 < bottom:
+                _draw_op(d, shift_op(op, -top), jit, font_jitter_strength, random.Random(seed + i) if jit else rng)
+        return img
+
+    return rows
+
+EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp", "png": ".png", "tiff": ".tif"}
+
+def _field_at(fields, text: str, start: int, end: int) -> str | None:
+    for name, value in fields:
+        i = text.find(value) if value else -1
+        if i >= 0 and i <= start and end <= i + len(value):
+            return name
+    return None
+
+def text_boxes(page: Page, width: int | None = None) -> list[dict]:
+    """Line and word boxes of every string on ``page``, as ``render_page`` draws it.
+
+    Boxes are ink extents in pixels of a ``width``-wide render, before noise;
+    each word carries the ground-truth field it shows (see ``Text.fields``).
+    Font jitter can move single digits by a pixel or two; boxes ignore it.
+    """
+    page = scale_page(page, (width or page.size[0]) / page.size[0])
+    lines = []
+    for op in [op for layer in page.layers for op in layer] + list(page.ops):
+        if not isinstance(op, Text) or not op.text.strip():
+            continue
+        face = FACES[op.face]
+        x = op.x
+        if op.anchor != "left":
+            tw = text_length(op.text, face, op.size)
+            x = op.x - tw if op.anchor == "right" else (2*op.x - tw)//2
+        offset = 0
+        for k, part in enumerate(op.text.split("\n")):
+            y = op.y + k * line_spacing(face, op.size)
+            words = []
+            for m in re.finditer(r"\S+", part):
+                wx = x + text_length(part[:m.start()], face, op.size)
+                l, t, r, b = text_bbox(m.group(), face, op.size)
+                words.append({
+                    "text": m.group(),
+                    "box": [wx + l, y + t, wx + r, y + b],
+                    "field": _field_at(op.fields, op.text, offset + m.start(), offset + m.end()),
+                })
+            offset += len(part) + 1
+            if not words:
+                continue
+            lines.append({
+                "text": part.strip(),
+                "box": [min(w["box"][0] for w in words), min(w["box"][1] for w in words),
+                        max(w["box"][2] for w in words), max(w["box"][3] for w in words)],
+                "fields": list(dict.fromkeys(w["field"] for w in words if w["field"])),
+                "words": words,
+            })
+    return lines
+
+def save_jpg(img: Image.Image, path: Path, quality: int = 92):
+    """The one encode a page gets: renderers and noise hand images along in memory."""
+    img.save(path, format="JPEG", quality=quality)
+
+def save_options(fmt: str, quality: int = 85, subsampling: str = "4:2:0", effort: int = 4,
+                 tiff_compression: str = "tiff_deflate", bilevel: bool = False) -> dict:
+    """Pillow ``save`` keyword arguments for a page image format."""
+    if fmt == "jpeg":
+        return {"format": "JPEG", "quality": quality, "subsampling": subsampling, "optimize": effort >= 6}
+    if fmt == "webp":
+        return {"format": "WEBP", "quality": quality, "method": max(0, min(6, effort))}
+    if fmt == "png":
+        return {"format": "PNG", "compress_level": max(0, min(9, effort))}
+    if fmt == "tiff":
+        return {"format": "TIFF", "compression": "group4" if bilevel else tiff_compression}
+    raise ValueError(f"unknown page image format {fmt!r}; expected one of {sorted(EXTENSIONS)}")
 
-            y += 24
-            if y > height - 260:
-                break
+def save_pages(images: list[Image.Image], path: Path, **options):
+    """All of ``images`` in one file (multi-page TIFF)."""
+    images[0].save(path, save_all=True, append_images=images[1:], **options)
 
-        if pi == len(pages):
-            y += 20
-            d.text((80, y), "Notes:", font=f_small, fill="black"); y += 26
-            for n in stmt.footer_notes[:6]:
-                d.text((95, y), f"• {n}"[:110], font=f_small, fill="black"); y += 22
+def downscale(img: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """``img`` at ``size``: an integer box reduction, then a resample for the rest."""
+    w, h = size
+    factor = min(img.width // w, img.height // h)
+    if factor >= 2:
+        img = img.reduce(factor)
+    if img.size != (w, h):
+        img = img.resize((w, h), Image.Resampling.BICUBIC)
+    return img
 
+def to_bilevel(img: Image.Image, method: str = "dither", threshold: int = 160) -> Image.Image:
+    """1-bit version of a finished grayscale page: Floyd-Steinberg, or a hard threshold."""
+    if img.mode != "L":
+        img = img.convert("L")
+    if method == "threshold":
+        return img.point(lambda v: 255 if v >= threshold else 0, mode="1")
+    return img.convert("1")
+
+def render_statement_pages(stmt: StatementDoc, watermark: str, theme: Theme, width: int, height: int,
+                           rows_per_page: int = 40, pages_max: int = 4,
+                           font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35,
+                           pages: list[Page] | None = None, mode: str = "RGB") -> list[Image.Image]:
+    if pages is None:
+        pages = layout_statement(stmt, watermark, theme, rows_per_page, pages_max)
+    return [render_page(page, width, height, font_jitter_prob, font_jitter_strength, mode) for page in pages]
+
+def render_letter_page(letter: LetterDoc, watermark: str, theme: Theme, width: int, height: int,
+                       font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35,
+                       pages: list[Page] | None = None, mode: str = "RGB") -> Image.Image:
+    if pages is None:
+        pages = layout_letter(letter, watermark, theme)
+    return render_page(pages[0], width, height, font_jitter_prob, font_jitter_strength, mode)
+
+def render_statement_pages_jpg(stmt: StatementDoc, out_dir: Path, base_name: str, watermark: str,
+                               theme: Theme, width: int, height: int, rows_per_page: int = 40, pages_max: int = 4,
+                               font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35,
+                               pages: list[Page] | None = None) -> list[Path]:
+    images = render_statement_pages(stmt, watermark, theme, width, height, rows_per_page, pages_max,
+                                    font_jitter_prob, font_jitter_strength, pages)
+    out_paths: list[Path] = []
+    for pi, img in enumerate(images, start=1):
         out_path = out_dir / f"{base_name}_p{pi}.jpg"
-        img.save(out_path, quality=92)
+        save_jpg(img, out_path)
         out_paths.append(out_path)
-
     return out_paths
 
 def render_letter_jpg(letter: LetterDoc, out_path: Path, watermark: str, theme: Theme, width: int, height: int,
-                      font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35):
-    img = _paper_bg(width, height, theme.paper_tint_rgb)
-    d = ImageDraw.Draw(img)
-    d.text((60, 60), watermark, font=_font(SANS, 26), fill=(210,210,210))
-
-    y = 120
-    jpg_draw_header(d, theme, "Letter", 120, y, page_w=width)
-    y += 90
-
-    f_h = _font(SANS, 22)
-    f = _font(SANS, 18)
-    f_small = _font(SANS, 16)
-
-    d.text((80, y), f"Date: {letter.issue_date.strftime('%d %b %Y')}", font=f, fill="black"); y += 50
-    d.text((80, y), letter.owner.full_name, font=f_h, fill="black"); y += 30
-    for line in letter.owner.address_lines[:3]:
-        d.text((80, y), line[:80], font=f, fill="black"); y += 26
-    d.text((80, y), f"{letter.owner.city}  {letter.owner.postcode}", font=f, fill="black"); y += 50
-
-    d.text((80, y), f"Subject: {letter.subject}"[:110], font=f_h, fill="black"); y += 40
-
-    sc = letter.display_sort_code or letter.account.sort_code
-    an = letter.display_account_number or letter.account.account_number
-
-    jitter = (random.random() < font_jitter_prob)
-    if jitter:
-        _draw_text_jittered(d, (80, y), f"Sort code: {sc}", 18, "black", font_jitter_strength); y += 26
-        _draw_text_jittered(d, (80, y), f"Account no: {an}", 18, "black", font_jitter_strength); y += 50
-    else:
-        d.text((80, y), f"Sort code: {sc}", font=f, fill="black"); y += 26
-        d.text((80, y), f"Account no: {an}", font=f, fill="black"); y += 50
-
-    for para in letter.body_paragraphs[:7]:
-        for line in _wrap(para, 92):
-            d.text((80, y), line, font=f, fill="black"); y += 24
-            if y > height - 420:
-                break
-        y += 16
-        if y > height - 420:
-            break
-
-    if letter.table_headers and letter.table_rows and y < height - 360:
-        d.text((80, y), (letter.table_title or "Details")[:60], font=f_h, fill="black"); y += 34
-        cols = len(letter.table_headers)
-        col_w = (width - 160) // max(1, cols)
-        d.rectangle([80, y, width-80, y+28], outline=(160,160,160), fill=(245,245,245))
-        for i,hdr in enumerate(letter.table_headers):
-            d.text((85 + i*col_w, y+6), str(hdr)[:18], font=f_small, fill="black")
-        y += 28
-        for r in letter.table_rows[:10]:
-            d.rectangle([80, y, width-80, y+26], outline=(210,210,210))
-            for i,cell in enumerate(r[:cols]):
-                d.text((85 + i*col_w, y+5), str(cell)[:22], font=f_small, fill="black")
-            y += 26
-            if y > height - 260:
-                break
-        y += 18
-
-    if letter.optional_lines and y < height - 240:
-        d.text((80, y), "Additional information", font=f_h, fill="black"); y += 34
-        for l in letter.optional_lines[:10]:
-            d.text((95, y), f"• {l}"[:110], font=f_small, fill="black"); y += 22
-            if y > height - 220:
-                break
-
-    y += 24
-    d.text((80, y), "Yours sincerely,", font=f, fill="black"); y += 70
-    d.text((80, y), "Customer Support (Synthetic)", font=f_h, fill="black")
-
-    img.save(out_path, quality=92)
+                      font_jitter_prob: float = 0.0, font_jitter_strength: float = 0.35,
+                      pages: list[Page] | None = None):
+    img = render_letter_page(letter, watermark, theme, width, height, font_jitter_prob, font_jitter_strength, pages)
+    save_jpg(img, out_path)
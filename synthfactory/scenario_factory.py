@@ -3,15 +3,26 @@ from __future__ import annotations
 import json
 import random
 import re
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, replace
 
 from .llm_client import LLMClient
 from .llm_factory import create_llm_client
+from .llm_ledger import LLMLedger, process_ledger
+from .prompt_analysis import analyze_prompt
+from .scenario_parser import parse_scenario_prompt
 
 LOGO_STYLES = ("nb_bars", "c_circle", "h_wave", "a_triangle", "s_slash")
 HEADER_ALIGNMENTS = ("left", "center", "right")
 
+_FIELD_SPECS = {
+    "industry": "industry",
+    "company_name": "company_name",
+    "accent_rgb": "accent_rgb (array of 3 ints 0-255)",
+    "logo_style": "logo_style (nb_bars|c_circle|h_wave|a_triangle|s_slash)",
+    "paper_tint_rgb": "paper_tint_rgb (array of 3 ints or null)",
+    "header_alignment": "header_alignment (left|center|right)",
+}
+
 
 @dataclass(frozen=True)
 class Scenario:
@@ -29,11 +40,19 @@ class ScenarioFactory:
         *,
         enabled: bool = True,
         provider: str = "ollama",
-        llm_client: Optional[LLMClient] = None,
-        rng: Optional[random.Random] = None,
+        llm_client: LLMClient | None = None,
+        rng: random.Random | None = None,
+        local_parse: bool = True,
+        ledger: LLMLedger | None = None,
     ):
         self.enabled = bool(enabled)
+        self.ledger = ledger or process_ledger
         self.rng = rng or random.Random()
+        self.local_parse = bool(local_parse)
+        # LLM calls that failed, timed out or were refused and used _random_scenario.
+        self.fallbacks = 0
+        # Prompts fully resolved by scenario_parser, with no LLM call.
+        self.parsed_locally = 0
         self._company_pool = [
             "Harbourlight",
             "Northbridge",
@@ -102,35 +121,57 @@ class ScenarioFactory:
 
     def next(self, prompt: str | None) -> Scenario:
         prompt = (prompt or "").strip()
+        industry_hint = analyze_prompt(prompt).industry_hint
+        base = self._random_scenario(industry_hint)
+        wanted = list(_FIELD_SPECS)
+        if prompt and self.local_parse:
+            facts = parse_scenario_prompt(prompt)
+            base = replace(base, **facts.fields)
+            wanted = [k for k in _FIELD_SPECS if k in facts.unresolved]
+            if not wanted:
+                self.parsed_locally += 1
+                return base
+
         if (not self.enabled) or (not prompt) or not self._llm_client:
-            return self._random_scenario()
+            return base
 
         variation_hint = f"variation_seed={self.rng.randint(0, 10_000_000)}"
 
-        sys = """Return ONLY strict JSON with keys:
-industry, company_name, accent_rgb (array of 3 ints 0-255),
-logo_style (nb_bars|c_circle|h_wave|a_triangle|s_slash),
-paper_tint_rgb (array of 3 ints or null),
-header_alignment (left|center|right).
+        sys = (
+            "Return ONLY strict JSON with keys:\n"
+            + ",\n".join(_FIELD_SPECS[k] for k in wanted)
+            + """.
 
 Rules:
 - Fictional company only; DO NOT use real banks/brands.
 - If the user specifies company name / colours / alignment, respect it.
 - If not specified, RANDOMISE per document (do not stick to one default style).
 """
-
-        llm_prompt = (
-            sys + "\n\nUser context:\n" + prompt + "\n" + variation_hint + "\n\nJSON:"
         )
-        data = self._llm_client.generate(llm_prompt)
 
+        # Everything but the seed is the same for every document of a run, so it
+        # goes in the system text where the backend can reuse its prefill.
+        with self.ledger.call("ScenarioFactory") as call:
+            try:
+                data = self._llm_client.generate(
+                    variation_hint + "\n\nJSON:",
+                    system=sys + "\n\nUser context:\n" + prompt,
+                )
+            except Exception:
+                data = None
+            call.parsed = bool(data)
+            call.fallback = not data
         if not data:
-            return self._random_scenario()
-        return self._coerce(data, fallback=self._random_scenario())
+            self.fallbacks += 1
+            return base
+        # Only take what was asked for; locally parsed facts stay authoritative.
+        return self._coerce({k: v for k, v in data.items() if k in wanted}, fallback=base)
 
-    def _random_scenario(self) -> Scenario:
+    def _random_scenario(self, industry_hint: str | None = None) -> Scenario:
         name = self.rng.choice(self._company_pool)
         industry = self.rng.choice(self._industries)
+        if industry_hint:
+            industry = industry_hint
         suffix = self.rng.choice(self._suffixes)
         company_name = f"{name} {suffix} (Synthetic)"
         accent_rgb = (
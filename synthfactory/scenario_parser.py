@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+from .prompt_analysis import analyze_prompt
+
+COLOURS: dict[str, tuple[int, int, int]] = {
+    "red": (200, 30, 40),
+    "crimson": (180, 20, 60),
+    "maroon": (128, 20, 30),
+    "burgundy": (128, 0, 50),
+    "orange": (240, 130, 20),
+    "amber": (255, 176, 0),
+    "peach": (255, 190, 150),
+    "coral": (250, 110, 90),
+    "yellow": (240, 200, 20),
+    "gold": (212, 175, 55),
+    "green": (30, 150, 70),
+    "lime": (140, 200, 40),
+    "olive": (110, 120, 40),
+    "mint": (120, 210, 170),
+    "teal": (0, 128, 128),
+    "turquoise": (40, 190, 180),
+    "cyan": (0, 170, 210),
+    "blue": (30, 80, 200),
+    "sky blue": (90, 170, 230),
+    "navy": (20, 35, 100),
+    "purple": (110, 40, 150),
+    "violet": (140, 80, 200),
+    "lavender": (170, 150, 220),
+    "magenta": (200, 30, 150),
+    "pink": (235, 100, 160),
+    "rose": (220, 80, 120),
+    "brown": (120, 75, 40),
+    "beige": (220, 200, 160),
+    "cream": (245, 235, 200),
+    "ivory": (250, 245, 225),
+    "grey": (120, 120, 120),
+    "gray": (120, 120, 120),
+    "silver": (170, 170, 175),
+    "black": (20, 20, 20),
+    "white": (255, 255, 255),
+}
+# Too light to read as an accent colour on paper.
+NEAR_WHITE = ("white", "ivory", "cream")
+LIGHTER = ("pale", "light", "pastel", "soft")
+DARKER = ("dark", "deep")
+
+PAPER_WORDS = ("paper", "background", "stationery", "page", "pages")
+ACCENT_WORDS = ("logo", "accent", "branding", "brand", "header", "heading", "theme", "colour scheme", "color scheme")
+
+LOGO_SHAPES = {
+    "bars": "nb_bars", "bar": "nb_bars", "stripes": "nb_bars",
+    "circle": "c_circle", "circular": "c_circle", "ring": "c_circle", "round": "c_circle",
+    "wave": "h_wave", "wavy": "h_wave",
+    "triangle": "a_triangle", "triangular": "a_triangle",
+    "slash": "s_slash", "diagonal": "s_slash",
+}
+
+_colour_alt = "|".join(re.escape(c) for c in sorted(COLOURS, key=len, reverse=True))
+_COLOUR = re.compile(
+    rf"\b(?:(?P<mod>{'|'.join(LIGHTER + DARKER)})\s+)?(?P<name>{_colour_alt})\b"
+)
+_PAPER = re.compile(rf"\b(?:{'|'.join(PAPER_WORDS)})\b")
+_ACCENT = re.compile(rf"\b(?:{'|'.join(ACCENT_WORDS)})\b")
+_CLAUSE = re.compile(r"[.;\n]|,\s|\band\b|\bwith\b")
+_ALIGN = r"(left|right|cent(?:er|re)(?:e?d)?)"
+_ALIGN_PATTERNS = (
+    re.compile(rf"\b{_ALIGN}(?:[- ]aligned)?\s+(?:header|heading|letterhead|title|logo)\b"),
+    re.compile(rf"\b(?:header|heading|letterhead|title)\s+(?:is\s+|on the\s+|to the\s+|aligned\s+(?:to the\s+)?)?{_ALIGN}\b"),
+    re.compile(rf"\b{_ALIGN}[- ]aligned\b"),
+)
+_COMPANY = re.compile(
+    r"\bcompany(?:\s+name)?\s*[:=]\s*(?P<name>[^.;\n]+?)\s*(?=[.;\n]|,\s|$)", re.IGNORECASE
+)
+_COMPANY_CALLED = re.compile(
+    r"\b(?:called|named)\s+(?P<name>[A-Z][\w&'-]*(?:\s+(?:&\s+)?[A-Z][\w&'-]*)*(?:\s+\(Synthetic\))?)"
+)
+_LOGO_SHAPE = re.compile(
+    rf"\b(?P<shape>{'|'.join(LOGO_SHAPES)})\b[^.;,]*?\blogo\b|\blogo\b[^.;,]*?\b(?P<shape2>{'|'.join(LOGO_SHAPES)})\b"
+)
+
+# Cues that a field is described at all. A field that is mentioned but not
+# parsed is left to the LLM; an unmentioned one is randomised locally, which is
+# what the LLM is instructed to do for it anyway.
+_MENTIONS = {
+    "company_name": re.compile(r"\bcompany(?:\s+name)?\s*[:=]|\b(?:called|named)\b"),
+    "header_alignment": re.compile(r"\b(?:header|heading|letterhead|align(?:ed|ment)?|cent(?:er|re)d)\b"),
+    "logo_style": re.compile(r"\blogo\s+(?:style|shape|mark|design)\b|\bshaped\s+logo\b"),
+    "paper_tint_rgb": re.compile(r"\b(?:paper|stationery|background)\s+(?:colou?r|tint)\b|\btinted\b"),
+    "accent_rgb": re.compile(r"\b(?:accent|brand(?:ing)?)\s+colou?rs?\b|\bcolou?r\s+scheme\b"),
+    "industry": re.compile(r"\b(?:industry|sector)\b"),
+}
+
+
+@dataclass(frozen=True)
+class ScenarioFacts:
+    fields: dict[str, Any] = field(default_factory=dict)
+    mentioned: frozenset[str] = frozenset()
+
+    @property
+    def unresolved(self) -> frozenset[str]:
+        return frozenset(self.mentioned - self.fields.keys())
+
+
+def _shade(rgb: tuple[int, int, int], mod: str | None) -> tuple[int, int, int]:
+    if mod in LIGHTER:
+        return tuple(int(c + (255 - c) * 0.45) for c in rgb)  # type: ignore[return-value]
+    if mod in DARKER:
+        return tuple(int(c * 0.6) for c in rgb)  # type: ignore[return-value]
+    return rgb
+
+
+def _paper_tint(rgb: tuple[int, int, int]) -> tuple[int, int, int]:
+    # Same pale range as ScenarioFactory's stock tints.
+    return tuple(int(255 - (255 - c) * 0.12) for c in rgb)  # type: ignore[return-value]
+
+
+def _normalise_alignment(word: str) -> str:
+    return "center" if word.startswith("cent") else word
+
+
+@lru_cache(maxsize=256)
+def parse_scenario_prompt(prompt: str | None) -> ScenarioFacts:
+    """Read the explicit facts in a prompt (colours, alignment, company name,
+    logo shape, industry) into ``Scenario`` fields."""
+    text = (prompt or "").strip()
+    lower = text.lower()
+    fields: dict[str, Any] = {}
+    mentioned = {name for name, rx in _MENTIONS.items() if rx.search(lower)}
+
+    loose_colour = None
+    for clause in _CLAUSE.split(lower):
+        found = list(_COLOUR.finditer(clause))
+        for i, m in enumerate(found):
+            # A colour describes the noun that follows it, up to the next colour.
+            tail = clause[m.end(): found[i + 1].start() if i + 1 < len(found) else len(clause)]
+            rgb = _shade(COLOURS[m.group("name")], m.group("mod"))
+            if _PAPER.search(tail):
+                mentioned.add("paper_tint_rgb")
+                if "paper_tint_rgb" not in fields:
+                    fields["paper_tint_rgb"] = None if m.group("name") == "white" else _paper_tint(rgb)
+            elif _ACCENT.search(tail) and m.group("name") not in NEAR_WHITE:
+                mentioned.add("accent_rgb")
+                fields.setdefault("accent_rgb", rgb)
+            elif loose_colour is None and m.group("name") not in NEAR_WHITE:
+                loose_colour = rgb
+    if "accent_rgb" not in fields and loose_colour is not None:
+        mentioned.add("accent_rgb")
+        fields["accent_rgb"] = loose_colour
+
+    for rx in _ALIGN_PATTERNS:
+        m = rx.search(lower)
+        if m:
+            fields["header_alignment"] = _normalise_alignment(m.group(1))
+            mentioned.add("header_alignment")
+            break
+
+    m = _COMPANY.search(text) or _COMPANY_CALLED.search(text)
+    if m:
+        name = m.group("name").strip().strip("'\"")[:80]
+        if name:
+            if "(synthetic)" not in name.lower():
+                name = f"{name} (Synthetic)"
+            fields["company_name"] = name
+            mentioned.add("company_name")
+
+    m = _LOGO_SHAPE.search(lower)
+    if m:
+        fields["logo_style"] = LOGO_SHAPES[m.group("shape") or m.group("shape2")]
+        mentioned.add("logo_style")
+
+    industry = analyze_prompt(text).industry_hint
+    if industry:
+        fields["industry"] = industry
+        mentioned.add("industry")
+
+    return ScenarioFacts(fields, frozenset(mentioned))
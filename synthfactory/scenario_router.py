@@ -1,4 +1,5 @@
 from __future__ import annotations
+from .llm_factory import create_llm_client
 from .scenario_factory import Scenario, ScenarioFactory
 
 
@@ -10,4 +11,15 @@ def llm_route(
     model: str = "qwen2.5:1.5b-instruct",
     timeout_s: int = 60,
 ) -> Scenario:
-    return ScenarioFactory(enabled=enabled, provider=provider).next(prompt)
+    # ScenarioFactory reads the shared analyze_prompt() result for its fallback.
+    client = (
+        create_llm_client(
+            provider=provider,
+            ollama_base_url=base_url,
+            ollama_model=model,
+            ollama_timeout=timeout_s,
+        )
+        if enabled
+        else None
+    )
+    return ScenarioFactory(enabled=enabled, provider=provider, llm_client=client).next(prompt)
@@ -0,0 +1,79 @@
+import socket
+import threading
+import time
+from pathlib import Path
+
+import requests
+import uvicorn
+
+import api
+from synthfactory.config import load_config
+from synthfactory.llm_stub import (
+    Cassette,
+    LatencyModel,
+    OllamaStubServer,
+    StubBehaviour,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class CountingCassette(Cassette):
+    def __init__(self):
+        super().__init__(on_miss="empty")
+        self.lookups = 0
+        self._count_lock = threading.Lock()
+
+    def lookup(self, provider, model, prompt):
+        with self._count_lock:
+            self.lookups += 1
+        return super().lookup(provider, model, prompt)
+
+
+def _serve(app):
+    """uvicorn on a free port in a thread: one event loop, as in production."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def test_concurrent_identical_generate_requests_share_llm_calls(tmp_path, monkeypatch):
+    cassette = CountingCassette()
+    with OllamaStubServer(cassette, StubBehaviour(LatencyModel("fixed", 800))) as stub:
+        cfg = load_config(ROOT / "config.yaml")
+        cfg.llm.ollama.base_url = stub.base_url
+        cfg.llm.ollama.endpoints = []
+        cfg.llm.warmup = False
+        cfg.llm.governor.state_dir = str(tmp_path / "governor")
+        cfg.output.local.destination = str(tmp_path / "out")
+        cfg.render.jpg.dpi = 36
+        monkeypatch.setattr(api, "get_config", lambda: cfg.model_copy(deep=True))
+
+        server, thread, url = _serve(api.app)
+        body = {"count": 1, "prompt": "Utility company sending account letters in a friendly tone"}
+        try:
+            assert requests.post(f"{url}/generate", json=body, timeout=60).status_code == 200
+            alone = cassette.lookups
+            assert alone > 0
+
+            codes = []
+            threads = [
+                threading.Thread(target=lambda: codes.append(requests.post(f"{url}/generate", json=body, timeout=60).status_code))
+                for _ in range(2)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    assert codes == [200, 200]
+    assert cassette.lookups - alone == alone
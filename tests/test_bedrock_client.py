@@ -0,0 +1,129 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from synthfactory.bedrock_client import AIMDLimiter, BedrockClient
+from synthfactory.llm_client import CallScope, call_scope
+from synthfactory.llm_stub import Cassette, FakeBedrockRuntime, StubBehaviour
+
+
+class FailingRuntime:
+    """bedrock-runtime stand-in that raises ``errors`` in turn, then answers."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke_model(self, **_):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        body = {"content": [{"type": "text", "text": '{"ok": true}'}], "usage": {"input_tokens": 3, "output_tokens": 2}}
+        return {"body": io.BytesIO(json.dumps(body).encode("utf-8"))}
+
+
+def _client(runtime, retries=6):
+    return BedrockClient(model_id="anthropic.claude-test", client=runtime, limiter=AIMDLimiter(initial=2.0),
+                         throttle_retries=retries, backoff_base_s=0.0)
+
+
+def test_non_client_error_is_a_failed_call_and_leaves_the_limit():
+    client = _client(FailingRuntime([ConnectionError("reset")] * 5), retries=4)
+    with pytest.raises(ConnectionError):
+        client.generate("hi")
+    stats = client.stats()
+    assert client.limiter.limit == 2.0
+    assert client.limiter.inflight == 0
+    assert stats["calls"] == 1 and stats["failed"] == 1
+    assert stats["transient_errors"] == 5
+
+
+def test_transient_errors_are_retried():
+    runtime = FailingRuntime([EndpointConnectionError(endpoint_url="https://bedrock"), ConnectionError("reset")])
+    client = _client(runtime)
+    assert client.generate("hi") == {"ok": True}
+    assert runtime.calls == 3
+    stats = client.stats()
+    assert stats["failed"] == 0 and stats["transient_errors"] == 2
+    assert client.limiter.limit > 2.0  # only the success grew it
+
+
+def test_unreadable_body_is_not_retried():
+    class BadBody(FailingRuntime):
+        def invoke_model(self, **_):
+            self.calls += 1
+            return {"body": io.BytesIO(b"not json")}
+
+    runtime = BadBody([])
+    client = _client(runtime)
+    with pytest.raises(json.JSONDecodeError):
+        client.generate("hi")
+    assert runtime.calls == 1
+    assert client.limiter.limit == 2.0
+    assert client.stats()["failed"] == 1
+
+
+def test_clients_for_one_model_share_a_limiter():
+    a = BedrockClient(model_id="anthropic.claude-shared", client=FailingRuntime([]))
+    b = BedrockClient(model_id="anthropic.claude-shared", client=FailingRuntime([]))
+    c = BedrockClient(model_id="anthropic.claude-other", client=FailingRuntime([]))
+    assert a.limiter is b.limiter
+    assert a.limiter is not c.limiter
+
+
+def test_throttles_halve_the_limit_and_successes_grow_it_back():
+    cassette = Cassette(on_miss="cycle")
+    cassette.record("bedrock", "anthropic.claude-test", "x", '{"ok": true}')
+    runtime = FakeBedrockRuntime(cassette, StubBehaviour(error_rate=1.0))
+    client = BedrockClient(model_id="anthropic.claude-test", client=runtime, limiter=AIMDLimiter(initial=8.0),
+                           throttle_retries=2, backoff_base_s=0.0)
+
+    with pytest.raises(ClientError):
+        client.generate("hi")
+    assert runtime.throttled == 3
+    assert client.limiter.limit == 1.0  # 8 -> 4 -> 2 -> 1
+
+    runtime.behaviour.error_rate = 0.0
+    limits = []
+    for _ in range(4):
+        assert client.generate("hi") == {"ok": True}
+        limits.append(client.limiter.limit)
+    assert limits == sorted(limits) and limits[0] == 2.0 and limits[-1] > 2.5
+    assert client.stats()["throttles"] == 3
+
+
+def _in_scope(scope, fn):
+    token = call_scope.set(scope)
+    try:
+        return fn()
+    finally:
+        call_scope.reset(token)
+
+
+def test_full_limiter_gives_up_at_the_deadline():
+    limiter = AIMDLimiter(initial=1.0)
+    limiter.acquire()
+    client = BedrockClient(model_id="anthropic.claude-test", client=FailingRuntime([]), limiter=limiter)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        _in_scope(CallScope(deadline=time.monotonic() + 0.2), lambda: client.generate("hi"))
+    assert time.monotonic() - t0 < 1.0
+    assert client.limiter.inflight == 1
+
+
+def test_cancelled_call_stops_retrying():
+    runtime = FailingRuntime([ConnectionError("reset")] * 5)
+    client = BedrockClient(model_id="anthropic.claude-test", client=runtime, limiter=AIMDLimiter(initial=2.0),
+                           throttle_retries=6, backoff_base_s=8.0)
+    scope = CallScope()
+    threading.Timer(0.1, scope.cancelled.set).start()
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        _in_scope(scope, lambda: client.generate("hi"))
+    assert time.monotonic() - t0 < 1.5
+    assert runtime.calls < 3
+    assert client.stats()["failed"] == 1
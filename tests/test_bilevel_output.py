@@ -0,0 +1,42 @@
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+
+from synthfactory.config import RenderCfg
+from synthfactory.pipeline import _render_mode, _write_pages
+
+
+@pytest.mark.parametrize("fmt", ["jpeg", "webp"])
+def test_bilevel_rejects_lossy_formats(fmt):
+    with pytest.raises(ValidationError, match="png or tiff"):
+        RenderCfg.model_validate({"color_mode": "1", "jpg": {"format": fmt}})
+
+
+@pytest.mark.parametrize("fmt", ["png", "tiff"])
+def test_bilevel_pages_are_saved_one_bit(tmp_path, fmt):
+    render = RenderCfg.model_validate({"color_mode": "1", "jpg": {"format": fmt}})
+    page = Image.linear_gradient("L").resize((64, 96))
+    written = _write_pages([page, page], tmp_path, ["p1", "p2"], "doc", render, [(32, 48)])
+    for key, names in written.items():
+        for name in names:
+            with Image.open(tmp_path / name) as img:
+                frames = getattr(img, "n_frames", 1)
+                assert frames == (2 if fmt == "tiff" else 1)
+                for i in range(frames):
+                    img.seek(i)
+                    assert img.mode == "1"
+                    assert img.size == ((64, 96) if key == "" else (32, 48))
+                if fmt == "tiff":
+                    assert img.info["compression"] == "group4"
+
+
+@pytest.mark.parametrize("color_mode, mode", [("rgb", "RGB"), ("l", "L"), ("1", "1")])
+def test_pages_keep_the_render_mode(tmp_path, color_mode, mode):
+    render = RenderCfg.model_validate({"color_mode": color_mode, "jpg": {"format": "png"}})
+    page = Image.linear_gradient("L").resize((64, 96)).convert(_render_mode(render))
+    assert page.mode == ("L" if mode != "RGB" else "RGB")
+    written = _write_pages([page], tmp_path, ["p1"], "doc", render, [(32, 48)])
+    for key, (name,) in written.items():
+        with Image.open(tmp_path / name) as img:
+            assert img.mode == mode
+            assert img.size == ((64, 96) if key == "" else (32, 48))
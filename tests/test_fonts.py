@@ -0,0 +1,44 @@
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from synthfactory import fonts
+
+STRINGS = ["Opening balance", "£1,234.56", "12/03/2024", "DIRECT DEBIT - Harbourlight", "g", " x "]
+
+
+@pytest.mark.parametrize("name", [fonts.SANS, fonts.MONO])
+@pytest.mark.parametrize("size", [11, 24, 47])
+def test_cached_metrics_match_a_fresh_face(name, size):
+    fresh = ImageFont.truetype(name, size)
+    assert fonts.load_font(name, size) is fonts.load_font(name, size)
+    assert fonts.load_font(name, size).path == fresh.path
+    for mode in ("RGB", "L"):
+        d = ImageDraw.Draw(Image.new(mode, (1, 1)))
+        for s in STRINGS:
+            assert fonts.text_length(s, name, size, mode) == d.textlength(s, font=fresh)
+    assert fonts.line_spacing(name, size) == fresh.getbbox("A")[3] + 4
+
+
+def test_line_spacing_matches_multiline_text():
+    canvas = Image.new("L", (400, 200), 0)
+    ImageDraw.Draw(canvas).text((0, 0), "A\nA", font=fonts.load_font(fonts.SANS, 30), fill=255)
+    one = Image.new("L", (400, 200), 0)
+    d = ImageDraw.Draw(one)
+    d.text((0, 0), "A", font=fonts.load_font(fonts.SANS, 30), fill=255)
+    d.text((0, fonts.line_spacing(fonts.SANS, 30)), "A", font=fonts.load_font(fonts.SANS, 30), fill=255)
+    assert canvas.tobytes() == one.tobytes()
+
+
+def test_missing_font_falls_back_to_the_default():
+    assert fonts.font_path("no-such-font.ttf") is None
+    assert isinstance(fonts.load_font("no-such-font.ttf", 12), (ImageFont.ImageFont, ImageFont.FreeTypeFont))
+
+
+@pytest.mark.parametrize("name", [fonts.SANS, fonts.MONO])
+@pytest.mark.parametrize("size", [8, 24])
+def test_text_bbox_is_the_ink_of_drawn_text(name, size):
+    for s in STRINGS + ["•", "jy)", "'", "_"]:
+        canvas = Image.new("L", (600, 120), 0)
+        ImageDraw.Draw(canvas).text((50, 40), s, font=fonts.load_font(name, size), fill=255)
+        x0, y0, x1, y1 = canvas.getbbox()
+        assert fonts.text_bbox(s, name, size) == (x0 - 50, y0 - 40, x1 - 50, y1 - 40)
@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from synthfactory.llm_client import LLMClient, SlotWaitTimeout
+from synthfactory.llm_coalesce import CoalescingLLMClient, SingleFlight
+
+
+class Slow(LLMClient):
+    """Answers after ``delay_s``; the first call raises ``first_error`` if set."""
+
+    def __init__(self, delay_s=0.2, first_error=None):
+        self.delay_s = delay_s
+        self.first_error = first_error
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, schema=None, system=None):
+        with self._lock:
+            self.prompts.append(prompt)
+            first = len(self.prompts) == 1
+        time.sleep(self.delay_s)
+        if first and self.first_error is not None:
+            raise self.first_error
+        return {"prompt": prompt}
+
+    def health_check(self):
+        return True
+
+    def cache_key(self):
+        return ("slow",)
+
+
+def _together(client, prompts):
+    with ThreadPoolExecutor(len(prompts)) as ex:
+        futures = []
+        for p in prompts:
+            futures.append(ex.submit(client.generate, p))
+            time.sleep(0.02)  # the first one leads
+        return [f.result() for f in futures]
+
+
+def test_only_identical_prompts_share_a_call():
+    inner = Slow()
+    client = CoalescingLLMClient(inner, flights=SingleFlight())
+    results = _together(client, ["Return JSON. variation_seed=1", "Return JSON. variation_seed=1",
+                                 "Return JSON. variation_seed=2"])
+    assert len(inner.prompts) == 2
+    assert [r["prompt"][-1] for r in results] == ["1", "1", "2"]
+    assert client.flights.report() == {"calls": 3, "leaders": 2, "shared": 1, "reran": 0}
+
+
+def test_waiter_makes_its_own_call_when_the_leader_runs_out_of_budget():
+    inner = Slow(first_error=SlotWaitTimeout("leader cancelled"))
+    client = CoalescingLLMClient(inner, flights=SingleFlight())
+    with ThreadPoolExecutor(2) as ex:
+        leader = ex.submit(client.generate, "p")
+        time.sleep(0.02)
+        waiter = ex.submit(client.generate, "p")
+        with pytest.raises(SlotWaitTimeout):
+            leader.result()
+        assert waiter.result() == {"prompt": "p"}
+    assert len(inner.prompts) == 2
+    assert client.flights.report()["reran"] == 1
+
+
+def test_waiter_shares_a_backend_failure():
+    inner = Slow(first_error=ConnectionError("reset"))
+    client = CoalescingLLMClient(inner, flights=SingleFlight())
+    with ThreadPoolExecutor(2) as ex:
+        leader = ex.submit(client.generate, "p")
+        time.sleep(0.02)
+        waiter = ex.submit(client.generate, "p")
+        for f in (leader, waiter):
+            with pytest.raises(ConnectionError):
+                f.result()
+    assert len(inner.prompts) == 1
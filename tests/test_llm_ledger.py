@@ -0,0 +1,49 @@
+from synthfactory.llm_client import LLMClient
+from synthfactory.llm_ledger import NO_PROVIDER, LLMLedger, note_usage
+from synthfactory.template_designer import TemplateDesigner
+
+
+def test_call_without_provider_is_labelled_and_not_a_parse_failure():
+    ledger = LLMLedger()
+    with ledger.call("ScenarioFactory") as call:
+        call.fallback = True  # e.g. breaker open, no request sent
+    (row,) = ledger.report()["by_caller"]
+    assert (row["provider"], row["model"]) == (NO_PROVIDER, NO_PROVIDER)
+    assert row["fallbacks"] == 1 and row["parse_failures"] == 0
+
+
+def test_parse_failure_needs_a_provider_answer():
+    ledger = LLMLedger()
+    with ledger.call("TemplateDesigner") as call:
+        note_usage("ollama", "m", attempts=1)
+        note_usage("ollama", "m", 5, 7, responded=True)
+        call.fallback = True  # the answer was not JSON
+    with ledger.call("TemplateDesigner") as call:
+        note_usage("ollama", "m", attempts=1)
+        call.fallback = True  # connection refused
+    (row,) = ledger.report()["by_caller"]
+    assert (row["provider"], row["model"]) == ("ollama", "m")
+    assert row["calls"] == 2 and row["fallbacks"] == 2 and row["parse_failures"] == 1
+
+
+class Answers(LLMClient):
+    def __init__(self, answer):
+        self.answer = answer
+
+    def generate(self, prompt, schema=None, system=None):
+        note_usage("ollama", "m", attempts=1)
+        note_usage("ollama", "m", 5, 1, responded=True)
+        return self.answer
+
+    def health_check(self):
+        return True
+
+
+def test_designer_falls_back_on_an_empty_answer():
+    ledger = LLMLedger()
+    designer = TemplateDesigner(llm_client=Answers({}), ledger=ledger)
+    design = designer.next("Warehouse dispatch letters", allowed_letter_templates=[])
+    assert (design.doc_type, design.letter_template) == ("letter", "shipping_schedule")
+    assert designer.fallbacks == 1
+    (row,) = ledger.report()["by_caller"]
+    assert row["fallbacks"] == 1 and row["parse_failures"] == 1
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from synthfactory.config import AppCfg
+from synthfactory.llm_client import CallScope, LLMClient, SlotWaitTimeout, call_scope
+from synthfactory.llm_factory import llm_client_from_config
+from synthfactory.llm_governor import GovernedLLMClient, LLMGovernor
+from synthfactory.llm_pool import PooledLLMClient
+from synthfactory.pipeline import _find_layer
+
+
+def _cfg(tmp_path) -> AppCfg:
+    cfg = AppCfg()
+    cfg.llm.ollama.endpoints = ["http://10.0.0.1:11434", "http://10.0.0.2:11434"]
+    cfg.llm.governor.state_dir = str(tmp_path)
+    return cfg
+
+
+def test_jobs_share_one_pool_per_endpoint_set(tmp_path):
+    first = _find_layer(llm_client_from_config(_cfg(tmp_path)), PooledLLMClient)
+    second = _find_layer(llm_client_from_config(_cfg(tmp_path)), PooledLLMClient)
+    assert first is not None and first is second
+
+    other = _cfg(tmp_path)
+    other.llm.ollama.endpoints = other.llm.ollama.endpoints[:1] + ["http://10.0.0.3:11434"]
+    assert _find_layer(llm_client_from_config(other), PooledLLMClient) is not first
+
+
+def test_find_layer_descends_into_pool_members(tmp_path):
+    client = llm_client_from_config(_cfg(tmp_path))
+    pool = _find_layer(client, PooledLLMClient)
+    governed = _find_layer(client, GovernedLLMClient)
+    assert governed is pool.endpoints[0].client
+    assert _find_layer(pool.endpoints[1].client, GovernedLLMClient).governor is not governed.governor
+
+
+class Answering(LLMClient):
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+
+    def generate(self, prompt, schema=None, system=None):
+        self.calls += 1
+        return {"host": self.name}
+
+    def health_check(self):
+        return True
+
+    def cache_key(self):
+        return ("answering", self.name)
+
+
+def test_local_slot_timeouts_do_not_eject_healthy_hosts(tmp_path):
+    hosts = [Answering("h0"), Answering("h1")]
+    governors = [LLMGovernor(tmp_path / f"{h.name}.json", max_inflight=1) for h in hosts]
+    pool = PooledLLMClient([(h.name, GovernedLLMClient(h, g)) for h, g in zip(hosts, governors)], eject_after=1)
+    held = [g.acquire() for g in governors]  # every slot busy
+
+    for scope in (CallScope(deadline=time.monotonic() + 0.05), CallScope()):
+        if scope.deadline is None:
+            scope.cancelled.set()
+        token = call_scope.set(scope)
+        try:
+            with pytest.raises(SlotWaitTimeout):
+                pool.generate("hi")
+        finally:
+            call_scope.reset(token)
+
+    for entry in pool.stats():
+        assert entry["errors"] == 0 and entry["calls"] == 0
+        assert not entry["ejected"] and entry["inflight"] == 0
+
+    for g, slot in zip(governors, held):
+        g.release(slot)
+    assert pool.generate("hi")["host"] in ("h0", "h1")
+
+
+def test_cancelled_call_is_not_retried_on_another_host():
+    class Failing(Answering):
+        def generate(self, prompt, schema=None, system=None):
+            self.calls += 1
+            scope.cancelled.set()  # the guard gives up while this host fails
+            raise ConnectionError("reset")
+
+    hosts = [Failing("h0"), Failing("h1")]
+    pool = PooledLLMClient([(h.name, h) for h in hosts])
+    scope = CallScope()
+    token = call_scope.set(scope)
+    try:
+        with pytest.raises(ConnectionError):
+            pool.generate("hi")
+    finally:
+        call_scope.reset(token)
+    assert sum(h.calls for h in hosts) == 1
@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from synthfactory import noise
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+@pytest.mark.parametrize("amount", [0.0002, 0.02])  # pixel-access and array paths
+def test_speckle_density_and_black_white_split(mode, amount):
+    page = Image.new(mode, (800, 1000), 128 if mode == "L" else (128, 128, 128))
+    out = np.asarray(noise._speckle(page, amount, random.Random(7)).convert("L"))
+    black, white = int((out == 0).sum()), int((out == 255).sum())
+    assert black + white + int((out == 128).sum()) == out.size
+    n = int(out.size * amount)
+    # Repeated positions overwrite each other; at these densities that is < 1%.
+    assert 0.98 * n <= black + white <= n
+    assert abs(black / (black + white) - 0.5) < 4 / np.sqrt(n)
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+def test_speckle_paths_write_the_same_pixels(mode, monkeypatch):
+    page = Image.new(mode, (400, 300), 90 if mode == "L" else (90, 90, 90))
+    by_pixel = noise._speckle(page.copy(), 0.003, random.Random(3))
+    monkeypatch.setattr(noise, "_SPECKLE_ARRAY_DENSITY", {"L": 0.0, "RGB": 0.0})
+    by_array = noise._speckle(page.copy(), 0.003, random.Random(3))
+    assert by_pixel.tobytes() == by_array.tobytes()
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+@pytest.mark.parametrize("seed", [1, 2])
+@pytest.mark.parametrize("jpeg", [False, True])
+def test_banded_noise_matches_whole_page(mode, seed, jpeg):
+    from synthfactory.config import NoiseCfg
+    from synthfactory.pipeline import _noise_params
+
+    params = _noise_params(NoiseCfg())
+    params.update(rotate_deg_max=3.0, jpeg_recompress=jpeg, partial_crop_prob=1.0,
+                  downsample_prob=1.0, smudge_prob=1.0, text_damage_prob=1.0)
+    page = Image.effect_noise((600, 850), 60).convert(mode)
+    whole = noise.apply_noise(page.copy(), rng=random.Random(seed), **params)
+    banded = noise.apply_noise_banded(lambda y0, y1: page.crop((0, y0, page.width, y1)),
+                                      page.size, mode, 64, rng=random.Random(seed), **params)
+    assert banded.mode == whole.mode and banded.size == whole.size
+    assert banded.tobytes() == whole.tobytes()
@@ -0,0 +1,36 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from synthfactory import pipeline
+from synthfactory.config import load_config
+from synthfactory.llm_stub import (
+    Cassette,
+    LatencyModel,
+    OllamaStubServer,
+    StubBehaviour,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_failed_run_still_saves_the_recorded_cassette(tmp_path, monkeypatch):
+    recorded = tmp_path / "recorded.json"
+    with OllamaStubServer(Cassette(on_miss="empty"), StubBehaviour(LatencyModel("fixed", 1))) as stub:
+        cfg = load_config(ROOT / "config.yaml")
+        cfg.llm.ollama.base_url = stub.base_url
+        cfg.llm.ollama.endpoints = []
+        cfg.llm.warmup = False
+        cfg.llm.record_cassette = str(recorded)
+        cfg.llm.governor.state_dir = str(tmp_path / "governor")
+        cfg.output.local.destination = str(tmp_path / "out")
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(pipeline, "_write_pages", fail)
+        with pytest.raises(RuntimeError, match="disk full"):
+            pipeline.generate_dataset(cfg, prompt_override="Utility company account letters", count_override=1)
+
+    assert json.loads(recorded.read_text(encoding="utf-8"))
@@ -0,0 +1,19 @@
+from synthfactory.prompt_analysis import analyze_prompt
+from synthfactory.scenario_parser import parse_scenario_prompt
+
+
+def test_keywords_match_whole_words():
+    assert analyze_prompt("Letters from a furniture restore workshop").industry_hint is None
+    assert analyze_prompt("Retail shop receipts").industry_hint == "retail"
+    assert not analyze_prompt("Website redesign for a bakery").non_financial
+
+
+def test_plural_keywords_still_match():
+    analysis = analyze_prompt("Service changes for telecoms customers")
+    assert analysis.template_hint == "service_change_notice"
+    assert analysis.industry_hint == "telecoms"
+    assert analysis.non_financial
+
+
+def test_scenario_parser_uses_whole_words():
+    assert "industry" not in parse_scenario_prompt("A restore workshop with a navy header").fields
@@ -0,0 +1,168 @@
+import math
+import random
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from synthfactory import fonts, noise, render_jpg
+from synthfactory.branding import Theme
+from synthfactory.config import NoiseCfg
+from synthfactory.faker_gen import fake, make_letter, make_statement
+from synthfactory.layer_cache import LayerCache
+from synthfactory.layout import (
+    A4,
+    Page,
+    Rect,
+    Text,
+    layout_letter,
+    layout_statement,
+    page_pixels,
+)
+from synthfactory.pipeline import _noise_params
+from synthfactory.render_jpg import _draw_text_jittered, render_page, text_boxes
+
+INK = {"RGB": (20, 30, 120), "L": 40, "1": 0}
+PAPER = {"RGB": (250, 248, 240), "L": 245, "1": 1}
+
+
+@pytest.fixture(scope="module")
+def statement_pages():
+    random.seed(0)
+    fake.seed_instance(0)
+    theme = Theme("Harbourlight Ltd (Synthetic)", (30, 80, 200), "nb_bars", (250, 236, 240), "left")
+    stmt = make_statement("d0", theme.company_name, 60, 80)
+    return layout_statement(stmt, "SYNTHETIC", theme, 40, 2)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L", "1"])
+@pytest.mark.parametrize("name", [fonts.SANS, fonts.MONO])
+def test_atlas_glyphs_draw_like_text(mode, name):
+    by_text, by_atlas = (Image.new(mode, (900, 60), PAPER[mode]) for _ in range(2))
+    dt, da = ImageDraw.Draw(by_text), ImageDraw.Draw(by_atlas)
+    atlas = fonts.glyph_atlas(name, 27, da.fontmode)
+    for i, ch in enumerate(fonts.ATLAS_CHARS + "Ab"):
+        xy = (7 + 36 * i, 11)
+        dt.text(xy, ch, font=fonts.load_font(name, 27), fill=INK[mode])
+        g = atlas.glyph(ch)
+        if g is not None:
+            mask, (ox, oy) = g
+            da.bitmap((xy[0] + ox, xy[1] + oy), mask, fill=INK[mode])
+    assert by_text.tobytes() == by_atlas.tobytes()
+
+
+def _jittered_by_text(d, xy, text, font_size, fill, strength, rng):
+    # The per-character ImageDraw.text drawing the atlas replaced.
+    x, y = xy
+    for ch in text:
+        use_mono = ch.isdigit() and (rng.random() < 0.65)
+        face = fonts.MONO if use_mono else fonts.SANS
+        dx = int(rng.uniform(-1, 1) * 3 * strength) if ch.isdigit() else 0
+        dy = int(rng.uniform(-1, 1) * 2 * strength) if ch.isdigit() else 0
+        d.text((x + dx, y + dy), ch, font=fonts.load_font(face, font_size), fill=fill)
+        x += int(fonts.text_length(ch, face, font_size, d.mode))
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L", "1"])
+def test_jittered_text_matches_per_character_drawing(mode):
+    text = "Balance £12,345.67 on 03/11/2024 (ref 884-19) ±"
+    by_text, by_atlas = (Image.new(mode, (1200, 80), PAPER[mode]) for _ in range(2))
+    _jittered_by_text(ImageDraw.Draw(by_text), (10, 20), text, 26, INK[mode], 0.9, random.Random(5))
+    _draw_text_jittered(ImageDraw.Draw(by_atlas), (10, 20), text, 26, INK[mode], 0.9, random.Random(5))
+    assert by_text.tobytes() == by_atlas.tobytes()
+
+
+class _NoMasks:
+    def get(self, *key):
+        return None
+
+
+@pytest.mark.parametrize("mode", ["RGB", "L"])
+def test_cached_text_masks_render_like_uncached_text(statement_pages, mode, monkeypatch):
+    def render(masks):
+        monkeypatch.setattr(render_jpg, "text_masks", masks)
+        out = []
+        for page in statement_pages + statement_pages:
+            monkeypatch.setattr(render_jpg, "page_layers", LayerCache())
+            out.append(render_page(page, mode=mode).tobytes())
+        return out
+
+    cache = fonts.TextMaskCache()
+    cached, uncached = render(cache), render(_NoMasks())
+    assert cache.stats()["hits"] > 100
+    assert cached == uncached
+
+
+def _ink_box(img):
+    return img.convert("L").point(lambda v: 255 if v < 200 else 0).getbbox()
+
+
+def test_page_pixels_follow_dpi():
+    assert page_pixels(A4, 200) == A4
+    assert page_pixels(A4, 300) == (2481, 3508)
+    assert page_pixels(A4, 72) == (595, 842)
+
+
+def test_layout_scales_to_any_dpi(statement_pages):
+    page = statement_pages[0]
+    native = render_page(page)
+    assert render_page(page, *page_pixels(A4, 200)).tobytes() == native.tobytes()
+    ref = _ink_box(native)
+    for dpi in (100, 300):
+        size = page_pixels(A4, dpi)
+        img = render_page(page, *size)
+        assert img.size == size
+        s = size[0] / A4[0]
+        # Coordinates are rounded to whole pixels and glyphs re-hinted at the new size.
+        assert _ink_box(img) == pytest.approx([v * s for v in ref], abs=2 + 2 * s)
+
+
+def _text_only(page):
+    ops = [op for layer in page.layers for op in layer] + list(page.ops)
+    return Page(page.size, (255, 255, 255), (), tuple(replace(op, jitter=False, fill=(0, 0, 0)) for op in ops if isinstance(op, Text)))
+
+
+@pytest.mark.parametrize("dpi", [100, 300])
+def test_word_boxes_bound_the_rendered_text(statement_pages, dpi):
+    random.seed(1)
+    fake.seed_instance(1)
+    theme = Theme("Harbourlight Ltd (Synthetic)", (30, 80, 200), "c_circle", None, "right")
+    letter = layout_letter(make_letter("d1", theme.company_name, "service_change_notice"), "SYNTHETIC", theme)[0]
+    for page in (statement_pages[0], letter):
+        page = _text_only(page)
+        size = page_pixels(A4, dpi)
+        ink = np.asarray(render_page(page, *size, mode="L")) < 255
+        words = [w for line in text_boxes(page, size[0]) for w in line["words"]]
+        assert len(words) > 50
+        covered = np.zeros_like(ink)
+        for w in words:
+            x0, y0, x1, y1 = w["box"]
+            box = (math.floor(x0), math.floor(y0), math.ceil(x1), math.ceil(y1))
+            covered[box[1]:box[3], box[0]:box[2]] = True
+            # Each box is tight: its ink reaches (within a pixel) all four edges.
+            rows, cols = np.nonzero(ink[box[1]:box[3], box[0]:box[2]])
+            assert cols.min() <= 1 and cols.max() >= box[2] - box[0] - 2, w
+            assert rows.min() <= 1 and rows.max() >= box[3] - box[1] - 2, w
+        assert not (ink & ~covered).any()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_page_geometry_follows_crop_and_rotation(seed):
+    # Dots on a blank page; their centres must land where the geometry maps them.
+    centres = [(300.5, 400.5), (1300.5, 350.5), (827.5, 1169.5), (250.5, 2000.5), (1400.5, 2100.5)]
+    ops = tuple(Rect((x - 6.5, y - 6.5, x + 5.5, y + 5.5), fill=(0, 0, 0)) for x, y in centres)
+    page = render_page(Page(A4, (255, 255, 255), (), ops), mode="L")
+    params = _noise_params(NoiseCfg())
+    params.update(rotate_deg_max=4.0, partial_crop_prob=1.0, crop_margin_max=0.05, blur_radius_max=0.0,
+                  contrast_jitter=0.0, brightness_jitter=0.0, speckle_amount=0.0, jpeg_recompress=False,
+                  smudge_prob=0.0, downsample_prob=0.0, text_damage_prob=0.0)
+    geometry = noise.PageGeometry()
+    out = np.asarray(noise.apply_noise(page, rng=random.Random(seed), geometry=geometry, **params)) < 128
+    for x, y in centres:
+        mx, my = geometry.map(x, y)
+        r = 20
+        rows, cols = np.nonzero(out[int(my) - r:int(my) + r, int(mx) - r:int(mx) + r])
+        assert len(rows) > 50
+        assert cols.mean() + int(mx) - r + 0.5 == pytest.approx(mx, abs=1.0)
+        assert rows.mean() + int(my) - r + 0.5 == pytest.approx(my, abs=1.0)